@@ -1,15 +1,25 @@
-
 import importlib
 
 class ActionFactory:
     """
     A static class to handle action creation
     """
+    _action_classes = {}
+
+    @staticmethod
+    def get_action_class(module_name, class_name):
+        """
+        Returns an action class, importing its module only the first time
+        """
+        key = (module_name, class_name)
+        if key not in ActionFactory._action_classes:
+            class_module = importlib.import_module(module_name)
+            ActionFactory._action_classes[key] = getattr(class_module, class_name)
+        return ActionFactory._action_classes[key]
+
     @staticmethod
     def create_action(module_name, class_name, config):
         """
         Generic method to create an action object
         """
-        class_module = importlib.import_module(module_name)
-        class_object = getattr(class_module, class_name)
-        return class_object(config)
\ No newline at end of file
+        return ActionFactory.get_action_class(module_name, class_name)(config)
\ No newline at end of file
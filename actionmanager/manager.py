@@ -1,5 +1,10 @@
+import os
+import threading
+import concurrent.futures
+
 from actionmanager.actions import ActionError
 from actionmanager.helpers import ActionFactory
+from actionmanager.profiler import ActionTiming
 
 class ActionManagerError(Exception):
     """Raised when the action manager presents an error."""
@@ -12,6 +17,127 @@ class WorkflowMetadata:
         self._id = workflow_id
         self._inputs = inputs
 
+# objects keeping process wide state (e.g. metrics) changed by actions, see add_process_step_hook
+PROCESS_STEP_HOOKS = {}
+
+def add_process_step_hook(name, hook):
+    """Register an object whose state changes in worker processes are sent back to the
+    process running the workflow. The hook must implement:
+        snapshot()             -- called in the worker before a step, returns its current state.
+        get_changes(snapshot)  -- called in the worker after the step, returns the picklable changes.
+        merge_changes(changes) -- called in the workflow's process with the changes.
+
+    - Positional arguments:
+        name -- a string identifying the hook in every process.
+        hook -- the hook object.
+    """
+    PROCESS_STEP_HOOKS[name] = hook
+
+# objects keeping per thread state (e.g. an output sink) used by actions, see add_thread_step_hook
+THREAD_STEP_HOOKS = {}
+
+def add_thread_step_hook(name, hook):
+    """Register an object whose per thread state is passed on from the thread running a
+    workflow to the worker threads running its steps. The hook must implement:
+        get_thread_state()      -- called in the thread running the workflow, returns its state.
+        set_thread_state(state) -- called in the worker thread with that state before a step,
+                                   and with None after it.
+
+    - Positional arguments:
+        name -- a string identifying the hook.
+        hook -- the hook object.
+    """
+    THREAD_STEP_HOOKS[name] = hook
+
+def run_step(action, input_data, timing=None, hooks=None):
+    """Execute the action of a workflow step running in a worker thread or process.
+
+    - Positional arguments:
+        action     -- the Action instance to execute.
+        input_data -- a copy of the workflow's input object.
+        timing     -- optional, an ActionTiming object to measure the action with.
+        hooks      -- optional, a dictionary of process step hooks to collect the changes of.
+
+    - Return value:
+        a (output, timing, hook changes) tuple, where output is a dictionary including only
+        the keys added or replaced by the action, timing is the given ActionTiming object and
+        hook changes is a dictionary mapping each hook name to its changes.
+    """
+    previous_input_data = dict(input_data)
+    snapshots = {name: hook.snapshot() for name, hook in (hooks or {}).items()}
+    if timing is None:
+        output = action.execute(input_data)
+    else:
+        with timing.measure():
+            output = action.execute(input_data)
+    return {
+        key: value for key, value in output.items()
+        if key not in previous_input_data or previous_input_data[key] is not value
+    }, timing, {name: hooks[name].get_changes(snapshot) for name, snapshot in snapshots.items()}
+
+def run_thread_step(action, input_data, timing=None, states=None):
+    """Execute the action of a workflow step in a worker thread, with the states of the
+    thread running the workflow set, see add_thread_step_hook and run_step.
+
+    - Positional arguments:
+        states -- optional, a dictionary mapping thread step hook names to their states.
+    """
+    for name, state in (states or {}).items():
+        THREAD_STEP_HOOKS[name].set_thread_state(state)
+    try:
+        return run_step(action, input_data, timing)
+    finally:
+        for name in states or {}:
+            THREAD_STEP_HOOKS[name].set_thread_state(None)
+
+def create_and_run_step(module_name, class_name, config, input_data, timing=None):
+    """Create the action of a workflow step in a worker process and execute it, collecting
+    the changes of the process step hooks, see run_step."""
+    action = ActionFactory.create_action(module_name, class_name, config)
+    return run_step(action, input_data, timing, PROCESS_STEP_HOOKS)
+
+class StepPools:
+    """A class to keep the worker pools running the steps of dependency-declared workflows,
+    see ActionManager.run_dag_workflow. Each pool is created on first use and kept until
+    shutdown, so the workflows run by a manager (or by the managers sharing its pools)
+    don't start new threads and processes every time.
+    """
+    def __init__(self, max_workers):
+        """Initialize the pools.
+
+        - Positional arguments:
+            max_workers -- the number of threads and processes of each pool.
+        """
+        self._max_workers = max_workers
+        self._thread_pool = None
+        self._process_pool = None
+        self._lock = threading.Lock()
+
+    def get_thread_pool(self):
+        """Returns the thread pool, creating it if needed."""
+        with self._lock:
+            if self._thread_pool is None:
+                self._thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers)
+            return self._thread_pool
+
+    def get_process_pool(self):
+        """Returns the process pool, creating it if needed."""
+        with self._lock:
+            if self._process_pool is None:
+                self._process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=self._max_workers)
+            return self._process_pool
+
+    def shutdown(self):
+        """Wait for the running steps and stop the pools. Pools are created again if used
+        after a shutdown."""
+        with self._lock:
+            thread_pool, self._thread_pool = self._thread_pool, None
+            process_pool, self._process_pool = self._process_pool, None
+        if thread_pool is not None:
+            thread_pool.shutdown()
+        if process_pool is not None:
+            process_pool.shutdown()
+
 class ActionManager:
     """A class to perform a set of actions to on given object."""
 
@@ -20,20 +146,83 @@ class ActionManager:
     CONFIG = "config"
     NEXT_ACTION = "next_action"
     INITIAL_ACTION = "initial_action"
+    DEPENDS_ON = "depends_on"
+    EXECUTOR = "executor"
+    PROCESS_EXECUTOR = "process"
+    MAX_WORKERS = "max_workers"
+    DEFAULT_MAX_WORKERS = 4
+
+    def __init__(self, config, actions=None, pools=None):
+        """Prepares the action manager instance with a given configuration. All the actions
+        of all the workflows are created (and so validated) once, and reused by every run.
+        Managers running workflows concurrently can share the actions and the step pools of
+        another manager, which owns them and shuts them down, see shutdown.
+
+        - Positional arguments:
+            config  -- the action manager configuration dictionary.
+            actions -- optional, the actions created by another manager with the same config.
+            pools   -- optional, the StepPools object of another manager with the same config.
 
-    def __init__(self, config):
-        """Prepares the action manager instance with a given configuration."""
+        - Exceptions:
+            An ActionManagerError is raised if any action can't be created.
+        """
         self._config = config
         self._current_output = None
         self._current_action = None
+        self._current_action_name = None
+        self._workflow_id = None
+        self._profiler = None
         self._workflow_config = None
+        self._workflow_actions = None
+        self._actions = actions if actions is not None else self.create_workflows_actions()
+        self._pools = pools if pools is not None else StepPools(
+            config.get(ActionManager.MAX_WORKERS, ActionManager.DEFAULT_MAX_WORKERS)
+        )
 
-    def run_workflow(self, workflow_metadata):
+    def shutdown(self):
+        """Stop the worker pools running the steps of dependency-declared workflows, waiting
+        for the running steps. Must be called once the manager (and the managers sharing its
+        pools) won't run workflows anymore."""
+        self._pools.shutdown()
+
+    def start_process_pool(self):
+        """Start the worker processes of the step process pool now if any workflow runs
+        actions in processes, e.g. before the calling process starts other threads."""
+        for workflow_config in self._config['workflows'].values():
+            for action_metadata in workflow_config.values():
+                if action_metadata.get(ActionManager.EXECUTOR) == ActionManager.PROCESS_EXECUTOR:
+                    self._pools.get_process_pool().submit(os.getpid).result()
+                    return
+
+    def create_workflows_actions(self):
+        """Create the actions of every workflow in the configuration.
+
+        - Return value:
+            a dictionary mapping each workflow id to a dictionary of action name -> Action instance.
+        """
+        try:
+            workflows = self._config['workflows']
+        except KeyError as error:
+            raise ActionManagerError(f'missing workflows setting: {str(error)}')
+        actions = {}
+        for workflow_id, workflow_config in workflows.items():
+            actions[workflow_id] = {}
+            for action_name, action_metadata in workflow_config.items():
+                try:
+                    actions[workflow_id][action_name] = self.create_action(action_metadata)
+                except ActionManagerError as error:
+                    raise ActionManagerError(f'error in action {action_name} of workflow {workflow_id}: {error.message}')
+        return actions
+
+    def run_workflow(self, workflow_metadata, profiler=None):
         """Executes a list of actions in sequential order, passing an input object as
         the argument. The execution stops when the next_action key in the output is an empty string.
+        If the workflow's actions declare their dependencies (depends_on), the actions are run
+        as a graph instead, see run_dag_workflow.
 
         - Positional arguments:
             workflow_metadata -- an object including the workflow to be executed and the initial inputs.
+            profiler          -- optional, a WorkflowProfiler object to measure each action run with.
 
         - Exceptions:
             An Action manager error is raised if:
@@ -42,19 +231,44 @@ class ActionManager:
                 Can't create and action using action metadata
             An ActionError is raised if:
                 Action's execute() method throws any exception
+
+        - Return value:
+            the output of the last action.
         """
         try:
+            self._profiler = profiler
             self.set_initial_values(workflow_metadata)
+            if self.is_dag_workflow():
+                return self.run_dag_workflow()
             while True:
-                self._output = self._current_action.execute(self._output)
+                self._output = self.execute_action(self._current_action_name, self._current_action, self._output)
                 self.set_next_action()
                 if not self._current_action:
                     break
+            return self._output
         except ActionManagerError:
             raise
         except Exception as error:
             raise ActionError(str(error))
 
+    def execute_action(self, action_name, action, input_data):
+        """Execute an action of the current workflow, measuring it if a profiler was given.
+
+        - Return value:
+            the output of the action.
+        """
+        if self._profiler is None:
+            return action.execute(input_data)
+        with self._profiler.profile_action(self._workflow_id, action_name):
+            return action.execute(input_data)
+
+    def create_timing(self, action_name):
+        """Returns an ActionTiming object for an action of the current workflow, or None
+        if no profiler was given."""
+        if self._profiler is None:
+            return None
+        return ActionTiming(self._workflow_id, action_name)
+
     def set_next_action(self):
         """Create next action to be executed."""
         try:
@@ -62,7 +276,8 @@ class ActionManager:
             if next_action_name == '':
                 self._current_action = None
             else:
-                self._current_action = self.create_action(self._workflow_config[next_action_name])
+                self._current_action = self._workflow_actions[next_action_name]
+            self._current_action_name = next_action_name
         except ActionManagerError:
             raise
         except Exception as error:
@@ -73,8 +288,12 @@ class ActionManager:
         """Initialize main objects for action manager"""
         try:
             self._output = workflow_metadata._inputs
+            self._workflow_id = workflow_metadata._id
             self._workflow_config = self._config['workflows'][workflow_metadata._id]
-            self._current_action = self.create_action(self._workflow_config[ActionManager.INITIAL_ACTION])
+            self._workflow_actions = self._actions[workflow_metadata._id]
+            if not self.is_dag_workflow():
+                self._current_action = self._workflow_actions[ActionManager.INITIAL_ACTION]
+                self._current_action_name = ActionManager.INITIAL_ACTION
         except ActionManagerError:
             raise
         except Exception as error:
@@ -98,4 +317,83 @@ class ActionManager:
             )
         except Exception as error:
             msg = f'error while creating action using action metadata: {str(error)}'
-            raise ActionManagerError(msg)
\ No newline at end of file
+            raise ActionManagerError(msg)
+
+    def is_dag_workflow(self):
+        """Returns True if any action of the current workflow declares its dependencies."""
+        return any(ActionManager.DEPENDS_ON in action_metadata for action_metadata in self._workflow_config.values())
+
+    def get_dependencies(self):
+        """Returns a dictionary mapping each action name to the set of actions it depends on.
+
+        Exceptions:
+            An ActionManagerError is thrown if an action depends on an unknown action.
+        """
+        dependencies = {}
+        for action_name, action_metadata in self._workflow_config.items():
+            dependencies[action_name] = set(action_metadata.get(ActionManager.DEPENDS_ON, []))
+            unknown_actions = dependencies[action_name] - set(self._workflow_config)
+            if unknown_actions:
+                raise ActionManagerError(f'action {action_name} depends on unknown actions: {sorted(unknown_actions)}')
+        return dependencies
+
+    def run_dag_workflow(self):
+        """Executes the actions of the current workflow as soon as all the actions they
+        depend on are done, running independent actions concurrently. Actions run in the
+        manager's thread pool, or in its process pool if their executor setting is "process"
+        (see StepPools). Worker threads get the states of the thread step hooks of the calling
+        thread. If an action fails, the running actions are waited for before the error is
+        propagated. Each action gets a copy of the current
+        input object and the keys it adds or replaces are merged back into it. When profiling,
+        actions are measured in the worker running them and the timing is sent back with the output,
+        as are the changes of the process step hooks for actions run in a worker process.
+
+        Exceptions:
+            An ActionManagerError is raised if the dependencies can't be resolved.
+            Any exception raised by an action is propagated.
+
+        Return value:
+            the input object including the output of all the actions.
+        """
+        pending = self.get_dependencies()
+        done = set()
+        running = {}
+        thread_states = {name: hook.get_thread_state() for name, hook in THREAD_STEP_HOOKS.items()}
+        try:
+            while pending or running:
+                for action_name in [name for name, dependencies in pending.items() if dependencies <= done]:
+                    del pending[action_name]
+                    action_metadata = self._workflow_config[action_name]
+                    if action_metadata.get(ActionManager.EXECUTOR) == ActionManager.PROCESS_EXECUTOR:
+                        future = self._pools.get_process_pool().submit(
+                            create_and_run_step,
+                            action_metadata[ActionManager.MODULE],
+                            action_metadata[ActionManager.CLASS],
+                            action_metadata[ActionManager.CONFIG],
+                            dict(self._output),
+                            self.create_timing(action_name)
+                        )
+                    else:
+                        future = self._pools.get_thread_pool().submit(
+                            run_thread_step,
+                            self._workflow_actions[action_name],
+                            dict(self._output),
+                            self.create_timing(action_name),
+                            thread_states
+                        )
+                    running[future] = action_name
+                if not running:
+                    raise ActionManagerError(f'cyclic dependencies between actions: {sorted(pending)}')
+                finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    done.add(running.pop(future))
+                    output, timing, hook_changes = future.result()
+                    self._output.update(output)
+                    if timing is not None:
+                        self._profiler.add_timing(timing)
+                    for name, changes in hook_changes.items():
+                        if name in PROCESS_STEP_HOOKS:
+                            PROCESS_STEP_HOOKS[name].merge_changes(changes)
+        finally:
+            concurrent.futures.wait(running)
+        return self._output
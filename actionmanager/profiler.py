@@ -0,0 +1,143 @@
+import sys
+import time
+import threading
+import contextlib
+
+try:
+    import resource
+except ImportError:
+    # not available on every platform, rss and child cpu time are not reported
+    resource = None
+
+PROC_IO_FILE = '/proc/self/io'
+READ_CHARS = 'rchar'
+WRITTEN_CHARS = 'wchar'
+# ru_maxrss is in kilobytes on linux and in bytes on macos
+MAXRSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+_current = threading.local()
+
+def add_counter(name, value=1):
+    """Add a value to a custom counter of the action running in the current thread, e.g.
+    the number of rules parsed or lines streamed. Does nothing if the workflow is not
+    being profiled, so actions can report counters unconditionally.
+
+    - Positional arguments:
+        name  -- a string representing the counter's name.
+        value -- the number (int or float) to add to the counter.
+    """
+    timing = getattr(_current, 'timing', None)
+    if timing is not None:
+        timing.counters[name] = timing.counters.get(name, 0) + value
+
+def get_io_counters():
+    """Returns a (bytes read, bytes written) tuple with the bytes transferred by the read and
+    write system calls of this process (including pipes and cached files), or (None, None)
+    if /proc/self/io is not available."""
+    try:
+        with open(PROC_IO_FILE) as io_reader:
+            counters = dict(line.split(': ') for line in io_reader)
+        return int(counters[READ_CHARS]), int(counters[WRITTEN_CHARS])
+    except (OSError, KeyError, ValueError):
+        return None, None
+
+def get_usage():
+    """Returns a (children cpu time, peak rss) tuple, or (None, None) if the resource module
+    is not available. The children cpu time only includes the child processes already waited for."""
+    if resource is None:
+        return None, None
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * MAXRSS_UNIT
+    return children.ru_utime + children.ru_stime, peak_rss
+
+def get_delta(start, end):
+    """Returns end - start, or None if any of the values is not available."""
+    if start is None or end is None:
+        return None
+    return end - start
+
+class ActionTiming:
+    """A class to represent the resources used by a single action run.
+
+    Cpu time, io and rss are measured for the whole process, so they include the work of
+    any action running concurrently in other threads. The peak rss delta is how much the
+    process' peak rss grew while the action was running.
+    """
+    __slots__ = (
+        'workflow_id', 'action_name', 'wall_time', 'cpu_time', 'children_cpu_time',
+        'peak_rss_delta', 'read_bytes', 'written_bytes', 'counters', '_start'
+    )
+
+    def __init__(self, workflow_id, action_name):
+        self.workflow_id = workflow_id
+        self.action_name = action_name
+        self.wall_time = None
+        self.cpu_time = None
+        self.children_cpu_time = None
+        self.peak_rss_delta = None
+        self.read_bytes = None
+        self.written_bytes = None
+        self.counters = {}
+        self._start = None
+
+    def start(self):
+        """Take the initial measurements."""
+        self._start = (time.perf_counter(), time.process_time()) + get_usage() + get_io_counters()
+
+    def stop(self):
+        """Take the final measurements and keep the difference with the initial ones."""
+        end = (time.perf_counter(), time.process_time()) + get_usage() + get_io_counters()
+        (
+            self.wall_time, self.cpu_time, self.children_cpu_time,
+            self.peak_rss_delta, self.read_bytes, self.written_bytes
+        ) = (get_delta(start, stop) for start, stop in zip(self._start, end))
+
+    def to_dict(self):
+        """Returns a dictionary with the measurements, see ActionTiming.__slots__."""
+        return {name: getattr(self, name) for name in ActionTiming.__slots__ if not name.startswith('_')}
+
+    @contextlib.contextmanager
+    def measure(self):
+        """Measure the code run inside the with block, making the counters of add_counter
+        calls in the current thread go to this object."""
+        previous_timing = getattr(_current, 'timing', None)
+        _current.timing = self
+        self.start()
+        try:
+            yield self
+        finally:
+            self.stop()
+            _current.timing = previous_timing
+
+class WorkflowProfiler:
+    """A class to collect the timing of every action run by one or many action managers.
+    It can be shared by managers running workflows concurrently."""
+    def __init__(self):
+        self._timings = []
+        self._lock = threading.Lock()
+        self._start_time = time.perf_counter()
+
+    def add_timing(self, timing):
+        """Keep the timing of an action run, measured in this or another process."""
+        with self._lock:
+            self._timings.append(timing)
+
+    @contextlib.contextmanager
+    def profile_action(self, workflow_id, action_name):
+        """Measure the action run inside the with block, see ActionTiming.measure."""
+        timing = ActionTiming(workflow_id, action_name)
+        try:
+            with timing.measure():
+                yield timing
+        finally:
+            self.add_timing(timing)
+
+    def get_report(self):
+        """Returns a dictionary with the timing of every action in the order they finished
+        and the total wall time since the profiler was created."""
+        with self._lock:
+            timings = list(self._timings)
+        return {
+            'wall_time': time.perf_counter() - self._start_time,
+            'actions': [timing.to_dict() for timing in timings]
+        }
@@ -1,11 +1,31 @@
+import os
 import re
+import sys
 import time
+import heapq
+import shutil
+import hashlib
 import logging
+import threading
 import subprocess
 import datetime
-
-from oscaptool.sample.util import FileHelper
+import collections
+import concurrent.futures
+import concurrent.futures.process
+import sqlite3
+import zipfile
+from array import array
+from xml.etree import ElementTree
+
+from oscaptool.sample.util import FileHelper, OutputWriter, COMPRESSION_EXTENSIONS, OUTPUT_FORMATS, TEXT_FORMAT
+from oscaptool.sample.store import ScanStore
+from oscaptool.sample.cache import ScanCache
+from oscaptool.sample.history import ScanHistoryIndex, SORT_COLUMNS
+from oscaptool.sample.rules import RuleIndex
+from oscaptool.sample.results import ResultsFileParser
+from oscaptool.sample import metrics
 from actionmanager.actions import Action, ActionError
+from actionmanager.profiler import add_counter
 
 SCAN_TYPE = 'scantype'
 SCAN_SUB_TYPE = 'scansubtype'
@@ -24,9 +44,244 @@ CMD_STR = 'cmd_str'
 COMMAND = 'command'
 CMD_STDOUT = 'cmd_stdout'
 STDOUT_INPUT = 'stdout_input'
+CMD_RETURNCODE = 'cmd_returncode'
+ECHO = 'echo'
+TEMP_EXTENSION = '.tmp'
+PARSE = 'parse'
+PROGRESS_INTERVAL = 'progress_interval'
+PROGRESS_CALLBACK = 'progress_callback'
+PARSED_SCAN_RESULT = 'parsed_scan_result'
+SCAN_TAG = 'scantag'
+STORE = 'store'
+CACHE_PATH = 'cache_path'
+CACHE_MAX_BYTES = 'cache_max_bytes'
+MEMORY_CACHE_ENTRIES = 'memory_cache_entries'
+SCAN_RESULT_EXTENSION = '.txt'
+COMPRESSION = 'compression'
+HISTORY_INDEX = 'history_index'
+SCAN_TYPE_FILTER = 'type'
+LIMIT = 'limit'
+OFFSET = 'offset'
+SORT = 'sort'
+REVERSE = 'reverse'
+DEFAULT_SORT = 'scan_id'
+RETENTION = 'retention'
+KEEP_LAST = 'keep_last'
+KEEP_DAILY_AFTER_DAYS = 'keep_daily_after_days'
+KEEP_WEEKLY_AFTER_DAYS = 'keep_weekly_after_days'
+MAX_BYTES = 'max_bytes'
+REMOVE_TEMP_AFTER_HOURS = 'remove_temp_after_hours'
+DEFAULT_REMOVE_TEMP_AFTER_HOURS = 24
+DRY_RUN = 'dry_run'
+DEFAULT_ARCHIVE_COMPRESSION = 'gzip'
+ARCHIVE_DIR = 'archive/'
+ARCHIVE_EXTENSION = '.zip'
+ARCHIVE_BATCH_SIZE = 1000
+TIMESTAMP_FORMAT = '%Y-%m-%d_%H:%M:%S'
+KEYFRAME_INTERVAL = 'keyframe_interval'
+FORMAT = 'format'
+MAX_WORKERS = 'max_workers'
+CHUNK_SIZE = 'chunk_size'
+WORKERS = 'workers'
+DEFAULT_CHUNK_SIZE = 16
+DEFAULT_PROGRESS_INTERVAL = 5
+REINDEX_EXTENSION = '.reindex'
+DEDUPLICATE = 'deduplicate'
+DUPLICATE_OF = 'duplicate_of'
+CAPTURE = 'capture'
+RESULTS_KEY_NAME = 'results_key_name'
+RULE_INDEX = 'rule_index'
+RULE_ID_FILTER = 'rule_id'
+PREFIX = 'prefix'
+REGEX = 'regex'
+TITLE_FILTER = 'title'
+RESULT_FILTER = 'result'
+LAST = 'last'
+EVERY = 'every'
+PARALLEL_PARSE = 'parallel_parse'
+PARSE_WORKERS = 'parse_workers'
+PARSE_CHUNK_BYTES = 'parse_chunk_bytes'
+DEFAULT_PARSE_CHUNK_BYTES = 16 * 1024 * 1024
+RULE_FILTERS = (RULE_ID_FILTER, PREFIX, REGEX, TITLE_FILTER)
+TRUE_VALUES = (True, 'true', '1')
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# the results documented by oscap, other results are kept by name, see ScanResult.add_result
+RESULT_NAMES = (
+    PASS_SCAN_RESULT, FAIL_SCAN_RESULT, NA_SCAN_RESULT, 'error', 'unknown',
+    'notchecked', 'notselected', 'informational', 'fixed'
+)
+RESULT_CODES = {name: code for code, name in enumerate(RESULT_NAMES)}
+PASS_CODE = RESULT_CODES[PASS_SCAN_RESULT]
+FAIL_CODE = RESULT_CODES[FAIL_SCAN_RESULT]
+OTHER_CODE = len(RESULT_NAMES)
+MISSING_CODE = 255
+TITLE_LINE = b'Title'
+RULE_LINE = b'Rule'
+RESULT_LINE = b'Result'
+MARKER_LINES = (TITLE_LINE, RULE_LINE, RESULT_LINE)
+SCAN_RESULT_ENCODING = 'utf-8'
+PASS_FAIL_CODES = bytes([PASS_CODE, FAIL_CODE])
+NOT_PASS_FAIL_CODES = bytes(code for code in range(256) if code not in PASS_FAIL_CODES)
+SCAN_IDS_KEY_NAME = 'scan_ids_key_name'
+SCAN_RESULTS_KEY_NAME = 'scan_results_key_name'
+SINCE = 'since'
+UNTIL = 'until'
+HISTORY_FILTERS = (SINCE, UNTIL, SCAN_TYPE_FILTER, LIMIT, OFFSET, SORT, REVERSE)
+FIND_TITLE = 'find_title'
+GRAB_TITLE = 'grab_title'
+FIND_RULE = 'find_rule'
+GRAB_RULE = 'grab_rule'
+FIND_RESULT = 'find_result'
+GRAB_RESULT = 'grab_result'
+
+def update_content_hash(digest, rule_id, result):
+    """Add a rule to the content hash of a scan. Only the rule ids and results are hashed, in
+    the order of the scan output, so scans differing only in titles or in the text around
+    the rules have the same hash.
+
+    Positional arguments:
+        digest  -- a hashlib object
+        rule_id -- a string representing the rule id
+        result  -- a string representing the result
+    """
+    digest.update(f'{rule_id}\t{result}\n'.encode('utf-8'))
+
+def read_scan_file(file_name):
+    """Parse a scan result file. Plain files are memory mapped and searched for the rules
+    without splitting them into lines, decoding only the rule ids and results; the titles
+    are decoded when used, see MappedTitles. Compressed files are decompressed and parsed
+    line by line.
+
+    Positional arguments:
+        file_name -- a string representing the file's absolute path
+
+    Return value:
+        an instance of ScanResult class.
+    """
+    parser = ScanResultParser()
+    key = ScanCache.get_key(file_name)
+    data = FileHelper.map_file(file_name)
+    if data is None:
+        return ScanResult(parser.parse(FileHelper.read_lines(file_name)), parser.stats)
+    scan_result = ScanResult([], parser.stats)
+    starts = array('Q')
+    ends = array('Q')
+    with data:
+        for title_start, title_end, rule, result in parser.parse_buffer(data):
+            starts.append(title_start)
+            ends.append(title_end)
+            scan_result._rule_ids.append(rule)
+            scan_result.add_result(result)
+    scan_result._titles = MappedTitles(file_name, key, starts, ends)
+    return scan_result
+
+def parse_scan_range(file_name, start, end):
+    """Parse the rules starting in a byte range of a plain scan result file, in a worker
+    process of the parse pool, see GetScanResult.read_scan_file. The rules are sent back as
+    compact columns instead of Rule objects.
+
+    Positional arguments:
+        file_name -- a string representing the file's absolute path
+        start     -- the offset of the first line of the range
+        end       -- the offset where the range ends
+
+    Return value:
+        a (file key, title starts, title ends, rule ids, results, other results, stats, end)
+        tuple, where the file key is the ScanCache key of the file, the title offsets and
+        results (codes) are arrays, the rule ids a string of rule ids separated by new lines,
+        the other results a dictionary mapping the position of each OTHER_CODE result in the
+        range to its name, the stats a (pass, fail, notapplicable, total) tuple and end the
+        offset where the last rule ends.
+    """
+    parser = ScanResultParser()
+    key = ScanCache.get_key(file_name)
+    data = FileHelper.map_file(file_name)
+    if data is None:
+        raise OSError(f'{file_name} is compressed or empty')
+    starts = array('Q')
+    ends = array('Q')
+    rule_ids = []
+    results = array('B')
+    other_results = {}
+    with data:
+        for title_start, title_end, rule, result in parser.parse_buffer(data, start, end):
+            starts.append(title_start)
+            ends.append(title_end)
+            rule_ids.append(rule)
+            code = RESULT_CODES.get(result, OTHER_CODE)
+            if code == OTHER_CODE:
+                other_results[len(results)] = result
+            results.append(code)
+    return key, starts, ends, '\n'.join(rule_ids), results, other_results, parser.stats.to_tuple(), parser.end
+
+def get_scan_file_name(path, scan_id):
+    """Return the path of a scan result file, plain or compressed. If no file exists,
+    the plain file name is returned."""
+    file_name = f'{path}{scan_id}{SCAN_RESULT_EXTENSION}'
+    if os.path.exists(file_name):
+        return file_name
+    for extension in COMPRESSION_EXTENSIONS.values():
+        if os.path.exists(file_name + extension):
+            return file_name + extension
+    return file_name
+
+def get_archive_name(path, scan_id):
+    """Return the path of the archive a scan result is compacted into. Scans are archived
+    by month, using the timestamp at the start of the scan id."""
+    return f'{path}{ARCHIVE_DIR}{scan_id[:7]}{ARCHIVE_EXTENSION}'
+
+def split_scan_id(scan_id):
+    """Return the (timestamp, group) tuple of a scan id, where the group is the scan type,
+    subtype and tag. Both are None if the scan id doesn't start with a timestamp."""
+    timestamp = ScanHistoryIndex.parse_scan_id(scan_id)[0]
+    if timestamp is None:
+        return None, None
+    return timestamp, scan_id[len(timestamp) + 1:]
+
+def get_scan_id(file_name):
+    """Return the scan id of a plain or compressed scan result file name, or None if the
+    file is not a scan result."""
+    for extension in COMPRESSION_EXTENSIONS.values():
+        if file_name.endswith(extension):
+            file_name = file_name[:-len(extension)]
+            break
+    if file_name.endswith(SCAN_RESULT_EXTENSION) and not file_name.startswith('.'):
+        return file_name[:-len(SCAN_RESULT_EXTENSION)]
+    return None
+
+def parse_scan_chunk(path, scan_ids):
+    """Parse a chunk of scan results in a worker process with the GetScanResult parsing logic,
+    reading the scan result files (or archives) only, never the caches or the store.
+
+    Positional arguments:
+        path     -- a string representing the scan results directory
+        scan_ids -- a list of strings representing the scan ids
+
+    Return value:
+        a list of (scan id, rules, stats, content hash, error) tuples, where rules is a list
+        of (title, rule id, result) tuples and stats a (pass, fail, notapplicable, total)
+        tuple, or the three are None and error is a string if the scan couldn't be parsed.
+    """
+    action = GetScanResult({NEXT_ACTION: '', SCAN_ID_KEY_NAME: SCAN_ID, OUTPUT_KEY_NAME: STDOUT_INPUT, PATH: path})
+    parsed_scans = []
+    for scan_id in scan_ids:
+        try:
+            scan_result = action.parse_scan_file(scan_id)
+            parsed_scans.append((
+                scan_id,
+                list(scan_result.get_rule_tuples()),
+                scan_result._stats.to_tuple(),
+                scan_result.get_content_hash(),
+                None
+            ))
+        except ActionError as e:
+            parsed_scans.append((scan_id, None, None, None, e.message))
+    return parsed_scans
 
 class Rule:
     """A class to represent a rule evaluation result."""
+    __slots__ = ('_title', '_rule', '_result')
+
     def __init__(self, title, rule, result):
         """Initialize rule properties."""
         self._title = title
@@ -37,22 +292,291 @@ class Rule:
         """Create a string representation of rule values."""
         return f'Title: {self._title}\nRule: {self._rule}\nResult: {self._result}\n\n'
 
+class StringTable:
+    """A class to keep the rule ids and titles of all the scan results of the process, see
+    StringColumn. Each distinct string is kept once and known by its index, so the scans of
+    a profile share their strings. Strings are never removed: the table is bounded by the
+    rules of the profiles scanned, not by the number of scans. Strings are added with the
+    lock held and can be read without it.
+    """
+    def __init__(self):
+        """Initialize an empty table."""
+        self._strings = []
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def get_index(self, string):
+        """Return the index of a string, adding it to the table if it's missing."""
+        index = self._indexes.get(string)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(string)
+                if index is None:
+                    index = len(self._strings)
+                    self._strings.append(string)
+                    self._indexes[string] = index
+        return index
+
+    def __getitem__(self, index):
+        """Return the string of an index."""
+        return self._strings[index]
+
+    def __len__(self):
+        """Return the number of strings."""
+        return len(self._strings)
+
+class StringColumn:
+    """A class to represent a column of strings of a scan result, kept as an array of
+    indexes in the string table shared by all the columns of the process, 4 bytes per
+    string. Can be pickled, e.g. to be sent to another process: the strings themselves
+    are sent and added to the table of the receiving process.
+    """
+    __slots__ = ('indexes',)
+    # the strings of all the columns, for the life of the process
+    _table = StringTable()
+
+    def __init__(self, strings=()):
+        """Initialize the column from an iterable of strings."""
+        self.indexes = array('I')
+        self.extend(strings)
+
+    def append(self, string):
+        """Append a string to the column."""
+        self.indexes.append(StringColumn._table.get_index(string))
+
+    def extend(self, strings):
+        """Append the strings of an iterable to the column."""
+        self.indexes.extend(map(StringColumn._table.get_index, strings))
+
+    def __len__(self):
+        """Return the number of strings."""
+        return len(self.indexes)
+
+    def __getitem__(self, index):
+        """Return a single string."""
+        return StringColumn._table[self.indexes[index]]
+
+    def __iter__(self):
+        """Return an iterator of the strings."""
+        return map(StringColumn._table.__getitem__, self.indexes)
+
+    def __reduce__(self):
+        """Pickle the strings instead of the indexes, which are only valid in this process."""
+        return StringColumn, (list(self),)
+
 class ScanResult:
-    """A class to represent a scan result."""
+    """A class to represent a scan result.
+
+    Rules are kept as columns: titles and rule ids in the shared string table (see
+    StringColumn), and one byte per result code (see RESULT_NAMES). Results oscap
+    doesn't document are kept by name, see add_result. Titles parsed from a plain file
+    are read from the file when used instead, see read_scan_file. Rule objects are only
+    created when the scan result is iterated.
+    """
     def __init__(self, rules, stats):
-        """Initialize scan result properties."""
-        self._rules = rules
+        """Initialize scan result properties from an iterable of Rule objects."""
+        self._titles = StringColumn()
+        self._rule_ids = StringColumn()
+        self._results = array('B')
+        self._other_results = {}
+        for rule in rules:
+            self.add_rule(rule._title, rule._rule, rule._result)
         self._stats = stats
+        self._content_hash = None
+        self._severities = None
+
+    def add_rule(self, title, rule, result):
+        """Append a rule to the scan result."""
+        self._titles.append(title)
+        self._rule_ids.append(rule)
+        self.add_result(result)
+
+    def add_result(self, result):
+        """Append the result of a rule. Results missing from RESULT_NAMES are saved as
+        OTHER_CODE, their names are kept by position in the scan."""
+        code = RESULT_CODES.get(result, OTHER_CODE)
+        if code == OTHER_CODE:
+            self._other_results[len(self._results)] = result
+        self._results.append(code)
+
+    def get_result_names(self):
+        """Return an iterator of the result names, in the order of the rules."""
+        other_results = self._other_results
+        if not other_results:
+            return map(RESULT_NAMES.__getitem__, self._results)
+        return (
+            RESULT_NAMES[code] if code != OTHER_CODE else other_results[position]
+            for position, code in enumerate(self._results)
+        )
+
+    def get_content_hash(self):
+        """Return the hash of the rule ids and results (see update_content_hash), computing it
+        only the first time."""
+        if self._content_hash is None:
+            digest = hashlib.sha256()
+            for rule, result in zip(self._rule_ids, self.get_result_names()):
+                update_content_hash(digest, rule, result)
+            self._content_hash = digest.hexdigest()
+        return self._content_hash
+
+    def get_results_by_rule(self):
+        """Return a dictionary mapping each rule id's index in the string table (see
+        StringColumn) to its result code."""
+        return dict(zip(self._rule_ids.indexes, self._results))
+
+    def get_rule_tuples(self):
+        """Return an iterator of (title, rule id, result) tuples."""
+        return zip(self._titles, self._rule_ids, self.get_result_names())
+
+    def __iter__(self):
+        """Return an iterator of Rule objects."""
+        return (Rule(title, rule, result) for title, rule, result in self.get_rule_tuples())
+
+    def __len__(self):
+        """Return the number of rules."""
+        return len(self._results)
+
+    RECORDS_NAME = 'rules'
+
+    def get_lines(self):
+        """Return an iterator of the string representation's chunks, one for each rule
+        followed by the stats."""
+        for rule in self:
+            yield repr(rule)
+        yield '---- Stats ----\n\n'
+        yield str(self._stats)
+
+    def get_summary(self):
+        """Return a dictionary with the scan stats, see OutputWriter."""
+        return {'stats': self._stats.to_dict()}
+
+    def get_records(self):
+        """Return an iterator of dictionaries, one for each rule, see OutputWriter. Rules
+        include their severity when it's known, see IngestResultsFile."""
+        if self._severities is not None:
+            return (
+                {'title': title, 'rule_id': rule, 'result': result, 'severity': severity}
+                for (title, rule, result), severity in zip(self.get_rule_tuples(), self._severities)
+            )
+        return (
+            {'title': title, 'rule_id': rule, 'result': result}
+            for title, rule, result in self.get_rule_tuples()
+        )
+
+    def get_output_lines(self):
+        """Return an iterator of the lines of the scan result in the format of oscap's output,
+        which ScanResultParser reads back. Severities are added as lines the parser ignores."""
+        severities = self._severities if self._severities is not None else (None for _ in self._results)
+        for (title, rule, result), severity in zip(self.get_rule_tuples(), severities):
+            yield f'Title\r\t{title}\n'
+            yield f'Rule\r\t{rule}\n'
+            if severity:
+                yield f'Severity\r\t{severity}\n'
+            yield f'Result\r\t{result}\n\n'
 
     def __repr__(self):
         """Create a string representation of scan result values."""
-        result = ''
-        for rule in self._rules:
-            result += str(rule)
-        
-        result += '---- Stats ----\n\n'
-        result += str(self._stats)
-        return result
+        return ''.join(self.get_lines())
+
+class MappedTitles:
+    """A class to represent the titles of a scan result file parsed by read_scan_file, kept
+    as offsets in the file. The file is mapped and the titles decoded each time they are
+    used, so scans that are only compared never decode their titles. Can be pickled, e.g.
+    to be returned by a worker process.
+    """
+    __slots__ = ('_file_name', '_key', '_starts', '_ends')
+
+    def __init__(self, file_name, key, starts, ends):
+        """Initialize the titles.
+
+        Positional arguments:
+            file_name -- a string representing the scan result file's absolute path
+            key       -- the file version the offsets belong to, see ScanCache.get_key
+            starts    -- an array of the title lines' start offsets
+            ends      -- an array of the title lines' end offsets
+        """
+        self._file_name = file_name
+        self._key = key
+        self._starts = starts
+        self._ends = ends
+
+    def map_file(self):
+        """Map the scan result file, raising an ActionError if it changed since it was parsed."""
+        try:
+            if ScanCache.get_key(self._file_name) == self._key:
+                return FileHelper.map_file(self._file_name)
+        except OSError:
+            pass
+        raise ActionError(f"Action error: {self._file_name} changed since it was parsed")
+
+    def __len__(self):
+        """Return the number of titles."""
+        return len(self._starts)
+
+    def __getitem__(self, index):
+        """Return a single title."""
+        with self.map_file() as data:
+            return data[self._starts[index]:self._ends[index]].decode(SCAN_RESULT_ENCODING).strip()
+
+    def __iter__(self):
+        """Return an iterator of the titles, mapping the file once."""
+        with self.map_file() as data:
+            for start, end in zip(self._starts, self._ends):
+                yield data[start:end].decode(SCAN_RESULT_ENCODING).strip()
+
+class StoredScanResult(ScanResult):
+    """A class to represent a scan result kept in the scan store. Only the stats are loaded
+    when the object is created, the rules are loaded the first time they are used. Comparing
+    two stored scans of the same delta chain doesn't load the rules, see ScanStore.compare.
+    """
+    def __init__(self, store, scan_id, stats, content_hash=None):
+        """Initialize scan result properties.
+
+        Positional arguments:
+            store        -- an instance of ScanStore class holding the scan
+            scan_id      -- a string representing the scan id
+            stats        -- an instance of ScanStats class
+            content_hash -- optional, the content hash saved with the scan
+        """
+        self._store = store
+        self._scan_id = scan_id
+        self._stats = stats
+        self._content_hash = content_hash
+        self._severities = None
+        self._columns = None
+
+    def load(self):
+        """Load the rules from the scan store, once.
+
+        Return value:
+            a (titles, rule ids, result codes, other results) tuple, see ScanResult.
+        """
+        if self._columns is None:
+            try:
+                rules = self._store.get_rules(self._scan_id)
+            except sqlite3.Error:
+                raise ActionError(f"Action error: can't retrieve {self._scan_id} from scan store")
+            scan_result = ScanResult((Rule(title, rule, result) for title, rule, result in rules), self._stats)
+            self._columns = (
+                scan_result._titles, scan_result._rule_ids, scan_result._results, scan_result._other_results
+            )
+        return self._columns
+
+    @property
+    def _titles(self):
+        return self.load()[0]
+
+    @property
+    def _rule_ids(self):
+        return self.load()[1]
+
+    @property
+    def _results(self):
+        return self.load()[2]
+
+    @property
+    def _other_results(self):
+        return self.load()[3]
 
 class ScanStats:
     """A class to represent scan result stats"""
@@ -61,10 +585,193 @@ class ScanStats:
         self.fail_count = fail_count
         self.na_count = na_count
         self.total = total
+
+    def add(self, result):
+        """Count a single rule result (pass, fail, notapplicable), other values are ignored."""
+        if result == PASS_SCAN_RESULT:
+            self.pass_count += 1
+        elif result == FAIL_SCAN_RESULT:
+            self.fail_count += 1
+        elif result == NA_SCAN_RESULT:
+            self.na_count += 1
+        else:
+            return
+        self.total += 1
     
+    def to_tuple(self):
+        """Return the stats as a (pass, fail, notapplicable, total) tuple."""
+        return (self.pass_count, self.fail_count, self.na_count, self.total)
+
+    def to_dict(self):
+        """Return the stats as a dictionary."""
+        return {
+            'total': self.total,
+            PASS_SCAN_RESULT: self.pass_count,
+            FAIL_SCAN_RESULT: self.fail_count,
+            NA_SCAN_RESULT: self.na_count
+        }
+
     def __str__(self):
         return f'total: {self.total} pass: {self.pass_count} fail: {self.fail_count} notapplicable: {self.na_count}'
 
+class ScanHistoryEntry:
+    """A class to represent a scan in the scan history."""
+    __slots__ = ('scan_id', 'timestamp', 'scan_type', 'scan_subtype', 'stats')
+
+    def __init__(self, scan_id, timestamp, scan_type, scan_subtype, stats):
+        """Initialize entry properties."""
+        self.scan_id = scan_id
+        self.timestamp = timestamp
+        self.scan_type = scan_type
+        self.scan_subtype = scan_subtype
+        self.stats = stats
+
+    RECORDS_NAME = None
+
+    def get_summary(self):
+        """Return the entry as a dictionary, see OutputWriter."""
+        summary = {
+            'scan_id': self.scan_id,
+            'timestamp': self.timestamp,
+            'scan_type': self.scan_type,
+            'scan_subtype': self.scan_subtype
+        }
+        summary.update(self.stats.to_dict())
+        return summary
+
+    def get_records(self):
+        """Return an iterator with the entry as a single record, see OutputWriter."""
+        yield self.get_summary()
+
+    def __str__(self):
+        return f'{self.scan_id}{SCAN_RESULT_EXTENSION} {self.stats}'
+
+class RuleResultEntry:
+    """A class to represent the result of a rule in a scan, found in the rule index."""
+    __slots__ = ('rule_id', 'title', 'scan_id', 'result')
+
+    def __init__(self, rule_id, title, scan_id, result):
+        """Initialize entry properties."""
+        self.rule_id = rule_id
+        self.title = title
+        self.scan_id = scan_id
+        self.result = result
+
+    RECORDS_NAME = None
+
+    def get_summary(self):
+        """Return the entry as a dictionary, see OutputWriter."""
+        return {'rule_id': self.rule_id, 'title': self.title, 'scan_id': self.scan_id, 'result': self.result}
+
+    def get_records(self):
+        """Return an iterator with the entry as a single record, see OutputWriter."""
+        yield self.get_summary()
+
+    def __str__(self):
+        return f'{self.scan_id} {self.result} {self.rule_id} {self.title}'
+
+class RuleSummaryEntry:
+    """A class to represent a rule with the same result in every scan of a query."""
+    __slots__ = ('rule_id', 'title', 'result', 'scans', 'first_scan_id', 'last_scan_id')
+
+    def __init__(self, rule_id, title, result, scans, first_scan_id, last_scan_id):
+        """Initialize entry properties."""
+        self.rule_id = rule_id
+        self.title = title
+        self.result = result
+        self.scans = scans
+        self.first_scan_id = first_scan_id
+        self.last_scan_id = last_scan_id
+
+    RECORDS_NAME = None
+
+    def get_summary(self):
+        """Return the entry as a dictionary, see OutputWriter."""
+        return {
+            'rule_id': self.rule_id,
+            'title': self.title,
+            'result': self.result,
+            'scans': self.scans,
+            'first_scan_id': self.first_scan_id,
+            'last_scan_id': self.last_scan_id
+        }
+
+    def get_records(self):
+        """Return an iterator with the entry as a single record, see OutputWriter."""
+        yield self.get_summary()
+
+    def __str__(self):
+        return f'{self.rule_id} {self.result} in {self.scans} scans ({self.first_scan_id} to {self.last_scan_id}) {self.title}'
+
+class RetentionPolicy:
+    """A class to decide which scans to keep in the scan results directory.
+
+    Scans are grouped by type, subtype and tag (the scan id without its timestamp).
+    In each group the keep_last newest scans are always kept. Scans newer than
+    keep_daily_after_days (or keep_weekly_after_days) days are kept, older scans are
+    thinned to the newest scan of each day and, beyond keep_weekly_after_days days, of
+    each week. Scans aren't thinned by a missing day setting, so without day settings
+    every scan is kept. Scan ids without a timestamp are always kept.
+
+    All the scans are added first, then each scan is checked with is_kept. The memory
+    used depends on keep_last and on the number of days and weeks, not on the number
+    of scans.
+    """
+    def __init__(self, keep_last=0, keep_daily_after_days=None, keep_weekly_after_days=None, now=None):
+        """Initialize the policy.
+
+        Positional arguments:
+            keep_last              -- the number of newest scans to keep in each group
+            keep_daily_after_days  -- optional, the age in days after which one scan per day is kept
+            keep_weekly_after_days -- optional, the age in days after which one scan per week is kept
+            now                    -- optional, the current UTC datetime
+        """
+        now = now or datetime.datetime.utcnow()
+        self.keep_last = keep_last
+        self.daily_cutoff = self.get_cutoff(now, keep_daily_after_days)
+        self.weekly_cutoff = self.get_cutoff(now, keep_weekly_after_days)
+        self._last = collections.defaultdict(list)
+        self._newest = {}
+
+    @staticmethod
+    def get_cutoff(now, days):
+        """Return the timestamp of the given number of days ago, or None if days is None."""
+        if days is None:
+            return None
+        return (now - datetime.timedelta(days=days)).strftime(TIMESTAMP_FORMAT)
+
+    def get_period(self, timestamp):
+        """Return the day or week a scan is thinned by, or None if the scan is recent."""
+        if self.weekly_cutoff and timestamp < self.weekly_cutoff:
+            year, week, _ = datetime.datetime.strptime(timestamp, TIMESTAMP_FORMAT).isocalendar()
+            return f'{year}-W{week:02d}'
+        if self.daily_cutoff and timestamp < self.daily_cutoff:
+            return timestamp[:10]
+        return None
+
+    def add(self, scan_id):
+        """Add a scan to the policy, keeping track of the newest scans of its group."""
+        timestamp, group = split_scan_id(scan_id)
+        if timestamp is None:
+            return
+        if self.keep_last:
+            last = self._last[group]
+            if len(last) < self.keep_last:
+                heapq.heappush(last, scan_id)
+            elif scan_id > last[0]:
+                heapq.heapreplace(last, scan_id)
+        period = self.get_period(timestamp)
+        if period is not None and scan_id > self._newest.get((group, period), ''):
+            self._newest[(group, period)] = scan_id
+
+    def is_kept(self, scan_id):
+        """Return True if a scan added to the policy must be kept."""
+        timestamp, group = split_scan_id(scan_id)
+        if timestamp is None or scan_id in self._last.get(group, ()):
+            return True
+        period = self.get_period(timestamp)
+        return period is None or self._newest.get((group, period)) == scan_id
+
 class ScanResultComparison:
     """A class to represent a comparison between two scan results"""
     def __init__(self, scan1, scan2, introduced, fixed):
@@ -73,10 +780,292 @@ class ScanResultComparison:
         self._introduced = introduced
         self._fixed = fixed
 
+    RECORDS_NAME = None
+
+    def get_summary(self):
+        """Return the comparison as a dictionary, see OutputWriter."""
+        return {
+            'scan1': self._scan1._stats.to_dict(),
+            'scan2': self._scan2._stats.to_dict(),
+            'introduced': self._introduced,
+            'fixed': self._fixed
+        }
+
+    def get_records(self):
+        """Return an iterator with the comparison as a single flat record, see OutputWriter."""
+        record = {}
+        for scan_name, scan in (('scan1', self._scan1), ('scan2', self._scan2)):
+            for key, value in scan._stats.to_dict().items():
+                record[f'{scan_name}_{key}'] = value
+        record['introduced'] = self._introduced
+        record['fixed'] = self._fixed
+        yield record
+
     def __repr__(self):
         """Create a string representation of a scan result comparison."""
         return f'scan1: {self._scan1._stats}\nscan2: {self._scan2._stats}\nintroduced: {self._introduced}\nfixed: {self._fixed}'
 
+class ScanDrift:
+    """A class to represent the drift of rule results across several scans."""
+    def __init__(self, scan_ids, scans, transitions, rule_changes, flapping):
+        """Initialize drift properties.
+
+        Positional arguments:
+            scan_ids     -- a list of strings representing the compared scan ids
+            scans        -- a list of ScanResult objects in the same order as scan_ids
+            transitions  -- a list of (introduced, fixed) tuples, one for each scan after the first
+            rule_changes -- a dictionary mapping each changed rule id to a (introduced, fixed) tuple
+                            of scan id lists
+            flapping     -- a list of rule ids which changed between pass and fail more than once
+        """
+        self._scan_ids = scan_ids
+        self._scans = scans
+        self._transitions = transitions
+        self._rule_changes = rule_changes
+        self._flapping = flapping
+
+    RECORDS_NAME = 'rules'
+
+    def get_lines(self):
+        """Return an iterator of the string representation's chunks: the stats and
+        transitions of each scan, the drift totals and the changes of each rule."""
+        if self._scans:
+            yield f'{self._scan_ids[0]}: {self._scans[0]._stats}\n'
+        for scan_id, scan, (introduced, fixed) in zip(self._scan_ids[1:], self._scans[1:], self._transitions):
+            yield f'{scan_id}: {scan._stats} introduced: {introduced} fixed: {fixed}\n'
+        yield '---- Drift ----\n\n'
+        yield (
+            f'introduced: {sum(t[0] for t in self._transitions)} '
+            f'fixed: {sum(t[1] for t in self._transitions)} '
+            f'flapping: {len(self._flapping)}'
+        )
+        for rule, (introduced, fixed) in sorted(self._rule_changes.items()):
+            yield f'\n\nRule: {rule}\nIntroduced: {" ".join(introduced)}\nFixed: {" ".join(fixed)}'
+        for rule in self._flapping:
+            yield f'\n\nFlapping: {rule}'
+
+    def get_summary(self):
+        """Return the stats and transitions of each scan and the drift totals as a
+        dictionary, see OutputWriter."""
+        scans = []
+        transitions = [(None, None)] + list(self._transitions)
+        for scan_id, scan, (introduced, fixed) in zip(self._scan_ids, self._scans, transitions):
+            entry = {'scan_id': scan_id}
+            entry.update(scan._stats.to_dict())
+            entry['introduced'] = introduced
+            entry['fixed'] = fixed
+            scans.append(entry)
+        return {
+            'scans': scans,
+            'introduced': sum(t[0] for t in self._transitions),
+            'fixed': sum(t[1] for t in self._transitions),
+            'flapping': list(self._flapping)
+        }
+
+    def get_records(self):
+        """Return an iterator of dictionaries, one for each changed rule, see OutputWriter."""
+        flapping = set(self._flapping)
+        for rule, (introduced, fixed) in sorted(self._rule_changes.items()):
+            yield {'rule_id': rule, 'introduced': list(introduced), 'fixed': list(fixed), 'flapping': rule in flapping}
+
+    def __repr__(self):
+        """Create a string representation of a scan drift."""
+        return ''.join(self.get_lines())
+
+class CommandOutput:
+    """A class to represent a command output streamed to a file. Iterating over it
+    reads the file lazily, one line at a time."""
+    def __init__(self, filename):
+        """Initialize the object with the file holding the output."""
+        self.filename = filename
+
+    def __iter__(self):
+        """Return an iterator of strings, each string representing a line of the output."""
+        return FileHelper.read_lines(self.filename)
+
+class ScanResultParser:
+    """A class to parse a scan result one line at a time.
+
+    The parser is a small state machine looking for the Title/Rule/Result
+    markers printed by oscap. Results are counted while rules are created,
+    so stats never depend on the content of titles or rule ids.
+    """
+    def __init__(self):
+        """Initialize parser state and an empty stats object."""
+        self.state = FIND_TITLE
+        self.title = None
+        self.rule = None
+        self.stats = ScanStats(0, 0, 0, 0)
+        self.end = 0
+
+    def feed(self, line):
+        """Consume a single line of the scan result.
+
+        Positional arguments:
+            line -- a string representing a line of the scan result.
+
+        Return value:
+            an instance of Rule class when the line completes a rule, None otherwise.
+        """
+        line = line.rstrip('\n')
+        if self.state == FIND_TITLE:
+            if line == 'Title':
+                self.state = GRAB_TITLE
+        elif self.state == GRAB_TITLE:
+            self.title = line
+            self.state = FIND_RULE
+        elif self.state == FIND_RULE:
+            if line == 'Rule':
+                self.state = GRAB_RULE
+        elif self.state == GRAB_RULE:
+            self.rule = line
+            self.state = FIND_RESULT
+        elif self.state == FIND_RESULT:
+            if line == 'Result':
+                self.state = GRAB_RESULT
+        elif self.state == GRAB_RESULT:
+            result = line.strip()
+            self.stats.add(result)
+            self.state = FIND_TITLE
+            return Rule(self.title.strip(), self.rule.strip(), result)
+        return None
+
+    def parse(self, lines):
+        """Yield Rule objects from an iterable of lines.
+
+        Positional arguments:
+            lines -- an iterable of strings representing the scan result.
+        """
+        for line in lines:
+            rule = self.feed(line)
+            if rule is not None:
+                yield rule
+        add_counter('rules_parsed', self.stats.total)
+
+    def parse_buffer(self, data, start=0, end=None):
+        """Find the rules of a whole scan result held in a bytes-like object (e.g. a mapped
+        file), with the same Title/Rule/Result logic as feed but searching the bytes for the
+        marker lines instead of going through every line, see FileHelper.find_marked_lines.
+        Only the rule ids and results are decoded. The offset where the last rule ends is
+        kept in the end attribute.
+
+        Positional arguments:
+            data  -- a bytes-like object representing the scan result.
+            start -- optional, the offset of a line where the search starts.
+            end   -- optional, only the rules starting before this offset are returned.
+
+        Return value:
+            an iterator of (title start, title end, rule id, result) tuples, where the
+            title is given by the offsets of its line.
+        """
+        for match in FileHelper.find_marked_lines(data, MARKER_LINES, start):
+            if end is not None and match.start() >= end:
+                break
+            result = match.group(3).decode(SCAN_RESULT_ENCODING).strip()
+            self.stats.add(result)
+            self.end = match.end()
+            yield match.start(1), match.end(1), match.group(2).decode(SCAN_RESULT_ENCODING).strip(), result
+        add_counter('rules_parsed', self.stats.total)
+
+class ScanProgress:
+    """A class to parse a scan output while the scan is running, reporting the running
+    stats and throughput to a callback."""
+    def __init__(self, callback=None, interval=0):
+        """Initialize the parser and an empty scan result.
+
+        Positional arguments:
+            callback -- optional, a function called with a ScanStats object and the
+                        number of rules parsed per second
+            interval -- the minimum number of seconds between two callback calls
+        """
+        self.parser = ScanResultParser()
+        self.scan_result = ScanResult([], self.parser.stats)
+        self.digest = hashlib.sha256()
+        self.callback = callback
+        self.interval = interval
+        self.start_time = time.time()
+        self.last_report_time = self.start_time
+        # the time spent parsing, without the time spent waiting for the scan output
+        self.parse_time = 0.0
+
+    def feed(self, line):
+        """Parse a line of the scan output as it arrives, updating the content hash. The line
+        may include carriage returns, which oscap uses as separators."""
+        start_time = time.perf_counter()
+        for part in line.splitlines():
+            rule = self.parser.feed(part)
+            if rule is not None:
+                self.scan_result.add_rule(rule._title, rule._rule, rule._result)
+                update_content_hash(self.digest, rule._rule, rule._result)
+        self.parse_time += time.perf_counter() - start_time
+        if self.callback and time.time() - self.last_report_time >= self.interval:
+            self.report()
+
+    def get_scan_result(self):
+        """Return the scan result parsed so far, with its content hash."""
+        self.scan_result._content_hash = self.digest.hexdigest()
+        return self.scan_result
+
+    def report(self):
+        """Call the callback with the current stats and throughput."""
+        self.last_report_time = time.time()
+        elapsed_time = self.last_report_time - self.start_time
+        rules_per_second = self.parser.stats.total / elapsed_time if elapsed_time else 0.0
+        self.callback(self.parser.stats, rules_per_second)
+
+class ReindexProgress:
+    """A class to count the scans reindexed so far and report the progress and throughput."""
+    def __init__(self, total, interval):
+        """Initialize the counts.
+
+        Positional arguments:
+            total    -- the number of scans to reindex
+            interval -- the minimum number of seconds between two progress reports
+        """
+        self.total = total
+        self.interval = interval
+        self.scans = 0
+        self.failed = 0
+        self.rules = 0
+        self.start_time = time.perf_counter()
+        self.last_report_time = self.start_time
+
+    def add(self, parsed_scans):
+        """Count the parsed scans of a chunk and report the progress if it's time to."""
+        for _, rules, _, _, error in parsed_scans:
+            if error:
+                self.failed += 1
+            else:
+                self.scans += 1
+                self.rules += len(rules)
+        if time.perf_counter() - self.last_report_time >= self.interval:
+            self.report()
+
+    def get_throughput(self):
+        """Return the (elapsed seconds, scans per second, rules per second) tuple."""
+        elapsed_time = time.perf_counter() - self.start_time
+        if not elapsed_time:
+            return elapsed_time, 0.0, 0.0
+        return elapsed_time, self.scans / elapsed_time, self.rules / elapsed_time
+
+    def report(self):
+        """Print the progress and throughput to the stderr."""
+        self.last_report_time = time.perf_counter()
+        _, scans_per_second, rules_per_second = self.get_throughput()
+        print(
+            f'reindexed {self.scans + self.failed}/{self.total} scans '
+            f'({scans_per_second:.1f} scans/s, {rules_per_second:.0f} rules/s)',
+            file=sys.stderr
+        )
+
+    def get_summary(self):
+        """Return a summary of the reindex as a string."""
+        elapsed_time, scans_per_second, _ = self.get_throughput()
+        return (
+            f'reindexed scans: {self.scans} failed: {self.failed} rules: {self.rules} '
+            f'time: {elapsed_time:.1f}s ({scans_per_second:.1f} scans/s)'
+        )
+
 class CreateScanId(Action):
     """A class to create the scan id."""
     def __init__(self, config):
@@ -112,11 +1101,14 @@ class CreateScanId(Action):
         """
         self.logger.debug('Running CreateScanId action')
         self.validate_input_values(input_data)
-        current_datetime = datetime.datetime.utcfromtimestamp(int(time.time())).strftime('%Y-%m-%d_%H:%M:%S')
+        current_datetime = datetime.datetime.utcfromtimestamp(int(time.time())).strftime(TIMESTAMP_FORMAT)
 
         scan_type = input_data[SCAN_TYPE]
         scan_subtype = input_data[SCAN_SUB_TYPE]
         input_data[SCAN_ID] = f'{current_datetime}_{scan_type}_{scan_subtype}'
+        if input_data.get(SCAN_TAG):
+            # scans running at the same time need a tag to get different ids
+            input_data[SCAN_ID] += f'_{input_data[SCAN_TAG]}'
         input_data[NEXT_ACTION] = self.config[NEXT_ACTION]
         return input_data
 
@@ -148,7 +1140,9 @@ class CompareScanResults(Action):
 
     def execute(self, input_data):
         """Retrieve two scan results from the input_data dict and calculate the number of
-        fixed/introduced results diff between both scans.
+        fixed/introduced results diff between both scans. Scans with the same content hash
+        have no changes, and scans of the same delta chain in the scan store are compared
+        using the stored changes only.
 
         Positional arguments:
             input_data -- a dictionary including all inputs required for the action.
@@ -160,10 +1154,58 @@ class CompareScanResults(Action):
         self.validate_input_values(input_data)
         scan_result_1 = input_data[self.config[SCAN_RESULT_1_KEY_NAME]]
         scan_result_2 = input_data[self.config[SCAN_RESULT_2_KEY_NAME]]
-        input_data[self.config[OUTPUT_KEY_NAME]] = self.calculate_fixed_introduced_results_diff(scan_result_1, scan_result_2)
+        start_time = time.perf_counter()
+        comparison = self.compare_content_hashes(scan_result_1, scan_result_2)
+        method = 'hash'
+        if comparison is None:
+            comparison = self.compare_stored_scan_results(scan_result_1, scan_result_2)
+            method = 'store'
+        if comparison is None:
+            comparison = self.calculate_fixed_introduced_results_diff(scan_result_1, scan_result_2)
+            method = 'rules'
+        metrics.COMPARISONS.inc(labels=(method,))
+        metrics.COMPARISON_DURATION.observe(time.perf_counter() - start_time, (method,))
+        input_data[self.config[OUTPUT_KEY_NAME]] = comparison
         input_data[NEXT_ACTION] = self.config[NEXT_ACTION]
         return input_data
 
+    def compare_content_hashes(self, oldest_scan, newest_scan):
+        """Compare two scans by their content hashes, if both are already known (i.e. they
+        were saved with the scans or computed while the scan was running). Scans with the
+        same hash have the same rule results, so nothing is parsed or loaded.
+
+        Return value:
+            An instance of ScanResultComparison class without changes, or None if the hashes
+            are unknown or different.
+        """
+        if oldest_scan._content_hash is None or oldest_scan._content_hash != newest_scan._content_hash:
+            return None
+        self.logger.debug('Scans have the same content hash')
+        return ScanResultComparison(oldest_scan, newest_scan, 0, 0)
+
+    def compare_stored_scan_results(self, oldest_scan, newest_scan):
+        """Compare two scans using the changes kept by the scan store, without loading
+        their rules.
+
+        Return value:
+            An instance of ScanResultComparison class, or None if the scans are not in
+            the same delta chain of a scan store.
+        """
+        if not (isinstance(oldest_scan, StoredScanResult) and isinstance(newest_scan, StoredScanResult)):
+            return None
+        if oldest_scan._store.filename != newest_scan._store.filename:
+            return None
+        try:
+            counts = oldest_scan._store.compare(oldest_scan._scan_id, newest_scan._scan_id)
+        except sqlite3.Error:
+            self.logger.warning('Unable to compare scans using the scan store', exc_info=1)
+            return None
+        if counts is None:
+            return None
+        self.logger.debug('Calculated fixed/introduced results diff from stored changes')
+        introduced_count, fixed_count = counts
+        return ScanResultComparison(oldest_scan, newest_scan, introduced_count, fixed_count)
+
     def calculate_fixed_introduced_results_diff(self, oldest_scan, newest_scan):
         """Count how many 'fail' results from oldest scan are fixed in newest scan and how
         many 'pass' results are failing.
@@ -178,24 +1220,136 @@ class CompareScanResults(Action):
         self.logger.debug('Calculating fixed/introduced results diff between scans')
         fixed_count = 0
         introduced_count = 0
-        newest_scan_rules_result = {rule._rule: rule._result for rule in newest_scan._rules}
-        for rule in oldest_scan._rules:
-            if rule._result == 'pass':
-                try:
-                    if newest_scan_rules_result[rule._rule] == 'fail':
-                        introduced_count += 1
-                except:
-                    pass
-            elif rule._result == 'fail':
-                try:
-                    if newest_scan_rules_result[rule._rule] == 'pass':
-                        fixed_count += 1
-                except:
+        newest_scan_results = newest_scan.get_results_by_rule()
+        for rule, result in zip(oldest_scan._rule_ids.indexes, oldest_scan._results):
+            if result == PASS_CODE:
+                if newest_scan_results.get(rule) == FAIL_CODE:
+                    introduced_count += 1
+            elif result == FAIL_CODE:
+                # a failing rule missing from the newest scan counts as fixed
+                if newest_scan_results.get(rule, PASS_CODE) == PASS_CODE:
                     fixed_count += 1
         return ScanResultComparison(oldest_scan, newest_scan, introduced_count, fixed_count)
 
+class CompareScanDrift(Action):
+    """A class to compare the rule results of many scans."""
+    def __init__(self, config):
+        """Initialize action with a given configuration dictionary."""
+        self.config = config
+        self.logger = logging.getLogger()
+        self.validate_config()
+
+    def validate_config(self):
+        """Verify that required config values are present in config dict."""
+        try:
+            self.config[NEXT_ACTION]
+            self.config[SCAN_RESULTS_KEY_NAME]
+            self.config[OUTPUT_KEY_NAME]
+        except KeyError as e:
+            raise ActionError(f'Invalid action config: missing required setting {e}')
+
+    def validate_input_values(self, input_data):
+        """Verify that required input values are present in input_data dict."""
+        try:
+            input_data[self.config[SCAN_RESULTS_KEY_NAME]]
+        except KeyError as e:
+            raise ActionError(f'Action error: missing required input value {e}')
+
+    def execute(self, input_data):
+        """Retrieve a list of (scan id, scan result) tuples from the input_data dict and
+        calculate the drift of every rule across the scans.
+
+        Positional arguments:
+            input_data -- a dictionary including all inputs required for the action.
+
+        Return value:
+            a dictionary including the action's output and all previous inputs.
+        """
+        self.logger.debug('Running CompareScanDrift action')
+        self.validate_input_values(input_data)
+        scan_results = input_data[self.config[SCAN_RESULTS_KEY_NAME]]
+        input_data[self.config[OUTPUT_KEY_NAME]] = self.calculate_drift(
+            [scan_id for scan_id, _ in scan_results],
+            [scan_result for _, scan_result in scan_results]
+        )
+        input_data[NEXT_ACTION] = self.config[NEXT_ACTION]
+        return input_data
+
+    def build_result_matrix(self, scans):
+        """Align all the scans on a shared rule index.
+
+        Positional arguments:
+            scans -- a list of ScanResult objects
+
+        Return value:
+            a (rule ids, rows) tuple, where each row is a bytes object holding the result
+            code of every rule in a scan (MISSING_CODE if the scan doesn't include the rule).
+        """
+        rule_index = {}
+        for scan in scans:
+            for rule in scan._rule_ids:
+                rule_index.setdefault(rule, len(rule_index))
+        rows = []
+        for scan in scans:
+            row = bytearray([MISSING_CODE]) * len(rule_index)
+            for position, code in zip(map(rule_index.__getitem__, scan._rule_ids), scan._results):
+                row[position] = code
+            rows.append(bytes(row))
+        return list(rule_index), rows
+
+    def calculate_drift(self, scan_ids, scans):
+        """Count fixed/introduced results between each pair of consecutive scans, and
+        find the scans introducing or fixing each rule and the rules flapping between
+        pass and fail. Follows the same rules as CompareScanResults: a failing rule
+        missing from the next scan counts as fixed.
+
+        Positional arguments:
+            scan_ids -- a list of strings representing the scan ids, oldest first
+            scans    -- a list of ScanResult objects in the same order
+
+        Return value:
+            an instance of ScanDrift class.
+        """
+        self.logger.debug(f'Calculating drift across {len(scans)} scans')
+        rules, rows = self.build_result_matrix(scans)
+
+        transitions = []
+        for previous_row, row in zip(rows, rows[1:]):
+            counts = collections.Counter(zip(previous_row, row))
+            transitions.append((
+                counts[(PASS_CODE, FAIL_CODE)],
+                counts[(FAIL_CODE, PASS_CODE)] + counts[(FAIL_CODE, MISSING_CODE)]
+            ))
+
+        rule_changes = {}
+        flapping = []
+        for rule, column in zip(rules, map(bytes, zip(*rows))):
+            if column.count(column[0]) == len(column):
+                continue
+            pass_fail = column.translate(None, NOT_PASS_FAIL_CODES)
+            if pass_fail.count(PASS_FAIL_CODES) + pass_fail.count(PASS_FAIL_CODES[::-1]) > 1:
+                flapping.append(rule)
+            introduced = []
+            fixed = []
+            for scan_id, previous_code, code in zip(scan_ids[1:], column, column[1:]):
+                if previous_code == PASS_CODE and code == FAIL_CODE:
+                    introduced.append(scan_id)
+                elif previous_code == FAIL_CODE and code in (PASS_CODE, MISSING_CODE):
+                    fixed.append(scan_id)
+            if introduced or fixed:
+                rule_changes[rule] = (introduced, fixed)
+
+        return ScanDrift(scan_ids, scans, transitions, rule_changes, flapping)
+
 class GetScanResult(Action):
     """A class to retrieve a scan result from the file system."""
+    # parsed scan results shared by all the instances, useful for long running processes
+    _memory_cache = collections.OrderedDict()
+    _memory_cache_lock = threading.Lock()
+    # worker processes parsing the scan files, started once and shared by all the instances
+    _parse_pool = None
+    _parse_pool_lock = threading.Lock()
+
     def __init__(self, config):
         """Initialize the action with the given config."""
         self.config = config
@@ -236,77 +1390,379 @@ class GetScanResult(Action):
         input_data[NEXT_ACTION] = self.config[NEXT_ACTION]
         return input_data
     
-    def parse_result(self, scan_result_str):
-        """Create a list of Result objects from scan result string."""
-        state = 'find_title'
-        title = None
-        rule = None
-        result = None
-        rules = []
-
-        for line in scan_result_str.split('\n'):
-            if state == 'find_title':
-                if line == 'Title':
-                    state = 'grab_title'
-            elif state == 'grab_title':
-                title = line
-                state = 'find_rule'
-            elif state == 'find_rule':
-                if line == 'Rule':
-                    state = 'grab_rule'
-            elif state == 'grab_rule':
-                rule = line
-                state = 'find_result'
-            elif state == 'find_result':
-                if line == 'Result':
-                    state = 'grab_result'
-            elif state == 'grab_result':
-                result = line
-                rules.append(Rule(title.strip(), rule.strip(), result.strip()))
-                state = 'find_title'
-
-        return rules
-
     def get_scan_result(self, scan_id):
+        """Loads a scan result by scan id. If a scan store is configured the parsed scan
+        is loaded from it, otherwise the scan file is parsed and, if possible, added
+        to the store so the text is never parsed again. If memory_cache_entries is set,
+        the last scan results are also kept in memory.
+
+        Positional arguments:
+            scan_id -- a string representing a scan id
+
+        Result:
+            an instance of ScanResult class.
+        """
+        memory_cache_key = None
+        if self.config.get(MEMORY_CACHE_ENTRIES):
+            memory_cache_key = self.get_memory_cache_key(scan_id)
+            with GetScanResult._memory_cache_lock:
+                if memory_cache_key in GetScanResult._memory_cache:
+                    GetScanResult._memory_cache.move_to_end(memory_cache_key)
+                    metrics.CACHE_REQUESTS.inc(labels=('memory', 'hit'))
+                    return GetScanResult._memory_cache[memory_cache_key]
+            metrics.CACHE_REQUESTS.inc(labels=('memory', 'miss'))
+
+        scan_result = self.load_scan_result(scan_id)
+        if memory_cache_key:
+            with GetScanResult._memory_cache_lock:
+                GetScanResult._memory_cache[memory_cache_key] = scan_result
+                while len(GetScanResult._memory_cache) > self.config[MEMORY_CACHE_ENTRIES]:
+                    GetScanResult._memory_cache.popitem(last=False)
+        return scan_result
+
+    def load_scan_result(self, scan_id):
+        """Load a scan result from the scan store or from its scan file, see get_scan_result."""
+        store = self.get_store()
+        if store:
+            scan_result = self.get_stored_scan_result(store, scan_id)
+            metrics.CACHE_REQUESTS.inc(labels=('store', 'hit' if scan_result is not None else 'miss'))
+            if scan_result is not None:
+                return scan_result
+
+        scan_result = self.parse_scan_file(scan_id)
+        if store:
+            self.store_scan_result(store, scan_id, scan_result)
+        return scan_result
+
+    def get_memory_cache_key(self, scan_id):
+        """Return a key identifying the current version of a scan for the in-memory cache."""
+        file_name = get_scan_file_name(self.config[PATH], scan_id)
+        try:
+            return (file_name, ScanCache.get_key(file_name))
+        except OSError:
+            return (file_name, None)
+
+    def parse_scan_file(self, scan_id):
         """Creates a file path using a given scan id and a path from the action's config.
-        Passes the file path to a helper class to retrieve the file content as a string.
+        Streams the file content line by line through a parser that computes rules and
+        stats in a single pass. If the file was compacted into an archive, the scan is
+        read from the archive.
 
         Positional arguments:
             scan_id -- a string representing a scan id
 
         Result:
-            a string representing the file content.
+            an instance of ScanResult class.
         """
         self.logger.debug('Fetching scan result from file system')
-        file_name = f"{self.config[PATH]}{scan_id}.txt"
+        file_name = get_scan_file_name(self.config[PATH], scan_id)
+        cache = self.get_cache()
+        if cache:
+            scan_result = self.get_cached_scan_result(cache, file_name)
+            metrics.CACHE_REQUESTS.inc(labels=('disk', 'hit' if scan_result else 'miss'))
+            if scan_result:
+                return scan_result
+
+        if not os.path.exists(file_name) and os.path.exists(get_archive_name(self.config[PATH], scan_id)):
+            return self.parse_archived_scan(scan_id)
+
+        start_time = time.perf_counter()
         try:
-            scan_result_str = FileHelper.read(file_name)
-        except:
+            scan_result = self.read_scan_file(file_name)
+        except OSError:
             raise ActionError(f"Action error: can't retrieve content from {file_name}")
+        self.count_parsed_rules('file', scan_result._stats, start_time)
+
+        if cache:
+            self.cache_scan_result(cache, file_name, scan_result)
+        return scan_result
+
+    def read_scan_file(self, file_name):
+        """Parse a scan result file, see read_scan_file. If the config enables parallel_parse,
+        the file is parsed in the parse pool: a plain file bigger than parse_chunk_bytes is
+        split into ranges starting at a Title line, which are parsed in parallel and merged
+        in order, other files are parsed by a single worker. Either way, the scans loaded by
+        concurrent actions are parsed on different cores.
+
+        Positional arguments:
+            file_name -- a string representing the file's absolute path
+
+        Result:
+            an instance of ScanResult class.
+        """
+        if not self.config.get(PARALLEL_PARSE):
+            return read_scan_file(file_name)
+        key = ScanCache.get_key(file_name)
+        data = FileHelper.map_file(file_name)
+        ranges = []
+        if data is not None:
+            with data:
+                ranges = FileHelper.split_at_lines(
+                    data, TITLE_LINE, self.config.get(PARSE_CHUNK_BYTES, DEFAULT_PARSE_CHUNK_BYTES)
+                )
+        try:
+            pool = self.get_parse_pool()
+            if len(ranges) < 2:
+                return pool.submit(read_scan_file, file_name).result()
+            futures = [pool.submit(parse_scan_range, file_name, start, end) for start, end in ranges]
+            scan_result = self.merge_scan_ranges(file_name, key, ranges, futures)
+        except concurrent.futures.process.BrokenProcessPool:
+            self.logger.warning('The parse pool was terminated, parsing in this process', exc_info=1)
+            with GetScanResult._parse_pool_lock:
+                GetScanResult._parse_pool = None
+            return read_scan_file(file_name)
+        if scan_result is None:
+            self.logger.warning(f'{file_name} changed or has a rule across parse ranges, parsing it again')
+            return read_scan_file(file_name)
+        add_counter('parse_ranges', len(ranges))
+        return scan_result
+
+    def get_parse_pool(self):
+        """Return the process pool parsing the scan files, created on first use with
+        parse_workers processes (the number of cores by default) and kept for the life of
+        the process, e.g. across the requests of the server."""
+        with GetScanResult._parse_pool_lock:
+            if GetScanResult._parse_pool is None:
+                max_workers = int(self.config.get(PARSE_WORKERS) or os.cpu_count() or 1)
+                GetScanResult._parse_pool = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+            return GetScanResult._parse_pool
+
+    def start_parse_pool(self):
+        """Create the parse pool and wait for its worker processes to start, e.g. before a
+        process starts other threads, see Server.start_parse_pool."""
+        self.get_parse_pool().submit(os.getpid).result()
+
+    @staticmethod
+    def shutdown_parse_pool():
+        """Stop the worker processes of the parse pool, e.g. when the server stops. The pool
+        is created again if used afterwards."""
+        with GetScanResult._parse_pool_lock:
+            pool, GetScanResult._parse_pool = GetScanResult._parse_pool, None
+        if pool is not None:
+            pool.shutdown()
+
+    def merge_scan_ranges(self, file_name, key, ranges, futures):
+        """Merge the rules parsed from the ranges of a scan result file, in order.
+
+        Positional arguments:
+            file_name -- a string representing the file's absolute path
+            key       -- the ScanCache key of the file when it was split
+            ranges    -- a list of (start, end) offsets
+            futures   -- a list of futures of parse_scan_range results, one per range
 
-        rules = self.parse_result(scan_result_str)
-        scan_stats = self.get_scan_stats(scan_result_str)
-        return ScanResult(rules, scan_stats)
+        Result:
+            an instance of ScanResult class, or None if the file changed while it was parsed
+            or a rule started in a range and ended in the next one (e.g. a title line
+            reading "Title"), in which case the ranges don't give the rules a sequential
+            parse would find.
+        """
+        scan_result = ScanResult([], None)
+        starts = array('Q')
+        ends = array('Q')
+        stats = [0, 0, 0, 0]
+        previous_end = 0
+        for (start, _), future in zip(ranges, futures):
+            (
+                range_key, range_starts, range_ends, rule_ids, results, other_results, range_stats, range_end
+            ) = future.result()
+            if range_key != key or previous_end > start:
+                return None
+            previous_end = range_end
+            starts.extend(range_starts)
+            ends.extend(range_ends)
+            if rule_ids:
+                scan_result._rule_ids.extend(rule_ids.split('\n'))
+            offset = len(scan_result._results)
+            scan_result._other_results.update((offset + position, result) for position, result in other_results.items())
+            scan_result._results.extend(results)
+            stats = [total + count for total, count in zip(stats, range_stats)]
+        scan_result._stats = ScanStats(*stats)
+        scan_result._titles = MappedTitles(file_name, key, starts, ends)
+        return scan_result
+
+    def parse_archived_scan(self, scan_id):
+        """Parse a scan result compacted into an archive by CollectScanResults, streaming
+        the archive member through the parser.
+
+        Positional arguments:
+            scan_id -- a string representing a scan id
+
+        Result:
+            an instance of ScanResult class.
+        """
+        self.logger.debug('Fetching scan result from archive')
+        archive_name = get_archive_name(self.config[PATH], scan_id)
+        parser = ScanResultParser()
+        start_time = time.perf_counter()
+        try:
+            lines = FileHelper.read_archive_lines(archive_name, f'{scan_id}{SCAN_RESULT_EXTENSION}')
+            scan_result = ScanResult(parser.parse(lines), parser.stats)
+        except (OSError, KeyError, zipfile.BadZipFile):
+            raise ActionError(f"Action error: can't retrieve {scan_id} from {archive_name}")
+        self.count_parsed_rules('archive', parser.stats, start_time)
+        return scan_result
 
-    def get_scan_stats(self, scan_result_str):
-        """Uses a regular expression to extract all instances of a word (pass, fail, notapplicable)
-        in a string, then counts the repetitions of each word and returns an object with the results.
+    def count_parsed_rules(self, source, stats, start_time):
+        """Update the parse throughput metrics after parsing a scan result.
 
         Positional arguments:
-            scan_result_str -- a string representing a scan result
+            source     -- a string representing where the scan was read from (file, archive)
+            stats      -- an instance of ScanStats class with the parsed scan stats
+            start_time -- the time.perf_counter() value taken when the parse started
+        """
+        metrics.RULES_PARSED.inc(stats.total, (source,))
+        metrics.PARSE_DURATION.inc(time.perf_counter() - start_time, (source,))
+
+    def get_cache(self):
+        """Create a ScanCache instance if the action's config includes a cache path.
+
+        Return value:
+            an instance of ScanCache class or None.
+        """
+        if CACHE_PATH not in self.config:
+            return None
+        try:
+            return ScanCache(self.config[CACHE_PATH], self.config.get(CACHE_MAX_BYTES, DEFAULT_CACHE_MAX_BYTES))
+        except OSError:
+            self.logger.warning(f"Can't open scan cache {self.config[CACHE_PATH]}", exc_info=1)
+            return None
+
+    def get_cached_scan_result(self, cache, file_name):
+        """Load a parsed scan result from the cache.
+
+        Return value:
+            an instance of ScanResult class or None if the file is not cached or the entry is stale.
+        """
+        try:
+            cached = cache.get(file_name)
+        except OSError:
+            return None
+        if cached is None:
+            return None
+        self.logger.debug('Using cached scan result')
+        stats, rules = cached
+        return ScanResult((Rule(title, rule, result) for title, rule, result in rules), ScanStats(*stats))
+
+    def cache_scan_result(self, cache, file_name, scan_result):
+        """Save a parsed scan result in the cache."""
+        try:
+            cache.put(file_name, (scan_result._stats.to_tuple(), list(scan_result.get_rule_tuples())))
+        except OSError:
+            self.logger.warning(f"Can't save {file_name} in scan cache", exc_info=1)
+
+    def get_store(self):
+        """Create a ScanStore instance if the action's config includes a store file.
+
+        Return value:
+            an instance of ScanStore class or None.
+        """
+        if STORE not in self.config:
+            return None
+        try:
+            return ScanStore(self.config[STORE])
+        except (OSError, sqlite3.Error):
+            raise ActionError(f"Action error: can't open scan store {self.config[STORE]}")
+
+    def get_stored_scan_result(self, store, scan_id):
+        """Load a parsed scan result from the scan store. The rules are only loaded when
+        they are used.
 
         Return value:
-            a dictionary including the counts for each word.
+            an instance of StoredScanResult class or None if the scan is not in the store.
         """
-        self.logger.debug('Creating stats object for scan result')
-        pass_count = len(re.findall(PASS_SCAN_RESULT, scan_result_str))
-        fail_count = len(re.findall(FAIL_SCAN_RESULT, scan_result_str))
-        na_count = len(re.findall(NA_SCAN_RESULT, scan_result_str))
-        total_count = pass_count + fail_count + na_count
-        return ScanStats(pass_count, fail_count, na_count, total_count)
+        self.logger.debug('Fetching scan result from scan store')
+        try:
+            stats = store.get_stats(scan_id)
+            if stats is None:
+                return None
+            content_hash = store.get_content_hash(scan_id)
+        except sqlite3.Error:
+            raise ActionError(f"Action error: can't retrieve {scan_id} from scan store")
+        return StoredScanResult(store, scan_id, ScanStats(*stats), content_hash)
+
+    def store_scan_result(self, store, scan_id, scan_result):
+        """Save a parsed scan result in the scan store."""
+        self.logger.debug('Saving parsed scan result in scan store')
+        try:
+            store.save_scan(
+                scan_id,
+                scan_result.get_rule_tuples(),
+                scan_result._stats.to_tuple(),
+                content_hash=scan_result.get_content_hash()
+            )
+        except sqlite3.Error:
+            self.logger.warning(f"Can't save {scan_id} in scan store", exc_info=1)
+
+class GetScanResults(GetScanResult):
+    """A class to retrieve many scan results, selected by scan id or by date range."""
+    def validate_config(self):
+        """Verify that required config values are present in config dict."""
+        try:
+            self.config[NEXT_ACTION]
+            self.config[SCAN_IDS_KEY_NAME]
+            self.config[OUTPUT_KEY_NAME]
+            self.config[PATH]
+        except KeyError as e:
+            raise ActionError(f'Invalid action config: missing required setting {e}')
+
+    def validate_input_values(self, input_data):
+        """Verify that required input values are present in input_data dict."""
+        try:
+            input_data[self.config[SCAN_IDS_KEY_NAME]]
+        except KeyError as e:
+            raise ActionError(f'Action error: missing required input value {e}')
+
+    def execute(self, input_data):
+        """Loads the scan results listed in the input_data object or, if no scan ids
+        are given, all the scans between the since/until dates. Puts a list of
+        (scan id, scan result) tuples in the input_data dictionary.
+
+        Positional arguments:
+            input_data -- a dictionary including all inputs required for the action.
+
+        Return value:
+            a dictionary including the action's output and all previous inputs.
+        """
+        self.logger.debug('Running GetScanResults action')
+        self.validate_input_values(input_data)
+        scan_ids = input_data[self.config[SCAN_IDS_KEY_NAME]]
+        if not scan_ids:
+            scan_ids = self.get_scan_ids(input_data.get(SINCE), input_data.get(UNTIL))
+        input_data[self.config[OUTPUT_KEY_NAME]] = [(scan_id, self.get_scan_result(scan_id)) for scan_id in scan_ids]
+        input_data[NEXT_ACTION] = self.config[NEXT_ACTION]
+        return input_data
+
+    def get_scan_ids(self, since, until):
+        """List the scan ids in the scan results directory and the scan store whose
+        timestamp is within the given dates. Scan ids start with a
+        '%Y-%m-%d_%H:%M:%S' timestamp, so dates can be given with any precision.
+
+        Positional arguments:
+            since -- a string representing the first date, or None
+            until -- a string representing the last date (inclusive), or None
+
+        Return value:
+            a sorted list of strings representing scan ids.
+        """
+        self.logger.debug('Fetching scan ids by date range')
+        try:
+            scan_ids = {get_scan_id(file_name) for file_name in FileHelper.get_files_from_dir(self.config[PATH])}
+            scan_ids.discard(None)
+        except OSError:
+            raise ActionError(f"Action error: can't retrieve content from {self.config[PATH]}")
+        store = self.get_store()
+        if store:
+            try:
+                scan_ids.update(store.get_scan_ids())
+            except sqlite3.Error:
+                raise ActionError(f"Action error: can't retrieve scan ids from scan store")
+        return sorted(
+            scan_id for scan_id in scan_ids
+            if (not since or scan_id >= since) and (not until or scan_id[:len(until)] <= until)
+        )
 
 class GetScanHistory(Action):
-    """A class to retrieve scan history from the file system."""
+    """A class to retrieve scan history from the file system or from the history index."""
     def __init__(self, config):
         """Initialize the action with a given configuration dictionary."""
         self.config = config
@@ -323,8 +1779,10 @@ class GetScanHistory(Action):
             raise ActionError(f'Invalid action config: missing required setting {e}')
     
     def execute(self, input_data):
-        """Retrieves the scan history from the file system and adds all the
-        file names to the input_data object.
+        """Retrieves the scan history and adds it to the input_data object. If the
+        config includes a history index, the history is queried from the index using
+        the filters in input_data (since, until, type, sort, reverse, limit and offset),
+        otherwise all the file names in the scan results directory are listed.
 
         Positional arguments:
             input_data -- a dictionary including all inputs required for the action.
@@ -333,23 +1791,401 @@ class GetScanHistory(Action):
             a dictionary including the action's output and all previous inputs.
         """
         self.logger.debug('Running GetScanHistory action')
-        file_names = self.get_file_names()
-        input_data[self.config[OUTPUT_KEY_NAME]] = file_names
+        if HISTORY_INDEX in self.config:
+            history = self.get_history(input_data)
+        elif any(input_data.get(key) for key in HISTORY_FILTERS):
+            raise ActionError('Action error: filtering the scan history requires a history index')
+        else:
+            history = self.get_file_names()
+        input_data[self.config[OUTPUT_KEY_NAME]] = history
         input_data[NEXT_ACTION] = self.config[NEXT_ACTION]
         return input_data
     
     def get_file_names(self):
-        """Use a helper class to list all files in a given path.
+        """Use a helper class to list all the scan result files in a given path. Compressed
+        files are listed by their plain name.
 
         Return value:
-            a list of strings representing each file in the path.
+            a list of strings representing each scan result file in the path.
         """
         self.logger.debug('Fetching file names from directory')
         try:
-            return FileHelper.get_files_from_dir(self.config[PATH])
+            scan_ids = map(get_scan_id, FileHelper.get_files_from_dir(self.config[PATH]))
+            return sorted(f'{scan_id}{SCAN_RESULT_EXTENSION}' for scan_id in scan_ids if scan_id)
         except:
             raise ActionError(f"Action error: can't retrieve content from {self.config[PATH]}")
 
+    def get_history(self, input_data):
+        """Query the history index, adding the scan results directory to the index first
+        if it wasn't indexed yet.
+
+        Return value:
+            a list of ScanHistoryEntry objects.
+        """
+        self.logger.debug('Fetching scan history from history index')
+        filters = self.get_filters(input_data)
+        try:
+            index = ScanHistoryIndex(self.config[HISTORY_INDEX])
+            if not index.is_indexed(self.config[PATH]):
+                self.rebuild_index(index)
+            rows = index.query(**filters)
+        except (OSError, sqlite3.Error):
+            raise ActionError(f"Action error: can't retrieve scan history from {self.config[HISTORY_INDEX]}")
+        return [ScanHistoryEntry(row[0], row[2], row[3], row[4], ScanStats(*row[5:])) for row in rows]
+
+    def get_filters(self, input_data):
+        """Build the history index query arguments from the input_data dictionary. The scan
+        type filter can include the subtype (e.g. xccdf-1).
+
+        Return value:
+            a dictionary of ScanHistoryIndex.query keyword arguments.
+        """
+        scan_type, _, scan_subtype = (input_data.get(SCAN_TYPE_FILTER) or '').partition('-')
+        sort = input_data.get(SORT) or DEFAULT_SORT
+        if sort not in SORT_COLUMNS:
+            raise ActionError(f'Action error: invalid sort field {sort}, expected one of {", ".join(SORT_COLUMNS)}')
+        try:
+            limit = int(input_data[LIMIT]) if input_data.get(LIMIT) is not None else None
+            offset = int(input_data.get(OFFSET) or 0)
+        except ValueError as e:
+            raise ActionError(f'Action error: invalid limit or offset value: {e}')
+        return {
+            'since': input_data.get(SINCE),
+            'until': input_data.get(UNTIL),
+            'scan_type': scan_type or None,
+            'scan_subtype': scan_subtype or None,
+            'sort': sort,
+            'reverse': input_data.get(REVERSE) in TRUE_VALUES,
+            'limit': limit,
+            'offset': offset
+        }
+
+    def rebuild_index(self, index):
+        """Add the scan result files missing from the history index, then mark the scan
+        results directory as indexed. Entries are generated one at a time while they are
+        written, so memory doesn't grow with the number of files.
+
+        Positional arguments:
+            index -- an instance of ScanHistoryIndex class.
+        """
+        self.logger.info(f'Adding {self.config[PATH]} to the history index')
+        index.add_scans(self.get_missing_entries(index.get_scan_ids()))
+        index.set_indexed(self.config[PATH])
+
+    def get_missing_entries(self, indexed_scan_ids):
+        """List the scan results directory with os.scandir and yield an index entry for each
+        scan result file not yet indexed. The stats are taken from the scan store if the
+        config includes one and the scan is stored, otherwise the file is parsed.
+
+        Positional arguments:
+            indexed_scan_ids -- a set of strings representing the scan ids already indexed.
+
+        Return value:
+            an iterator of (scan id, file name, stats) tuples.
+        """
+        store = ScanStore(self.config[STORE]) if STORE in self.config else None
+        with os.scandir(self.config[PATH]) as entries:
+            for entry in entries:
+                scan_id = get_scan_id(entry.name)
+                if scan_id is None or scan_id in indexed_scan_ids or not entry.is_file():
+                    continue
+                stats = store.get_stats(scan_id) if store else None
+                if stats is None:
+                    stats = read_scan_file(entry.path)._stats.to_tuple()
+                yield scan_id, entry.name, stats
+
+class QueryRuleResults(Action):
+    """A class to query the results of rules across the saved scans from the rule index,
+    without loading any scan."""
+    def __init__(self, config):
+        """Initialize the action with a given configuration dictionary."""
+        self.config = config
+        self.logger = logging.getLogger()
+        self.validate_config()
+
+    def validate_config(self):
+        """Verify that required config values are present in config dict."""
+        try:
+            self.config[NEXT_ACTION]
+            self.config[OUTPUT_KEY_NAME]
+            self.config[RULE_INDEX]
+        except KeyError as e:
+            raise ActionError(f'Invalid action config: missing required setting {e}')
+
+    def execute(self, input_data):
+        """Queries the rule index using the filters in input_data: the rules (rule_id,
+        prefix, regex, title), the result and the scans (since, until, type). With last,
+        only the newest matching result of each rule is kept. With every, the rules with
+        the given result in every matching scan that evaluated them are returned instead.
+        If the config includes a store, its scans are added to the rule index first if
+        they weren't added yet.
+
+        Positional arguments:
+            input_data -- a dictionary including all inputs required for the action.
+
+        Return value:
+            a dictionary including the action's output and all previous inputs.
+        """
+        self.logger.debug('Running QueryRuleResults action')
+        filters = self.get_filters(input_data)
+        try:
+            index = RuleIndex(self.config[RULE_INDEX])
+            if STORE in self.config and not index.is_indexed(self.config[STORE]):
+                self.rebuild_index(index)
+            rows = index.query(**filters)
+        except (OSError, sqlite3.Error) as e:
+            raise ActionError(f"Action error: can't query rule index {self.config[RULE_INDEX]}: {e}")
+        entry_class = RuleSummaryEntry if filters['every'] else RuleResultEntry
+        input_data[self.config[OUTPUT_KEY_NAME]] = [entry_class(*row) for row in rows]
+        input_data[NEXT_ACTION] = self.config[NEXT_ACTION]
+        return input_data
+
+    def get_filters(self, input_data):
+        """Build the rule index query arguments from the input_data dictionary. The scan
+        type filter can include the subtype (e.g. xccdf-1).
+
+        Return value:
+            a dictionary of RuleIndex.query keyword arguments.
+        """
+        scan_type, _, scan_subtype = (input_data.get(SCAN_TYPE_FILTER) or '').partition('-')
+        every = input_data.get(EVERY) in TRUE_VALUES
+        if every and not input_data.get(RESULT_FILTER):
+            raise ActionError(f'Action error: {EVERY} requires a {RESULT_FILTER} filter')
+        if input_data.get(REGEX):
+            try:
+                re.compile(input_data[REGEX])
+            except re.error as e:
+                raise ActionError(f'Action error: invalid regular expression {input_data[REGEX]}: {e}')
+        try:
+            limit = int(input_data[LIMIT]) if input_data.get(LIMIT) is not None else None
+        except ValueError as e:
+            raise ActionError(f'Action error: invalid limit value: {e}')
+        return {
+            'rule_id': input_data.get(RULE_ID_FILTER),
+            'prefix': input_data.get(PREFIX),
+            'pattern': input_data.get(REGEX),
+            'title': input_data.get(TITLE_FILTER),
+            'result': input_data.get(RESULT_FILTER),
+            'since': input_data.get(SINCE),
+            'until': input_data.get(UNTIL),
+            'scan_type': scan_type or None,
+            'scan_subtype': scan_subtype or None,
+            'last': input_data.get(LAST) in TRUE_VALUES,
+            'every': every,
+            'limit': limit
+        }
+
+    def rebuild_index(self, index):
+        """Add the stored scans missing from the rule index, then mark the store as
+        indexed. Scans are loaded from the store one at a time while they are written.
+
+        Positional arguments:
+            index -- an instance of RuleIndex class.
+        """
+        self.logger.info(f'Adding {self.config[STORE]} to the rule index')
+        store = ScanStore(self.config[STORE])
+        indexed_scan_ids = index.get_scan_ids()
+        index.add_scans(
+            (scan_id, store.get_rules(scan_id))
+            for scan_id in store.get_scan_ids() if scan_id not in indexed_scan_ids
+        )
+        index.set_indexed(self.config[STORE])
+
+class CollectScanResults(Action):
+    """A class to apply the retention policy to the scan results directory. Scans that are
+    not kept are compacted into monthly compressed archives, which GetScanResult can still
+    read by scan id, and the oldest archives are removed while the directory is bigger
+    than max_bytes. Temporary files left by interrupted runs (e.g. a killed scan) are
+    removed once they are remove_temp_after_hours old."""
+    def __init__(self, config):
+        """Initialize the action with a given configuration dictionary."""
+        self.config = config
+        self.logger = logging.getLogger()
+        self.validate_config()
+
+    def validate_config(self):
+        """Verify that required config values are present in config dict."""
+        try:
+            self.config[NEXT_ACTION]
+            self.config[OUTPUT_KEY_NAME]
+            self.config[PATH]
+            self.config[RETENTION]
+        except KeyError as e:
+            raise ActionError(f'Invalid action config: missing required setting {e}')
+        if self.config.get(COMPRESSION, DEFAULT_ARCHIVE_COMPRESSION) not in COMPRESSION_EXTENSIONS:
+            raise ActionError(f'Action error: unknown compression {self.config[COMPRESSION]}')
+
+    def execute(self, input_data):
+        """Removes the old temporary files, archives the scans that the retention policy
+        doesn't keep, then removes the oldest archives if the directory exceeds max_bytes.
+        The directory is listed twice with
+        os.scandir instead of being loaded in memory. If dry_run is set in input_data,
+        nothing is changed. Puts a summary in the input_data dictionary.
+
+        Positional arguments:
+            input_data -- a dictionary including all inputs required for the action.
+
+        Return value:
+            a dictionary including the action's output and all previous inputs.
+        """
+        self.logger.debug('Running CollectScanResults action')
+        dry_run = input_data.get(DRY_RUN) in TRUE_VALUES
+        retention = self.config[RETENTION]
+        policy = RetentionPolicy(
+            retention.get(KEEP_LAST, 0),
+            retention.get(KEEP_DAILY_AFTER_DAYS),
+            retention.get(KEEP_WEEKLY_AFTER_DAYS)
+        )
+        try:
+            temp_files = self.remove_temp_files(
+                retention.get(REMOVE_TEMP_AFTER_HOURS, DEFAULT_REMOVE_TEMP_AFTER_HOURS), dry_run
+            )
+            for scan_id, _ in self.get_scan_files():
+                policy.add(scan_id)
+            expired = ((scan_id, file_name) for scan_id, file_name in self.get_scan_files() if not policy.is_kept(scan_id))
+            archived = self.archive_scans(expired, dry_run)
+            removed = self.remove_archives(retention[MAX_BYTES], dry_run) if MAX_BYTES in retention else 0
+        except (OSError, sqlite3.Error, zipfile.BadZipFile) as e:
+            raise ActionError(f"Action error: can't collect scan results in {self.config[PATH]}: {e}")
+        prefix = 'dry run, ' if dry_run else ''
+        input_data[self.config[OUTPUT_KEY_NAME]] = (
+            f'{prefix}archived scans: {archived} removed archives: {removed} removed temporary files: {temp_files}'
+        )
+        input_data[NEXT_ACTION] = self.config[NEXT_ACTION]
+        return input_data
+
+    def remove_temp_files(self, hours, dry_run):
+        """Remove the temporary files (see TEMP_EXTENSION) of the directory and of its archive
+        directory that weren't modified for the given number of hours. Newer files may
+        belong to a running scan or save.
+
+        Positional arguments:
+            hours   -- the age in hours after which a temporary file is removed
+            dry_run -- a boolean, True to only count the files
+
+        Return value:
+            the number of removed temporary files.
+        """
+        cutoff = time.time() - hours * 3600
+        count = 0
+        for path in (self.config[PATH], f'{self.config[PATH]}{ARCHIVE_DIR}'):
+            if not os.path.isdir(path):
+                continue
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    if entry.name.endswith(TEMP_EXTENSION) and entry.is_file() and entry.stat().st_mtime < cutoff:
+                        count += 1
+                        if not dry_run:
+                            self.logger.info(f'Removing temporary file {entry.path}')
+                            os.remove(entry.path)
+        return count
+
+    def get_scan_files(self):
+        """Yield a (scan id, file path) tuple for each scan result file in the directory."""
+        with os.scandir(self.config[PATH]) as entries:
+            for entry in entries:
+                scan_id = get_scan_id(entry.name)
+                if scan_id and entry.is_file():
+                    yield scan_id, entry.path
+
+    def archive_scans(self, expired, dry_run):
+        """Move scan result files into their monthly archives. Files are added in batches of
+        ARCHIVE_BATCH_SIZE, so memory doesn't grow with the number of files.
+
+        Positional arguments:
+            expired -- an iterable of (scan id, file path) tuples
+            dry_run -- a boolean, True to only count the files
+
+        Return value:
+            the number of archived scans.
+        """
+        count = 0
+        pending = collections.defaultdict(list)
+        for scan_id, file_name in expired:
+            count += 1
+            if dry_run:
+                continue
+            pending[get_archive_name(self.config[PATH], scan_id)].append((scan_id, file_name))
+            if count % ARCHIVE_BATCH_SIZE == 0:
+                self.flush_archives(pending)
+                pending.clear()
+        self.flush_archives(pending)
+        return count
+
+    def flush_archives(self, pending):
+        """Add the pending scan result files to their archives, update the history index
+        and remove the files.
+
+        Positional arguments:
+            pending -- a dictionary of archive name -> list of (scan id, file path) tuples
+        """
+        if not pending:
+            return
+        compression = self.config.get(COMPRESSION, DEFAULT_ARCHIVE_COMPRESSION)
+        index = ScanHistoryIndex(self.config[HISTORY_INDEX]) if HISTORY_INDEX in self.config else None
+        for archive_name, scans in pending.items():
+            self.logger.info(f'Archiving {len(scans)} scan results in {archive_name}')
+            FileHelper.add_to_archive(
+                archive_name,
+                ((f'{scan_id}{SCAN_RESULT_EXTENSION}', file_name) for scan_id, file_name in scans),
+                compression
+            )
+            if index:
+                index.set_file_name((scan_id for scan_id, _ in scans), os.path.relpath(archive_name, self.config[PATH]))
+            for _, file_name in scans:
+                os.remove(file_name)
+
+    def remove_archives(self, max_bytes, dry_run):
+        """Remove the oldest archives (and their scans from the history index, the rule
+        index and the scan store) while the scan result files and archives take more than
+        max_bytes. Other files of the directory (e.g. temporary files) aren't counted, and
+        scan files linked to the same file (see SaveScanResult.link_scan_result) are
+        counted once. Scan result files kept by the retention policy are never removed.
+
+        Return value:
+            the number of removed archives.
+        """
+        total = 0
+        inodes = set()
+        with os.scandir(self.config[PATH]) as entries:
+            for entry in entries:
+                if get_scan_id(entry.name) and entry.is_file() and entry.inode() not in inodes:
+                    inodes.add(entry.inode())
+                    total += entry.stat().st_size
+        archive_dir = f'{self.config[PATH]}{ARCHIVE_DIR}'
+        archives = []
+        if os.path.isdir(archive_dir):
+            with os.scandir(archive_dir) as entries:
+                archives = sorted(
+                    (entry.name, entry.path, entry.stat().st_size) for entry in entries
+                    if entry.name.endswith(ARCHIVE_EXTENSION) and entry.is_file()
+                )
+        total += sum(size for _, _, size in archives)
+
+        removed = 0
+        for _, archive_name, size in archives:
+            if total <= max_bytes:
+                break
+            if not dry_run:
+                self.remove_archive(archive_name)
+            total -= size
+            removed += 1
+        if total > max_bytes:
+            self.logger.warning(f'{self.config[PATH]} still takes {total} bytes, more than max_bytes ({max_bytes})')
+        return removed
+
+    def remove_archive(self, archive_name):
+        """Remove an archive and its scans from the history index, the rule index and the
+        scan store."""
+        self.logger.info(f'Removing archive {archive_name}')
+        scan_ids = [get_scan_id(member_name) for member_name in FileHelper.get_archive_members(archive_name)]
+        if HISTORY_INDEX in self.config:
+            ScanHistoryIndex(self.config[HISTORY_INDEX]).remove_scans(scan_ids)
+        if RULE_INDEX in self.config:
+            RuleIndex(self.config[RULE_INDEX]).remove_scans(scan_ids)
+        if STORE in self.config:
+            ScanStore(self.config[STORE]).remove_scans(scan_ids)
+        os.remove(archive_name)
 
 class BuildCommand(Action):
     """A class to build a command as a string."""
@@ -424,6 +2260,13 @@ class ExecuteCommand(Action):
         """Extracts the command to execute from the input_data dictionary,
         then uses the subprocess module to run the command and capture the
         stdout. Puts the command output in the input_data dictionary.
+        If the action's config includes a path, the stdout is streamed to a
+        temporary file in that directory and the output is a CommandOutput
+        object instead of a list of lines; the file is removed if the action
+        fails. If parse is set, the output is also
+        parsed while the command runs, see create_scan_progress. If capture is
+        false, the stdout is only echoed and parsed, and no output is added
+        (e.g. when the results file is read instead, see IngestResultsFile).
 
         Positional arguments:
             input_data -- a dictionary including all inputs required for the action.
@@ -433,28 +2276,252 @@ class ExecuteCommand(Action):
         """
         self.logger.debug('Running ExecuteCommand action')
         self.validate_input_values(input_data)
-        cmd_stdout = []
-        for line in self.run_command(input_data[CMD_STR].split()):
-            decoded_line = line.decode('utf-8')
-            print(decoded_line)
-            cmd_stdout.append(decoded_line)
-        input_data[CMD_STDOUT] = cmd_stdout
+        echo = input_data.get(ECHO, self.config.get(ECHO, True))
+        scan_progress = self.create_scan_progress(input_data)
+        on_line = scan_progress.feed if scan_progress else None
+        capture = self.config.get(CAPTURE, True)
+        temp_filename = self.create_temp_filename(input_data) if capture and PATH in self.config else None
+        try:
+            start_time = time.perf_counter()
+            process = self.run_command(input_data[CMD_STR].split())
+            add_counter('spawn_time', time.perf_counter() - start_time)
+            try:
+                if not capture:
+                    cmd_stdout = None
+                    self.read_lines(process.stdout, echo, on_line, capture)
+                elif temp_filename:
+                    cmd_stdout = self.stream_to_file(process.stdout, temp_filename, echo, on_line)
+                else:
+                    cmd_stdout = self.read_lines(process.stdout, echo, on_line)
+            finally:
+                process.stdout.close()
+                input_data[CMD_RETURNCODE] = process.wait()
+            command_time = time.perf_counter() - start_time
+            add_counter('command_time', command_time)
+            self.update_metrics(input_data, command_time, scan_progress)
+            if scan_progress:
+                if scan_progress.callback:
+                    scan_progress.report()
+                add_counter('rules_parsed', scan_progress.parser.stats.total)
+                input_data[PARSED_SCAN_RESULT] = scan_progress.get_scan_result()
+        except BaseException:
+            # e.g. an interrupted scan or a full disk, the partial output isn't saved
+            if temp_filename:
+                self.remove_temp_file(temp_filename)
+            raise
+        if capture:
+            input_data[CMD_STDOUT] = cmd_stdout
         input_data[NEXT_ACTION] = self.config[NEXT_ACTION]
         return input_data
 
+    def update_metrics(self, input_data, command_time, scan_progress):
+        """Update the scan metrics after the command finished. The rule counts and the parse
+        time are only known if the output was parsed while the command was running, the
+        command time is kept in the scan duration metric.
+
+        Positional arguments:
+            input_data    -- a dictionary including the scan type and subtype, if any
+            command_time  -- the number of seconds taken by the command
+            scan_progress -- an instance of ScanProgress class or None
+        """
+        labels = (input_data.get(SCAN_TYPE) or '', input_data.get(SCAN_SUB_TYPE) or '')
+        metrics.SCANS.inc(labels=labels + (input_data[CMD_RETURNCODE],))
+        metrics.SCAN_DURATION.observe(command_time, labels)
+        if scan_progress:
+            stats = scan_progress.parser.stats
+            for result, count in stats.to_dict().items():
+                metrics.SCAN_RULES.set(count, labels + (result,))
+            metrics.RULES_PARSED.inc(stats.total, ('scan',))
+            metrics.PARSE_DURATION.inc(scan_progress.parse_time, ('scan',))
+
+    def create_scan_progress(self, input_data):
+        """Create a ScanProgress object if the action's config enables parsing. The progress
+        callback can be given in the input_data dictionary, otherwise the progress is printed
+        to the stderr every progress_interval seconds (if set).
+
+        Return value:
+            an instance of ScanProgress class or None.
+        """
+        if not self.config.get(PARSE):
+            return None
+        callback = input_data.get(PROGRESS_CALLBACK)
+        if not callback and self.config.get(PROGRESS_INTERVAL):
+            callback = self.print_progress
+        return ScanProgress(callback, self.config.get(PROGRESS_INTERVAL, 0))
+
+    def print_progress(self, stats, rules_per_second):
+        """Print the running stats of a scan to the stderr."""
+        print(f'{stats} ({rules_per_second:.1f} rules/s)', file=sys.stderr)
+
+    def read_lines(self, stdout, echo, on_line=None, capture=True):
+        """Read the command's stdout into a list of strings, printing each line if echo is True
+        and passing it to the on_line function if given. If capture is False, the lines are
+        not kept and an empty list is returned."""
+        cmd_stdout = []
+        lines_streamed = 0
+        for line in iter(stdout.readline, b''):
+            decoded_line = line.decode('utf-8')
+            if echo:
+                print(decoded_line)
+            if on_line:
+                on_line(decoded_line)
+            if capture:
+                cmd_stdout.append(decoded_line)
+            lines_streamed += 1
+        add_counter('lines_streamed', lines_streamed)
+        return cmd_stdout
+
+    def stream_to_file(self, stdout, filename, echo, on_line=None):
+        """Copy the command's stdout to a file as it arrives, printing each line if echo
+        is True and passing it to the on_line function if given. Only the current line
+        (or chunk) is kept in memory.
+
+        Positional arguments:
+            stdout   -- the command's stdout pipe (binary)
+            filename -- a string representing the destination file's path
+            echo     -- a boolean, True to print the output
+            on_line  -- optional, a function called with each decoded line
+
+        Return value:
+            an instance of CommandOutput class pointing to the file.
+        """
+        self.logger.debug(f'Streaming command output to {filename}')
+        try:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            with open(filename, 'wb') as file_writer:
+                if echo or on_line:
+                    lines_streamed = 0
+                    for line in iter(stdout.readline, b''):
+                        file_writer.write(line)
+                        decoded_line = line.decode('utf-8')
+                        if echo:
+                            print(decoded_line)
+                        if on_line:
+                            on_line(decoded_line)
+                        lines_streamed += 1
+                    add_counter('lines_streamed', lines_streamed)
+                else:
+                    shutil.copyfileobj(stdout, file_writer)
+        except OSError:
+            raise ActionError(f"Action error: can't write command output in {filename}")
+        return CommandOutput(filename)
+
+    def remove_temp_file(self, filename):
+        """Remove the temporary file of a failed command output, if it was created."""
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            self.logger.warning(f"Can't remove {filename}", exc_info=1)
+
+    def create_temp_filename(self, input_data):
+        """Create the name of the temporary file for the command output, using the scan id
+        if present. The file is hidden so it's not listed in the scan history."""
+        name = input_data.get(SCAN_ID) or str(os.getpid())
+        return os.path.join(self.config[PATH], f'.{name}{SCAN_RESULT_EXTENSION}{TEMP_EXTENSION}')
+
     def run_command(self, cmd):
-        """Use subprocess module to run a command and return an iterator to the
-        stdout.
+        """Use subprocess module to run a command in a child process.
 
         Positional arguments:
             cmd -- a string representing the command to be executed.
 
         Return value:
-            an iterator pointing to the first item of the stdout.
+            a subprocess.Popen object with a pipe to the stdout.
         """
         self.logger.debug('Running command in a child process')
-        p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT) # TODO: redirect stderr to stdout but change it later
-        return iter(p.stdout.readline, b'')
+        return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT) # TODO: redirect stderr to stdout but change it later
+
+class IngestResultsFile(Action):
+    """A class to read the scan result from the results file written by oscap (--results)
+    instead of its output."""
+    def __init__(self, config):
+        """Initialize the action with a given configuration dictionary."""
+        self.config = config
+        self.logger = logging.getLogger()
+        self.validate_config()
+
+    def validate_config(self):
+        """Verify that required config values are present in config dict."""
+        try:
+            self.config[NEXT_ACTION]
+            self.config[RESULTS_KEY_NAME]
+        except KeyError as e:
+            raise ActionError(f'Action error: missing required setting {e}')
+
+    def validate_input_values(self, input_data):
+        """Verify that required input values are present in input_data dict."""
+        try:
+            input_data[self.config[RESULTS_KEY_NAME]]
+        except KeyError as e:
+            raise ActionError(f'Action error: missing required input value {e}')
+
+    def execute(self, input_data):
+        """Parse the XCCDF or OVAL results file named by the results_key_name input, with the
+        rule ids, results, titles and severities. The parsed scan result replaces the one
+        parsed from the command output, and the output is replaced by the scan result in the
+        format of oscap's output, so the saved scan result file matches the parsed rules.
+        If the results file can't be read, the command output is kept when it was captured,
+        otherwise the scan result parsed from the command output while it ran is used.
+
+        Positional arguments:
+            input_data -- a dictionary including all inputs required for the action.
+
+        Return value:
+            a dictionary including the action's output and all previous inputs.
+        """
+        self.logger.debug('Running IngestResultsFile action')
+        self.validate_input_values(input_data)
+        filename = input_data[self.config[RESULTS_KEY_NAME]]
+        try:
+            scan_result = self.parse_results_file(filename)
+        except (OSError, ElementTree.ParseError) as e:
+            if CMD_STDOUT in input_data:
+                self.logger.warning(f"Can't read results file {filename}, using the command output: {e}")
+            elif PARSED_SCAN_RESULT in input_data:
+                self.logger.warning(f"Can't read results file {filename}, using the parsed command output: {e}")
+                input_data[CMD_STDOUT] = input_data[PARSED_SCAN_RESULT].get_output_lines()
+            else:
+                raise ActionError(f"Action error: can't read results file {filename}: {e}")
+        else:
+            self.remove_command_output(input_data.get(CMD_STDOUT))
+            input_data[PARSED_SCAN_RESULT] = scan_result
+            # the lines are created while the scan result file is written
+            input_data[CMD_STDOUT] = scan_result.get_output_lines()
+        input_data[NEXT_ACTION] = self.config[NEXT_ACTION]
+        return input_data
+
+    def parse_results_file(self, filename):
+        """Parse a results file, see ResultsFileParser.
+
+        Positional arguments:
+            filename -- a string representing the results file's path.
+
+        Return value:
+            an instance of ScanResult class, with the severities.
+        """
+        parser = ResultsFileParser()
+        scan_result = ScanResult([], ScanStats(0, 0, 0, 0))
+        severities = StringColumn()
+        start_time = time.perf_counter()
+        for title, rule_id, result, severity in parser.parse(filename):
+            scan_result.add_rule(title, rule_id, result)
+            scan_result._stats.add(result)
+            severities.append(severity)
+        scan_result._severities = severities
+        add_counter('rules_parsed', scan_result._stats.total)
+        metrics.RULES_PARSED.inc(scan_result._stats.total, ('results_file',))
+        metrics.PARSE_DURATION.inc(time.perf_counter() - start_time, ('results_file',))
+        return scan_result
+
+    def remove_command_output(self, cmd_stdout):
+        """Remove the temporary file of a command output that is replaced."""
+        if isinstance(cmd_stdout, CommandOutput):
+            try:
+                os.remove(cmd_stdout.filename)
+            except OSError:
+                self.logger.warning(f"Can't remove {cmd_stdout.filename}", exc_info=1)
 
 class SaveScanResult(Action):
     """A class to save a scan result in the file system."""
@@ -471,7 +2538,11 @@ class SaveScanResult(Action):
             self.config[PATH]
         except KeyError as e:
             raise ActionError(f'Action error: missing required setting {e}')
-    
+        if self.config.get(COMPRESSION) and self.config[COMPRESSION] not in COMPRESSION_EXTENSIONS:
+            raise ActionError(f'Action error: unknown compression {self.config[COMPRESSION]}')
+        if self.config.get(DEDUPLICATE) and STORE not in self.config:
+            raise ActionError(f'Action error: {DEDUPLICATE} requires the {STORE} setting')
+
     def validate_input_values(self, input_data):
         """Verify that required input values are present in input_data dict."""
         try:
@@ -483,7 +2554,12 @@ class SaveScanResult(Action):
     def execute(self, input_data):
         """Extracts the scan result from the input_data object and save it to a new file
         in the file system. The name of the file is calculated using the scan id. The
-        destination path is defined by the config object.
+        destination path is defined by the config object. If the config includes a store,
+        a history index or a rule index, the parsed scan result is also saved there.
+
+        If the config enables deduplicate and the scan has the same content hash as the last
+        stored scan of the same type, subtype and tag, the scan result file is a hard link to
+        the previous scan's file and the store only records a reference to the previous scan.
 
         Positional arguments:
             input_data -- a dictionary including all inputs required for the action.
@@ -493,7 +2569,32 @@ class SaveScanResult(Action):
         """
         self.logger.debug('Running SaveScanResult action')
         self.validate_input_values(input_data)
-        self.save_scan_result(self.create_filename(input_data), input_data[CMD_STDOUT])
+        filename = self.create_filename(input_data)
+        scan_result = None
+        if STORE in self.config or HISTORY_INDEX in self.config or RULE_INDEX in self.config:
+            scan_result = input_data.get(PARSED_SCAN_RESULT)
+            if scan_result is None:
+                scan_result = self.parse_scan_result(input_data[CMD_STDOUT])
+        duplicate = None
+        if self.config.get(DEDUPLICATE):
+            duplicate = self.find_duplicate(input_data[SCAN_ID], scan_result)
+        if duplicate:
+            filename = self.link_scan_result(duplicate, input_data[SCAN_ID], input_data[CMD_STDOUT])
+            if filename is None:
+                duplicate = None
+                filename = self.create_filename(input_data)
+        if duplicate:
+            self.logger.info(f'{input_data[SCAN_ID]} has the same results as {duplicate}')
+            input_data[DUPLICATE_OF] = duplicate
+        else:
+            self.save_scan_result(filename, input_data[CMD_STDOUT])
+        if scan_result is not None:
+            if STORE in self.config:
+                self.store_scan_result(input_data[SCAN_ID], scan_result, duplicate)
+            if HISTORY_INDEX in self.config:
+                self.index_scan_result(input_data[SCAN_ID], os.path.basename(filename), scan_result._stats)
+            if RULE_INDEX in self.config:
+                self.index_rules(input_data[SCAN_ID], scan_result)
         input_data[NEXT_ACTION] = self.config[NEXT_ACTION]
         return input_data
     
@@ -509,22 +2610,380 @@ class SaveScanResult(Action):
         self.logger.debug('Creating filename using scan id')
         scan_id = input_data[SCAN_ID]
         path = self.config[PATH]
-        filename = f'{path}{scan_id}.txt'
+        filename = f'{path}{scan_id}{SCAN_RESULT_EXTENSION}'
+        if self.config.get(COMPRESSION):
+            filename += COMPRESSION_EXTENSIONS[self.config[COMPRESSION]]
         return filename
     
     def save_scan_result(self, filename, result):
-        """Use a helper class to create the file and save the scan result.
-        
+        """Use a helper class to create the file and save the scan result. If the result
+        was already streamed to a temporary file, the file is atomically renamed (or
+        compressed into the destination file if the config includes a compression codec).
+
         Positional arguments:
             filename -- a string representing the file path.
-            result   -- a set of strings to be saved in the file.
+            result   -- a set of strings (or a CommandOutput object) to be saved in the file.
         """
         self.logger.debug('Saving scan result in a new file')
         try:
-            FileHelper.write_lines(filename, result)
+            if isinstance(result, CommandOutput):
+                if self.config.get(COMPRESSION):
+                    FileHelper.compress(result.filename, filename, self.config[COMPRESSION])
+                else:
+                    FileHelper.move(result.filename, filename)
+                result.filename = filename
+            else:
+                FileHelper.write_lines(filename, result, self.config.get(COMPRESSION))
         except:
             raise ActionError(f"Action error: can't write content in {filename}")
 
+    def parse_scan_result(self, result):
+        """Parse a scan output that wasn't parsed while the scan was running.
+
+        Positional arguments:
+            result -- a set of strings representing the scan output.
+
+        Return value:
+            an instance of ScanResult class.
+        """
+        parser = ScanResultParser()
+        return ScanResult(parser.parse(result), parser.stats)
+
+    def find_duplicate(self, scan_id, scan_result):
+        """Find a stored scan with the same results as a new scan: the last scan of the same
+        type, subtype and tag, if it has the same content hash.
+
+        Positional arguments:
+            scan_id     -- a string representing the new scan id.
+            scan_result -- an instance of ScanResult class.
+
+        Return value:
+            a string representing the duplicated scan id, or None.
+        """
+        chain = split_scan_id(scan_id)[1]
+        if chain is None:
+            return None
+        try:
+            last_scan = ScanStore(self.config[STORE]).get_last_scan(chain)
+        except (OSError, sqlite3.Error):
+            self.logger.warning(f"Can't read the last {chain} scan from scan store", exc_info=1)
+            return None
+        if last_scan is None or last_scan[1] != scan_result.get_content_hash():
+            return None
+        return last_scan[0]
+
+    def link_scan_result(self, duplicate, scan_id, result):
+        """Create the scan result file of a new scan as a hard link to the file of the scan
+        it duplicates, removing the temporary file the output was streamed to.
+
+        Positional arguments:
+            duplicate -- a string representing the duplicated scan id.
+            scan_id   -- a string representing the new scan id.
+            result    -- a set of strings (or a CommandOutput object) with the scan output.
+
+        Return value:
+            a string representing the new file path, or None if the link can't be created
+            (e.g. the duplicated scan was archived or the file system has no hard links), in
+            which case the scan result has to be saved as usual.
+        """
+        source = get_scan_file_name(self.config[PATH], duplicate)
+        extension = source[len(f'{self.config[PATH]}{duplicate}{SCAN_RESULT_EXTENSION}'):]
+        filename = f'{self.config[PATH]}{scan_id}{SCAN_RESULT_EXTENSION}{extension}'
+        try:
+            os.link(source, filename)
+        except OSError:
+            self.logger.warning(f"Can't link {filename} to {source}", exc_info=1)
+            return None
+        if isinstance(result, CommandOutput):
+            try:
+                os.remove(result.filename)
+            except OSError:
+                self.logger.warning(f"Can't remove {result.filename}", exc_info=1)
+            result.filename = filename
+        return filename
+
+    def store_scan_result(self, scan_id, scan_result, duplicate=None):
+        """Save a parsed scan result in the scan store. If the config includes a keyframe
+        interval, the scan is delta encoded against the previous scan of the same type,
+        subtype and tag when possible. A duplicated scan is saved as a reference to it (or a
+        copy, every keyframe interval), see ScanStore.save_duplicate_scan.
+
+        Positional arguments:
+            scan_id     -- a string representing the scan id.
+            scan_result -- an instance of ScanResult class.
+            duplicate   -- optional, a string representing the duplicated scan id.
+        """
+        self.logger.debug('Saving parsed scan result in scan store')
+        try:
+            store = ScanStore(self.config[STORE])
+            if duplicate and store.save_duplicate_scan(scan_id, duplicate, self.config.get(KEYFRAME_INTERVAL, 0)):
+                return
+            store.save_scan(
+                scan_id,
+                scan_result.get_rule_tuples(),
+                scan_result._stats.to_tuple(),
+                split_scan_id(scan_id)[1],
+                self.config.get(KEYFRAME_INTERVAL, 0),
+                scan_result.get_content_hash()
+            )
+        except (OSError, sqlite3.Error):
+            raise ActionError(f"Action error: can't save {scan_id} in scan store {self.config[STORE]}")
+
+    def index_scan_result(self, scan_id, file_name, stats):
+        """Add a saved scan result to the history index.
+
+        Positional arguments:
+            scan_id   -- a string representing the scan id.
+            file_name -- a string representing the scan result file's name.
+            stats     -- an instance of ScanStats class.
+        """
+        self.logger.debug('Adding scan result to history index')
+        try:
+            ScanHistoryIndex(self.config[HISTORY_INDEX]).add_scan(scan_id, file_name, stats.to_tuple())
+        except (OSError, sqlite3.Error):
+            raise ActionError(f"Action error: can't add {scan_id} to history index {self.config[HISTORY_INDEX]}")
+
+    def index_rules(self, scan_id, scan_result):
+        """Add the rule results of a saved scan result to the rule index.
+
+        Positional arguments:
+            scan_id     -- a string representing the scan id.
+            scan_result -- an instance of ScanResult class.
+        """
+        self.logger.debug('Adding rule results to rule index')
+        try:
+            RuleIndex(self.config[RULE_INDEX]).add_scan(scan_id, scan_result.get_rule_tuples())
+        except (OSError, sqlite3.Error):
+            raise ActionError(f"Action error: can't add {scan_id} to rule index {self.config[RULE_INDEX]}")
+
+class MigrateScanResults(Action):
+    """A class to import the scan results directory into the scan store."""
+    def __init__(self, config):
+        """Initialize the action with a given configuration dictionary."""
+        self.config = config
+        self.logger = logging.getLogger()
+        self.validate_config()
+
+    def validate_config(self):
+        """Verify that required config values are present in config dict."""
+        try:
+            self.config[NEXT_ACTION]
+            self.config[OUTPUT_KEY_NAME]
+            self.config[PATH]
+            self.config[STORE]
+        except KeyError as e:
+            raise ActionError(f'Invalid action config: missing required setting {e}')
+
+    def execute(self, input_data):
+        """Parses every scan result file that is not in the scan store yet and saves
+        all of them in a single transaction. Adds the migrated scan ids to the
+        input_data object.
+
+        Positional arguments:
+            input_data -- a dictionary including all inputs required for the action.
+
+        Return value:
+            a dictionary including the action's output and all previous inputs.
+        """
+        self.logger.debug('Running MigrateScanResults action')
+        input_data[self.config[OUTPUT_KEY_NAME]] = self.migrate_scan_results()
+        input_data[NEXT_ACTION] = self.config[NEXT_ACTION]
+        return input_data
+
+    def migrate_scan_results(self):
+        """Import all the missing scan results into the scan store.
+
+        Return value:
+            a list of strings representing the migrated scan ids.
+        """
+        self.logger.debug('Migrating scan results into scan store')
+        try:
+            store = ScanStore(self.config[STORE])
+            stored_ids = set(store.get_scan_ids())
+            file_names = FileHelper.get_files_from_dir(self.config[PATH])
+        except (OSError, sqlite3.Error):
+            raise ActionError(f"Action error: can't read {self.config[PATH]} or {self.config[STORE]}")
+
+        scan_ids = sorted({get_scan_id(file_name) for file_name in file_names} - stored_ids - {None})
+        try:
+            store.save_scans(self.parse_scan_file(scan_id) for scan_id in scan_ids)
+        except (OSError, sqlite3.Error) as e:
+            raise ActionError(f"Action error: can't migrate scan results: {e}")
+        return scan_ids
+
+    def parse_scan_file(self, scan_id):
+        """Parse a scan result file.
+
+        Return value:
+            a (scan id, rules, stats, chain, content hash) tuple as expected by
+            ScanStore.save_scans.
+        """
+        self.logger.debug(f'Parsing {scan_id} for migration')
+        scan_result = read_scan_file(get_scan_file_name(self.config[PATH], scan_id))
+        return (
+            scan_id,
+            list(scan_result.get_rule_tuples()),
+            scan_result._stats.to_tuple(),
+            None,
+            scan_result.get_content_hash()
+        )
+
+class ReindexScanResults(Action):
+    """A class to parse the whole scan results directory again, including the archives, and
+    rebuild the scan store, the history index and the rule index from it. The new store and
+    indexes are built next to the current ones and replace them atomically once complete, so
+    readers never see a partial rebuild and existing scans never have to be removed one by one."""
+    def __init__(self, config):
+        """Initialize the action with a given configuration dictionary."""
+        self.config = config
+        self.logger = logging.getLogger()
+        self.validate_config()
+
+    def validate_config(self):
+        """Verify that required config values are present in config dict."""
+        try:
+            self.config[NEXT_ACTION]
+            self.config[OUTPUT_KEY_NAME]
+            self.config[PATH]
+        except KeyError as e:
+            raise ActionError(f'Invalid action config: missing required setting {e}')
+        if not any(key in self.config for key in (STORE, HISTORY_INDEX, RULE_INDEX)):
+            raise ActionError('Invalid action config: a store, a history_index or a rule_index setting is required')
+
+    def execute(self, input_data):
+        """Spreads the scan results across a pool of worker processes in chunks of chunk_size
+        scans. Workers parse the scans and send the rules back, while this process writes
+        them to the store and the indexes in one transaction per chunk. Chunks are
+        written in scan id order, so delta chains are rebuilt as they were saved. The number
+        of workers (max_workers setting, or the workers input) defaults to the number of cores.
+        Progress is printed to the stderr every progress_interval seconds. Puts a summary in
+        the input_data dictionary.
+
+        Positional arguments:
+            input_data -- a dictionary including all inputs required for the action.
+
+        Return value:
+            a dictionary including the action's output and all previous inputs.
+        """
+        self.logger.debug('Running ReindexScanResults action')
+        try:
+            max_workers = int(input_data.get(WORKERS) or self.config.get(MAX_WORKERS) or os.cpu_count() or 1)
+            chunk_size = int(input_data.get(CHUNK_SIZE) or self.config.get(CHUNK_SIZE, DEFAULT_CHUNK_SIZE))
+        except ValueError as e:
+            raise ActionError(f'Action error: invalid number of workers or chunk size: {e}')
+        filenames = [self.config[key] for key in (STORE, HISTORY_INDEX, RULE_INDEX) if key in self.config]
+        try:
+            scans = self.get_scans()
+            for filename in filenames:
+                self.remove_file(f'{filename}{REINDEX_EXTENSION}')
+            store = ScanStore(f'{self.config[STORE]}{REINDEX_EXTENSION}') if STORE in self.config else None
+            index = ScanHistoryIndex(f'{self.config[HISTORY_INDEX]}{REINDEX_EXTENSION}') if HISTORY_INDEX in self.config else None
+            rule_index = RuleIndex(f'{self.config[RULE_INDEX]}{REINDEX_EXTENSION}') if RULE_INDEX in self.config else None
+        except (OSError, sqlite3.Error, zipfile.BadZipFile) as e:
+            raise ActionError(f"Action error: can't read {self.config[PATH]}: {e}")
+
+        file_names = dict(scans)
+        chunks = [[scan_id for scan_id, _ in scans[start:start + chunk_size]] for start in range(0, len(scans), chunk_size)]
+        progress = ReindexProgress(len(scans), self.config.get(PROGRESS_INTERVAL, DEFAULT_PROGRESS_INTERVAL))
+        try:
+            for parsed_scans in self.parse_chunks(chunks, max_workers):
+                self.write_chunk(store, index, rule_index, parsed_scans, file_names)
+                progress.add(parsed_scans)
+            if index:
+                index.set_indexed(self.config[PATH])
+            if rule_index and store:
+                rule_index.set_indexed(self.config[STORE])
+            for filename in filenames:
+                os.replace(f'{filename}{REINDEX_EXTENSION}', filename)
+        except (OSError, sqlite3.Error) as e:
+            for filename in filenames:
+                self.remove_file(f'{filename}{REINDEX_EXTENSION}')
+            raise ActionError(f"Action error: can't reindex scan results: {e}")
+        progress.report()
+        input_data[self.config[OUTPUT_KEY_NAME]] = progress.get_summary()
+        input_data[NEXT_ACTION] = self.config[NEXT_ACTION]
+        return input_data
+
+    def remove_file(self, filename):
+        """Remove a file if it exists."""
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
+
+    def get_scans(self):
+        """Return a list of (scan id, file name) tuples sorted by scan id, for the scan result
+        files and the archived scans. File names are relative to the scan results directory."""
+        scans = {}
+        archive_dir = f'{self.config[PATH]}{ARCHIVE_DIR}'
+        if os.path.isdir(archive_dir):
+            with os.scandir(archive_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(ARCHIVE_EXTENSION) and entry.is_file():
+                        for member_name in FileHelper.get_archive_members(entry.path):
+                            scans[get_scan_id(member_name)] = f'{ARCHIVE_DIR}{entry.name}'
+        with os.scandir(self.config[PATH]) as entries:
+            for entry in entries:
+                scan_id = get_scan_id(entry.name)
+                if scan_id and entry.is_file():
+                    scans[scan_id] = entry.name
+        scans.pop(None, None)
+        return sorted(scans.items())
+
+    def parse_chunks(self, chunks, max_workers):
+        """Parse the chunks in a process pool, yielding the parsed scans of each chunk in
+        order. At most two chunks per worker are pending at any time, so memory doesn't grow
+        if writing is slower than parsing.
+
+        Positional arguments:
+            chunks      -- a list of lists of scan ids
+            max_workers -- the number of worker processes
+
+        Return value:
+            an iterator of lists, see parse_scan_chunk.
+        """
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            pending = collections.deque()
+            chunks = iter(chunks)
+            for chunk in chunks:
+                pending.append(executor.submit(parse_scan_chunk, self.config[PATH], chunk))
+                if len(pending) >= 2 * max_workers:
+                    break
+            while pending:
+                parsed_scans = pending.popleft().result()
+                for chunk in chunks:
+                    pending.append(executor.submit(parse_scan_chunk, self.config[PATH], chunk))
+                    break
+                yield parsed_scans
+
+    def write_chunk(self, store, index, rule_index, parsed_scans, file_names):
+        """Save the parsed scans of a chunk in the store, the history index and the rule
+        index, logging the scans that couldn't be parsed.
+
+        Positional arguments:
+            store        -- an instance of ScanStore class or None
+            index        -- an instance of ScanHistoryIndex class or None
+            rule_index   -- an instance of RuleIndex class or None
+            parsed_scans -- a list of tuples, see parse_scan_chunk
+            file_names   -- a dictionary of scan id -> file name
+        """
+        for scan_id, _, _, _, error in parsed_scans:
+            if error:
+                self.logger.error(f"Can't reindex {scan_id}: {error}")
+        parsed_scans = [scan for scan in parsed_scans if not scan[4]]
+        if store:
+            store.save_scans(
+                (
+                    (scan_id, rules, stats, split_scan_id(scan_id)[1], content_hash)
+                    for scan_id, rules, stats, content_hash, _ in parsed_scans
+                ),
+                self.config.get(KEYFRAME_INTERVAL, 0)
+            )
+        if index:
+            index.add_scans((scan_id, file_names[scan_id], stats) for scan_id, _, stats, _, _ in parsed_scans)
+        if rule_index:
+            rule_index.add_scans((scan_id, rules) for scan_id, rules, _, _, _ in parsed_scans)
+
 class PrintStdout(Action):
     """An action to print content in the stdout."""
     def __init__(self, config):
@@ -548,7 +3007,9 @@ class PrintStdout(Action):
             raise ActionError(f'Action error: missing required input value {e}')
 
     def execute(self, input_data):
-        """Extracts the content from input_data dictionary and print it in the stdout.
+        """Extracts the content from input_data dictionary and print it in the stdout,
+        one line or record at a time. The output format (text, json, jsonl or csv) is
+        taken from input_data or from the action's config, text by default.
 
         Positional arguments:
             input_data -- a dictionary including all inputs required for the action.
@@ -557,14 +3018,11 @@ class PrintStdout(Action):
             a dictionary including the action's output and all previous inputs.
         """
         self.logger.debug('Running PrintStdout action')
-        stdout_input = input_data[STDOUT_INPUT]
-        if type(stdout_input) == str:
-            print(stdout_input)
-        elif type(stdout_input) == list:
-            for line in stdout_input:
-                print(line)
-        else:
-            print(str(stdout_input))
+        self.validate_input_values(input_data)
+        output_format = input_data.get(FORMAT) or self.config.get(FORMAT, TEXT_FORMAT)
+        if output_format not in OUTPUT_FORMATS:
+            raise ActionError(f'Action error: unknown output format {output_format}')
+        OutputWriter(sys.stdout, output_format).write(input_data[STDOUT_INPUT])
 
         input_data[NEXT_ACTION] = self.config[NEXT_ACTION]
         return input_data
\ No newline at end of file
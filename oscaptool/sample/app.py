@@ -1,12 +1,20 @@
 import os
 import sys
 import json
+import time
+import signal
 import logging
 import logging.config
+import concurrent.futures
 
-from oscaptool.sample.util import ArgsParser
+from oscaptool.sample.util import ArgsParser, FileHelper
 from actionmanager.manager import ActionManager, WorkflowMetadata
+from actionmanager.profiler import WorkflowProfiler
+from oscaptool.sample import metrics
 
+CONFIG_FILE = 'config.json'
+CONFIG_CACHE_FILE = '.config.json.cache'
+CONFIG_CACHE_ENV_VAR = 'OSCAPTOOL_CONFIG_CACHE'
 ARGPARSER = 'argparser'
 ACTIONMANAGER = 'actionmanager'
 ACTION = 'action'
@@ -15,10 +23,36 @@ SCAN_TYPE = 'scantype'
 SCAN_SUB_TYPE = 'scansubtype'
 SHOW = 'show'
 COMP = 'comp'
+QUERY = 'query'
+MIGRATE = 'migrate'
+GC = 'gc'
+REINDEX = 'reindex'
+SERVE = 'serve'
+SERVER = 'server'
+SOCKET_PATH = 'socket_path'
 SCAN_ID = 'scan_id'
+SCAN_RESULT_ID = 'scanid'
+SCAN_TAG = 'scantag'
+CMD_RETURNCODE = 'cmd_returncode'
+ECHO = 'echo'
+BATCH = 'batch'
+MAX_WORKERS = 'max_workers'
+SCAN_IDS = 'scan_ids'
+SINCE = 'since'
+UNTIL = 'until'
 SHOW_SCAN_HISTORY = 'show-scan-history'
 SHOW_SCAN_RESULT = 'show-scan-result'
 COMP_SCAN_RESULTS = 'comp-scan-results'
+COMP_SCAN_DRIFT = 'comp-scan-drift'
+QUERY_RULES = 'query-rules'
+MIGRATE_SCAN_RESULTS = 'migrate-scan-results'
+GC_SCAN_RESULTS = 'gc-scan-results'
+REINDEX_SCAN_RESULTS = 'reindex-scan-results'
+# not 'profile', which is the xccdf profile of the scan commands
+PROFILE = 'profile_actions'
+PROFILE_DUMP = 'profile_dump'
+METRICS = 'metrics'
+TEXTFILE = 'textfile'
 
 class Client:
     """A class to represent the main process."""
@@ -42,7 +76,51 @@ class Client:
 
     def run(self):
         """Run parsing arguments and execute workflow processes."""
-        self.execute_workflow(self.parse_args())
+        parsed_args = self.parse_args()
+        if parsed_args[ACTION] == SERVE:
+            self.serve()
+            return
+        profiler = WorkflowProfiler() if parsed_args.get(PROFILE) else None
+        stats_profiler = self.start_stats_profiler(parsed_args.get(PROFILE_DUMP))
+        try:
+            if parsed_args.get(BATCH):
+                self.execute_batch(parsed_args[BATCH], profiler)
+            else:
+                self.execute_workflow(parsed_args, profiler)
+        finally:
+            self._action_manager.shutdown()
+            if stats_profiler:
+                self.dump_stats(stats_profiler, parsed_args[PROFILE_DUMP])
+            if profiler:
+                self.print_profile_report(profiler)
+            self.write_metrics()
+
+    def write_metrics(self):
+        """Write the metrics collected during the run to the textfile collector file set in
+        the metrics.textfile setting, if any. Errors are logged but don't fail the run."""
+        textfile = self.config.get(METRICS, {}).get(TEXTFILE)
+        if not textfile:
+            return
+        try:
+            metrics.REGISTRY.write_textfile(textfile)
+        except (OSError, ValueError):
+            self.logger.error(f"Can't write metrics to {textfile}", exc_info=1)
+
+    def run_workflow(self, action_manager, workflow_metadata, profiler=None):
+        """Run a workflow with an action manager, recording its duration in the workflow
+        latency metric.
+
+        Return value:
+            the output of the workflow.
+        """
+        start_time = time.perf_counter()
+        status = 'error'
+        try:
+            output = action_manager.run_workflow(workflow_metadata, profiler)
+            status = 'ok'
+            return output
+        finally:
+            metrics.WORKFLOW_DURATION.observe(time.perf_counter() - start_time, (workflow_metadata._id, status))
     
     def parse_args(self):
         """Executes argument parsing logic"""
@@ -50,11 +128,39 @@ class Client:
         args = sys.argv[1:]
         return self._args_parser.parse(args)
 
-    def execute_workflow(self, parsed_args):
-        """Executes a workflow using action manager."""
+    def start_stats_profiler(self, profile_dump):
+        """Start a cProfile profiler if a dump file was requested. Only the main thread is
+        profiled, actions running in worker threads or processes are not included.
+
+        Return value:
+            a cProfile.Profile object or None.
+        """
+        if not profile_dump:
+            return None
+        # imported here to keep the startup time of regular commands low
+        import cProfile
+        stats_profiler = cProfile.Profile()
+        stats_profiler.enable()
+        return stats_profiler
+
+    def dump_stats(self, stats_profiler, profile_dump):
+        """Stop a cProfile profiler and save its stats to a file."""
+        stats_profiler.disable()
+        try:
+            stats_profiler.dump_stats(profile_dump)
+        except OSError as e:
+            print(f'Error while trying to save profile stats: {e}', file=sys.stderr)
+            self.logger.error('Error while trying to save profile stats', exc_info=1)
+
+    def print_profile_report(self, profiler):
+        """Print the timing report of a profiled run to the stderr as a JSON document."""
+        print(json.dumps(profiler.get_report(), indent=2), file=sys.stderr)
+
+    def execute_workflow(self, parsed_args, profiler=None):
+        """Executes a workflow using action manager, measuring each action if a profiler is given."""
         try:
             self.logger.debug('Interpreting parsed args')
-            self._action_manager.run_workflow(self.build_workflow_metadata(parsed_args))
+            self.run_workflow(self._action_manager, self.build_workflow_metadata(parsed_args), profiler)
         except Exception as e:
             print('An unexpected error ocurred while executing workflow:')
             print(e)
@@ -62,6 +168,73 @@ class Client:
             self.logger.critical('Critical error occurred while trying to run workflow', exc_info=1)
             sys.exit(1)
 
+    def serve(self):
+        """Run a server handling workflow requests over a unix domain socket until interrupted."""
+        # imported here to keep the startup time of regular commands low
+        from oscaptool.sample.server import Server, DEFAULT_SOCKET_PATH
+        socket_path = self.config.get(SERVER, {}).get(SOCKET_PATH, DEFAULT_SOCKET_PATH)
+        try:
+            server = Server(socket_path, self.config[ACTIONMANAGER], self.config.get(METRICS))
+        except Exception as e:
+            print(f'Critical error occurred while trying to start server: {e}')
+            self.logger.critical('Critical error occurred while trying to start server', exc_info=1)
+            sys.exit(1)
+        self.logger.info(f'Serving workflow requests on {socket_path}')
+        # stop the same way on a terminate signal, so the parse pool's workers are stopped too
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.logger.info('Server stopped')
+
+    def execute_batch(self, batch_file, profiler=None):
+        """Run the scans listed in a batch file using a bounded pool of workers. Each
+        worker runs the scan's workflow with its own action manager, so every scan gets
+        its own scan id, result file and exit status.
+
+        Positional arguments:
+            batch_file -- a string representing the path to a JSON list of scan specs.
+            profiler   -- optional, a WorkflowProfiler object shared by all the scans.
+        """
+        self.logger.debug('Running scan batch')
+        try:
+            with open(batch_file) as batch_file_reader:
+                scan_specs = json.loads(batch_file_reader.read())
+            max_workers = self.config[BATCH][MAX_WORKERS]
+        except (OSError, ValueError, KeyError) as e:
+            print(f'Critical error occurred while trying to load scan batch: {e}')
+            self.logger.critical('Critical error occurred while trying to load scan batch', exc_info=1)
+            sys.exit(1)
+
+        failed = False
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self.execute_batch_scan, index, spec, profiler)
+                for index, spec in enumerate(scan_specs)
+            ]
+            for index, future in enumerate(futures):
+                try:
+                    output = future.result()
+                    print(f'{index}: {output[SCAN_RESULT_ID]} exit status {output[CMD_RETURNCODE]}')
+                except Exception as e:
+                    failed = True
+                    print(f'{index}: failed: {e}')
+                    self.logger.error(f'Scan {index} from batch failed', exc_info=1)
+        if failed:
+            sys.exit(1)
+
+    def execute_batch_scan(self, index, scan_spec, profiler=None):
+        """Run a single scan from a batch and return the workflow output."""
+        inputs = dict(scan_spec)
+        inputs[ACTION] = SCAN
+        inputs.setdefault(SCAN_TAG, str(index))
+        inputs[ECHO] = False
+        workflow_id = f"{SCAN}-{inputs[SCAN_TYPE]}-{inputs[SCAN_SUB_TYPE]}"
+        action_manager = ActionManager(
+            self.config[ACTIONMANAGER], self._action_manager._actions, self._action_manager._pools
+        )
+        return self.run_workflow(action_manager, WorkflowMetadata(workflow_id, inputs), profiler)
+
     def build_workflow_metadata(self, parsed_args):
         """Creates a WorkflowMetadata object from a set of parsed args."""
         self.logger.debug('Building workflow metadata object')
@@ -73,12 +246,24 @@ class Client:
                 workflow_id_keys.add(SCAN_TYPE)
                 workflow_id_keys.add(SCAN_SUB_TYPE)
                 scan_type = parsed_args[SCAN_TYPE]
+                if not scan_type:
+                    print('A scan type or a batch file is required')
+                    sys.exit(1)
                 scan_subtype = parsed_args[SCAN_SUB_TYPE]
                 workflow_id = f"{parsed_args[ACTION]}-{scan_type}-{scan_subtype}"
             elif parsed_args[ACTION] == SHOW:
                 workflow_id = SHOW_SCAN_RESULT if parsed_args[SCAN_ID] else SHOW_SCAN_HISTORY
             elif parsed_args[ACTION] == COMP:
-                workflow_id = COMP_SCAN_RESULTS
+                drift = parsed_args[SCAN_IDS] or parsed_args[SINCE] or parsed_args[UNTIL]
+                workflow_id = COMP_SCAN_DRIFT if drift else COMP_SCAN_RESULTS
+            elif parsed_args[ACTION] == QUERY:
+                workflow_id = QUERY_RULES
+            elif parsed_args[ACTION] == MIGRATE:
+                workflow_id = MIGRATE_SCAN_RESULTS
+            elif parsed_args[ACTION] == GC:
+                workflow_id = GC_SCAN_RESULTS
+            elif parsed_args[ACTION] == REINDEX:
+                workflow_id = REINDEX_SCAN_RESULTS
         except KeyError as e:
             print('Critical error ocurred while trying to build workflow metadata object')
             print(f'Key missing in parsed args dict: {e}')
@@ -94,10 +279,8 @@ def create_app():
     logger = logging.getLogger()
     logger.info('oscaptool started')
 
-    # load app configuration file
-    config = None
-    with open(f'config.json') as json_config_file:
-            config = json.loads(json_config_file.read())
+    # load app configuration file, reusing its precompiled form while it doesn't change
+    config = FileHelper.read_json(CONFIG_FILE, os.environ.get(CONFIG_CACHE_ENV_VAR, CONFIG_CACHE_FILE) or None)
 
     # initialize and run client
     client = Client(config)
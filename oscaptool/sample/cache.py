@@ -0,0 +1,89 @@
+import os
+import zlib
+import marshal
+import hashlib
+
+ENTRY_EXTENSION = '.cache'
+
+class ScanCache:
+    """A helper class to keep parsed scan files in an on-disk cache.
+
+    Entries are keyed by the scan file path and validated against the file's
+    size, mtime and inode, so a modified scan file is detected as a miss.
+    The cache directory is kept under a byte budget by evicting the least
+    recently used entries (an entry's mtime is updated on every hit).
+    """
+    def __init__(self, path, max_bytes):
+        """Initialize the cache, creating its directory if it doesn't exist.
+
+        Positional arguments:
+            path      -- a string representing the cache directory's absolute path
+            max_bytes -- an integer representing the maximum size of the cache directory
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok=True)
+
+    def get(self, filename):
+        """Return the cached value for a file, or None if missing or stale.
+
+        Positional arguments:
+            filename -- a string representing the scan file's absolute path
+        """
+        entry_name = self.get_entry_name(filename)
+        try:
+            with open(entry_name, 'rb') as entry_reader:
+                key, value = marshal.loads(zlib.decompress(entry_reader.read()))
+        except (OSError, ValueError, EOFError, TypeError, zlib.error):
+            return None
+        if key != self.get_key(filename):
+            return None
+        os.utime(entry_name)
+        return value
+
+    def put(self, filename, value):
+        """Save a value for a file and evict old entries if the cache is over budget.
+
+        Positional arguments:
+            filename -- a string representing the scan file's absolute path
+            value    -- a marshal-serializable value (tuples, lists, strings, numbers)
+        """
+        entry_name = self.get_entry_name(filename)
+        data = zlib.compress(marshal.dumps((self.get_key(filename), value)))
+        if len(data) > self.max_bytes:
+            return
+        temp_name = f'{entry_name}.{os.getpid()}.tmp'
+        with open(temp_name, 'wb') as entry_writer:
+            entry_writer.write(data)
+        os.replace(temp_name, entry_name)
+        self.evict()
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits its byte budget."""
+        entries = []
+        total = 0
+        for entry in os.scandir(self.path):
+            if entry.name.endswith(ENTRY_EXTENSION) and entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, entry_path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def get_entry_name(self, filename):
+        """Return the cache entry path for a given file."""
+        digest = hashlib.sha1(os.path.abspath(filename).encode('utf-8')).hexdigest()
+        return os.path.join(self.path, f'{digest}{ENTRY_EXTENSION}')
+
+    @staticmethod
+    def get_key(filename):
+        """Return a (size, mtime, inode) tuple identifying the current version of a file."""
+        stat = os.stat(filename)
+        return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
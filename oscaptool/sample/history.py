@@ -0,0 +1,195 @@
+import os
+import re
+import sqlite3
+import threading
+import contextlib
+
+from oscaptool.sample.util import FileHelper
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS history (
+    scan_id TEXT PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    timestamp TEXT,
+    scan_type TEXT,
+    scan_subtype TEXT,
+    pass_count INTEGER NOT NULL,
+    fail_count INTEGER NOT NULL,
+    na_count INTEGER NOT NULL,
+    total INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS history_scan_type ON history(scan_type, scan_subtype);
+CREATE INDEX IF NOT EXISTS history_pass_count ON history(pass_count);
+CREATE INDEX IF NOT EXISTS history_fail_count ON history(fail_count);
+CREATE INDEX IF NOT EXISTS history_na_count ON history(na_count);
+CREATE INDEX IF NOT EXISTS history_total ON history(total);
+CREATE TABLE IF NOT EXISTS indexed_paths (
+    path TEXT PRIMARY KEY
+);
+'''
+COLUMNS = 'scan_id, file_name, timestamp, scan_type, scan_subtype, pass_count, fail_count, na_count, total'
+SORT_COLUMNS = {
+    'scan_id': 'scan_id',
+    'pass': 'pass_count',
+    'fail': 'fail_count',
+    'notapplicable': 'na_count',
+    'total': 'total'
+}
+# scan ids are created as <%Y-%m-%d_%H:%M:%S>_<scan type>_<scan subtype>[_<scan tag>]
+SCAN_ID_PATTERN = re.compile(r'^(\d{4}-\d{2}-\d{2}_\d{2}:\d{2}:\d{2})_([^_]+)_([^_]+)')
+# appended to an until date so it matches every scan id starting with that date
+MAX_CHARACTER = '\U0010ffff'
+
+class ScanHistoryIndex:
+    """A helper class to keep the metadata of every saved scan in a sqlite file, so the
+    scan history can be filtered, sorted and paginated without listing the scan
+    results directory.
+
+    Each entry holds the scan id, the name of the scan result file, the timestamp,
+    type and subtype taken from the scan id, and the scan stats.
+    """
+    # database files whose schema is up to date, see FileHelper.get_file_id
+    _initialized = set()
+    _initialized_lock = threading.Lock()
+
+    def __init__(self, filename):
+        """Initialize the index, creating the database file if it doesn't exist. The schema
+        is only set up the first time a database file is opened by the process.
+
+        Positional arguments:
+            filename -- a string representing the database file's absolute path
+        """
+        self.filename = filename
+        with ScanHistoryIndex._initialized_lock:
+            if FileHelper.get_file_id(filename) in ScanHistoryIndex._initialized:
+                return
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            with self.connect() as connection:
+                connection.executescript(SCHEMA)
+            ScanHistoryIndex._initialized.add(FileHelper.get_file_id(filename))
+
+    @contextlib.contextmanager
+    def connect(self):
+        """Open a connection to the database, commit on success and close it on exit."""
+        connection = sqlite3.connect(self.filename)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def parse_scan_id(scan_id):
+        """Return the (timestamp, scan type, scan subtype) tuple encoded in a scan id,
+        or (None, None, None) if the scan id doesn't follow the default format."""
+        match = SCAN_ID_PATTERN.match(scan_id)
+        if match is None:
+            return None, None, None
+        return match.groups()
+
+    def add_scan(self, scan_id, file_name, stats):
+        """Add (or replace) the entry of a scan.
+
+        Positional arguments:
+            scan_id   -- a string representing the scan id
+            file_name -- a string representing the scan result file's name
+            stats     -- a (pass, fail, notapplicable, total) tuple
+        """
+        self.add_scans([(scan_id, file_name, stats)])
+
+    def add_scans(self, scans):
+        """Add (or replace) many entries in a single transaction.
+
+        Positional arguments:
+            scans -- an iterable of (scan id, file name, stats) tuples, see add_scan
+        """
+        with self.connect() as connection:
+            connection.executemany(
+                f'INSERT OR REPLACE INTO history ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (
+                    (scan_id, file_name) + self.parse_scan_id(scan_id) + tuple(stats)
+                    for scan_id, file_name, stats in scans
+                )
+            )
+
+    def set_file_name(self, scan_ids, file_name):
+        """Change the file holding many scans, e.g. after they are moved into an archive.
+
+        Positional arguments:
+            scan_ids  -- an iterable of strings representing the scan ids
+            file_name -- a string representing the new file name
+        """
+        with self.connect() as connection:
+            connection.executemany(
+                'UPDATE history SET file_name = ? WHERE scan_id = ?',
+                ((file_name, scan_id) for scan_id in scan_ids)
+            )
+
+    def remove_scans(self, scan_ids):
+        """Remove the entries of many scans.
+
+        Positional arguments:
+            scan_ids -- an iterable of strings representing the scan ids
+        """
+        with self.connect() as connection:
+            connection.executemany('DELETE FROM history WHERE scan_id = ?', ((scan_id,) for scan_id in scan_ids))
+
+    def get_scan_ids(self):
+        """Return a set of all the scan ids in the index."""
+        with self.connect() as connection:
+            return {row[0] for row in connection.execute('SELECT scan_id FROM history')}
+
+    def is_indexed(self, path):
+        """Return True if the scan results directory was already added to the index."""
+        with self.connect() as connection:
+            row = connection.execute('SELECT 1 FROM indexed_paths WHERE path = ?', (path,)).fetchone()
+        return row is not None
+
+    def set_indexed(self, path):
+        """Mark a scan results directory as added to the index."""
+        with self.connect() as connection:
+            connection.execute('INSERT OR IGNORE INTO indexed_paths (path) VALUES (?)', (path,))
+
+    def query(self, since=None, until=None, scan_type=None, scan_subtype=None,
+              sort='scan_id', reverse=False, limit=None, offset=0):
+        """Return the entries matching the given filters. Scan ids start with a
+        '%Y-%m-%d_%H:%M:%S' timestamp, so dates can be given with any precision.
+
+        Positional arguments:
+            since        -- a string representing the first date, or None
+            until        -- a string representing the last date (inclusive), or None
+            scan_type    -- a string representing the scan type, or None
+            scan_subtype -- a string representing the scan subtype, or None
+            sort         -- the field to sort by, one of SORT_COLUMNS keys
+            reverse      -- a boolean, True to sort in descending order
+            limit        -- the maximum number of entries to return, or None
+            offset       -- the number of entries to skip
+
+        Return value:
+            a list of (scan id, file name, timestamp, scan type, scan subtype, pass,
+            fail, notapplicable, total) tuples.
+        """
+        conditions = []
+        parameters = []
+        if since:
+            conditions.append('scan_id >= ?')
+            parameters.append(since)
+        if until:
+            conditions.append('scan_id <= ?')
+            parameters.append(until + MAX_CHARACTER)
+        if scan_type:
+            conditions.append('scan_type = ?')
+            parameters.append(scan_type)
+        if scan_subtype:
+            conditions.append('scan_subtype = ?')
+            parameters.append(scan_subtype)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ''
+        order = 'DESC' if reverse else 'ASC'
+        column = SORT_COLUMNS[sort]
+        order_by = f'ORDER BY {column} {order}' if column == 'scan_id' else f'ORDER BY {column} {order}, scan_id {order}'
+        parameters.extend((-1 if limit is None else limit, offset))
+        with self.connect() as connection:
+            return connection.execute(
+                f'SELECT {COLUMNS} FROM history {where}{order_by} LIMIT ? OFFSET ?',
+                parameters
+            ).fetchall()
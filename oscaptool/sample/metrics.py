@@ -0,0 +1,354 @@
+import os
+import re
+import threading
+import http.server
+import socketserver
+
+from actionmanager.manager import add_process_step_hook
+
+try:
+    import fcntl
+except ImportError:
+    # not available on every platform, concurrent textfile updates are not serialized
+    fcntl = None
+
+COUNTER = 'counter'
+GAUGE = 'gauge'
+HISTOGRAM = 'histogram'
+# the samples of these types are added to the ones already in a textfile, gauges are replaced
+CUMULATIVE_TYPES = (COUNTER, HISTOGRAM)
+HISTOGRAM_SUFFIXES = ('_bucket', '_sum', '_count')
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+METRICS_PATH = '/metrics'
+LOCK_EXTENSION = '.lock'
+TEMP_EXTENSION = '.tmp'
+BUCKET_LABEL_PATTERN = re.compile(r',?le="([^"]*)"')
+
+def escape_label_value(value):
+    """Escape a label value as required by the text exposition format."""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def get_histogram_sort_key(sample_name):
+    """Return a key sorting the samples of a histogram by labels, then buckets by their upper
+    bound, then sum and count."""
+    match = BUCKET_LABEL_PATTERN.search(sample_name)
+    bucket = float(match.group(1)) if match else 0.0
+    name, _, labels = BUCKET_LABEL_PATTERN.sub('', sample_name).partition('{')
+    suffix = next(index for index, suffix in enumerate(HISTOGRAM_SUFFIXES) if name.endswith(suffix))
+    return labels.rstrip('}'), suffix, bucket
+
+def format_value(value):
+    """Format a sample value, writing integral values without a decimal part."""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+class Metric:
+    """Base class for metrics. Each metric keeps its samples in a dictionary mapping the
+    sample name with its labels (e.g. name{label="value"}) to the sample value, so samples
+    can be written and merged with the ones of a previous textfile without parsing labels.
+    """
+    TYPE = None
+
+    def __init__(self, name, help_text, label_names=()):
+        """Initialize the metric without samples.
+
+        Positional arguments:
+            name        -- a string representing the metric name
+            help_text   -- a string describing the metric
+            label_names -- a tuple of strings representing the label names
+        """
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def get_sample_name(self, labels, suffix='', extra_labels=()):
+        """Return the sample name with its labels.
+
+        Positional arguments:
+            labels       -- a tuple of label values, in the order of label_names
+            suffix       -- a string appended to the metric name (e.g. _bucket)
+            extra_labels -- a tuple of (name, value) tuples appended to the labels
+        """
+        pairs = tuple(zip(self.label_names, labels)) + extra_labels
+        if not pairs:
+            return f'{self.name}{suffix}'
+        formatted_labels = ','.join(f'{name}="{escape_label_value(value)}"' for name, value in pairs)
+        return f'{self.name}{suffix}{{{formatted_labels}}}'
+
+    def add_sample(self, sample_name, value):
+        """Add a value to a sample, creating it if needed."""
+        with self._lock:
+            self._samples[sample_name] = self._samples.get(sample_name, 0) + value
+
+    def get_sort_key(self, sample):
+        """Return the key sorting the (sample name, value) tuples written by get_lines."""
+        return sample[0]
+
+    def merge_sample(self, sample_name, value):
+        """Merge a sample read from a previous textfile: cumulative samples are added, the
+        other ones are only kept if this process didn't set them."""
+        if self.TYPE in CUMULATIVE_TYPES:
+            self.add_sample(sample_name, value)
+        else:
+            with self._lock:
+                self._samples.setdefault(sample_name, value)
+
+    def get_samples(self):
+        """Return a copy of the samples dictionary."""
+        with self._lock:
+            return dict(self._samples)
+
+    def get_changes(self, previous_samples):
+        """Return the samples changed since a previous copy, as the increase of cumulative
+        samples or the new value of the other ones."""
+        changes = {}
+        for sample_name, value in self.get_samples().items():
+            previous_value = previous_samples.get(sample_name)
+            if previous_value is None:
+                changes[sample_name] = value
+            elif value != previous_value:
+                changes[sample_name] = value - previous_value if self.TYPE in CUMULATIVE_TYPES else value
+        return changes
+
+    def merge_change(self, sample_name, value):
+        """Apply a change returned by get_changes in another process."""
+        if self.TYPE in CUMULATIVE_TYPES:
+            self.add_sample(sample_name, value)
+        else:
+            with self._lock:
+                self._samples[sample_name] = value
+
+    def get_lines(self):
+        """Yield the lines of the metric in the text exposition format."""
+        with self._lock:
+            samples = sorted(self._samples.items(), key=self.get_sort_key)
+        if not samples:
+            return
+        yield f'# HELP {self.name} {self.help_text}\n'
+        yield f'# TYPE {self.name} {self.TYPE}\n'
+        for sample_name, value in samples:
+            yield f'{sample_name} {format_value(value)}\n'
+
+class Counter(Metric):
+    """A metric that only goes up, e.g. the number of scans run."""
+    TYPE = COUNTER
+
+    def inc(self, value=1, labels=()):
+        """Add a value to the counter of the given labels."""
+        self.add_sample(self.get_sample_name(labels), value)
+
+class Gauge(Metric):
+    """A metric holding the last value set, e.g. the rule counts of the last scan."""
+    TYPE = GAUGE
+
+    def set(self, value, labels=()):
+        """Set the value of the gauge of the given labels."""
+        sample_name = self.get_sample_name(labels)
+        with self._lock:
+            self._samples[sample_name] = value
+
+class Histogram(Metric):
+    """A metric counting observations (e.g. durations) in cumulative buckets."""
+    TYPE = HISTOGRAM
+
+    def __init__(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        """Initialize the histogram, see Metric. The buckets are the upper bounds of each bucket."""
+        super().__init__(name, help_text, label_names)
+        self.buckets = buckets
+        self._sample_names = {}
+
+    def get_sample_names(self, labels):
+        """Return the (bucket sample names, +Inf sample name, sum, count) names of the given
+        labels, created once for each set of labels."""
+        sample_names = self._sample_names.get(labels)
+        if sample_names is None:
+            sample_names = (
+                [self.get_sample_name(labels, '_bucket', (('le', format_value(bucket)),)) for bucket in self.buckets],
+                self.get_sample_name(labels, '_bucket', (('le', '+Inf'),)),
+                self.get_sample_name(labels, '_sum'),
+                self.get_sample_name(labels, '_count')
+            )
+            self._sample_names[labels] = sample_names
+        return sample_names
+
+    def observe(self, value, labels=()):
+        """Count an observation in every bucket it fits in."""
+        bucket_names, infinity_name, sum_name, count_name = self.get_sample_names(labels)
+        with self._lock:
+            for bucket, bucket_name in zip(self.buckets, bucket_names):
+                self._samples[bucket_name] = self._samples.get(bucket_name, 0) + (value <= bucket)
+            for sample_name, sample_value in ((infinity_name, 1), (sum_name, value), (count_name, 1)):
+                self._samples[sample_name] = self._samples.get(sample_name, 0) + sample_value
+
+    def get_sort_key(self, sample):
+        """Sort buckets by their upper bound instead of by name, see get_histogram_sort_key."""
+        return get_histogram_sort_key(sample[0])
+
+class MetricsRegistry:
+    """A class to keep the metrics of the process and write them in the Prometheus text
+    exposition format, to a textfile collector file or to an HTTP endpoint."""
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """Add a metric to the registry and return it."""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help_text, label_names=()):
+        """Create and register a Counter metric."""
+        return self.register(Counter(name, help_text, label_names))
+
+    def gauge(self, name, help_text, label_names=()):
+        """Create and register a Gauge metric."""
+        return self.register(Gauge(name, help_text, label_names))
+
+    def histogram(self, name, help_text, label_names=(), buckets=DEFAULT_BUCKETS):
+        """Create and register a Histogram metric."""
+        return self.register(Histogram(name, help_text, label_names, buckets))
+
+    def get_lines(self):
+        """Yield the lines of every metric in the text exposition format."""
+        for name in sorted(self._metrics):
+            yield from self._metrics[name].get_lines()
+
+    def get_metric(self, sample_name):
+        """Return the metric a sample belongs to, or None if it's not registered."""
+        name = sample_name.partition('{')[0]
+        if name in self._metrics:
+            return self._metrics[name]
+        for suffix in HISTOGRAM_SUFFIXES:
+            if name.endswith(suffix) and self._metrics.get(name[:-len(suffix)], Metric).TYPE == HISTOGRAM:
+                return self._metrics[name[:-len(suffix)]]
+        return None
+
+    def snapshot(self):
+        """Return a copy of the samples of every metric, see get_changes."""
+        return {name: metric.get_samples() for name, metric in self._metrics.items()}
+
+    def get_changes(self, snapshot):
+        """Return the samples changed since a snapshot, e.g. by an action run in a worker
+        process, as a dictionary mapping each metric name to its changed samples."""
+        changes = {}
+        for name, metric in self._metrics.items():
+            metric_changes = metric.get_changes(snapshot.get(name, {}))
+            if metric_changes:
+                changes[name] = metric_changes
+        return changes
+
+    def merge_changes(self, changes):
+        """Apply the changes returned by get_changes in another process."""
+        for name, metric_changes in changes.items():
+            metric = self._metrics.get(name)
+            if metric is None:
+                continue
+            for sample_name, value in metric_changes.items():
+                metric.merge_change(sample_name, value)
+
+    def merge_textfile(self, filename):
+        """Merge the samples of a textfile written by a previous run, so counters and
+        histograms keep growing across runs. Unknown samples are dropped."""
+        try:
+            with open(filename) as file_reader:
+                for line in file_reader:
+                    if not line.strip() or line.startswith('#'):
+                        continue
+                    sample_name, _, value = line.rstrip('\n').rpartition(' ')
+                    metric = self.get_metric(sample_name)
+                    if metric is not None:
+                        metric.merge_sample(sample_name, float(value))
+        except FileNotFoundError:
+            pass
+
+    def write_textfile(self, filename):
+        """Merge the metrics with the ones already in a textfile (see merge_textfile) and
+        replace the file atomically, so the textfile collector never reads a partial file.
+        Concurrent runs are serialized with a lock file.
+
+        Positional arguments:
+            filename -- a string representing the textfile's absolute path (*.prom)
+        """
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        with open(filename + LOCK_EXTENSION, 'w') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self.merge_textfile(filename)
+            temp_filename = f'{filename}.{os.getpid()}{TEMP_EXTENSION}'
+            with open(temp_filename, 'w') as file_writer:
+                file_writer.writelines(self.get_lines())
+            os.replace(temp_filename, filename)
+
+class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    """A class to handle the scrape requests of the metrics endpoint."""
+    def do_GET(self):
+        """Send the metrics of the registry in the text exposition format."""
+        if self.path.partition('?')[0] != METRICS_PATH:
+            self.send_error(404)
+            return
+        body = ''.join(self.server.registry.get_lines()).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        """Don't log each scrape request to the stderr."""
+        pass
+
+class MetricsServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """An HTTP server exposing a metrics registry on /metrics."""
+    daemon_threads = True
+
+    def __init__(self, address, port, registry):
+        """Initialize the server.
+
+        Positional arguments:
+            address  -- a string representing the address to listen on
+            port     -- an integer representing the port to listen on
+            registry -- the MetricsRegistry object to expose
+        """
+        self.registry = registry
+        super().__init__((address, port), MetricsRequestHandler)
+
+    def start(self):
+        """Handle requests in a daemon thread and return immediately."""
+        thread = threading.Thread(target=self.serve_forever, name='metrics', daemon=True)
+        thread.start()
+        return thread
+
+REGISTRY = MetricsRegistry()
+# metrics updated by actions running in worker processes are sent back to the workflow's process
+add_process_step_hook('metrics', REGISTRY)
+SCANS = REGISTRY.counter(
+    'oscaptool_scans_total', 'Number of scans run, by exit status of the scan command',
+    ('scantype', 'scansubtype', 'returncode')
+)
+SCAN_DURATION = REGISTRY.histogram(
+    'oscaptool_scan_duration_seconds', 'Time taken by the scan command, including the process spawn',
+    ('scantype', 'scansubtype')
+)
+SCAN_RULES = REGISTRY.gauge(
+    'oscaptool_scan_rules', 'Number of rules of the last scan by result', ('scantype', 'scansubtype', 'result')
+)
+RULES_PARSED = REGISTRY.counter('oscaptool_rules_parsed_total', 'Number of rules parsed, by source', ('source',))
+PARSE_DURATION = REGISTRY.counter(
+    'oscaptool_parse_duration_seconds_total', 'Time spent parsing scan results, by source', ('source',)
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    'oscaptool_cache_requests_total', 'Number of scan result lookups by cache and result (hit or miss)',
+    ('cache', 'result')
+)
+COMPARISONS = REGISTRY.counter(
+    'oscaptool_comparisons_total', 'Number of scan comparisons by method (hash, store or rules)', ('method',)
+)
+COMPARISON_DURATION = REGISTRY.histogram(
+    'oscaptool_comparison_duration_seconds', 'Time taken to compare two scans', ('method',)
+)
+WORKFLOW_DURATION = REGISTRY.histogram(
+    'oscaptool_workflow_duration_seconds', 'Time taken by each workflow run', ('workflow', 'status')
+)
@@ -0,0 +1,174 @@
+from xml.etree import ElementTree
+
+TITLE = 'title'
+RESULT = 'result'
+SEVERITY = 'severity'
+START_EVENT = 'start'
+END_EVENT = 'end'
+# XCCDF elements (any XCCDF version, plain results or inside an ARF report)
+XCCDF_RULE = 'Rule'
+XCCDF_RULE_RESULT = 'rule-result'
+# OVAL elements, a definition is either in the definitions (id) or in the results (definition_id)
+OVAL_RESULTS_ROOT = 'oval_results'
+OVAL_DEFINITION = 'definition'
+OVAL_METADATA = 'metadata'
+OVAL_ADVISORY = 'advisory'
+RECORD_ELEMENTS = (XCCDF_RULE, XCCDF_RULE_RESULT, OVAL_DEFINITION)
+DEFAULT_SEVERITY = 'unknown'
+# oscap doesn't print the rules not selected by the profile
+SKIPPED_RESULTS = ('notselected',)
+# OVAL results of definitions stating a compliant system when true; vulnerability and patch
+# definitions state a vulnerable system when true, see OVAL_NEGATED_CLASSES
+OVAL_RESULTS = {
+    'true': 'pass',
+    'false': 'fail',
+    'not applicable': 'notapplicable',
+    'error': 'error',
+    'unknown': 'unknown',
+    'not evaluated': 'notchecked'
+}
+OVAL_NEGATED_CLASSES = ('vulnerability', 'patch')
+OVAL_NEGATED_RESULTS = {'true': 'fail', 'false': 'pass'}
+
+def get_local_name(tag):
+    """Return the name of an element tag without its namespace."""
+    return tag.rpartition('}')[2]
+
+def get_text(element):
+    """Return the whole text of an element in a single line, with any sequence of whitespace
+    characters replaced by a single space."""
+    return ' '.join(''.join(element.itertext()).split())
+
+class ResultsFileParser:
+    """A class to parse the results file written by oscap (--results), either XCCDF
+    (including ARF reports) or OVAL results. OVAL definitions are only read from OVAL
+    results files: XCCDF and ARF files may include the OVAL results of the checks
+    behind the rules, which are not rules themselves.
+
+    The file is parsed incrementally: each rule (or definition) is handled when its
+    end tag is read and then removed from the tree, so memory doesn't grow with the
+    size of the file. Titles and severities are taken from the rule definitions,
+    which come before the results in the file, and kept by rule id.
+    """
+    def __init__(self):
+        """Initialize the titles, severities and OVAL classes found so far."""
+        self.titles = {}
+        self.severities = {}
+        self.classes = {}
+        self.oval = False
+
+    def parse(self, filename):
+        """Yield the rule results found in a results file, in the order of the file.
+
+        Positional arguments:
+            filename -- a string representing the results file's path
+
+        Return value:
+            an iterator of (title, rule id, result, severity) tuples, with the result
+            names used by oscap's output (pass, fail, notapplicable...).
+        """
+        stack = []
+        open_records = 0
+        for event, element in ElementTree.iterparse(filename, (START_EVENT, END_EVENT)):
+            name = get_local_name(element.tag)
+            if event == START_EVENT:
+                if not stack:
+                    self.oval = name == OVAL_RESULTS_ROOT
+                stack.append(element)
+                if name in RECORD_ELEMENTS:
+                    open_records += 1
+                continue
+            stack.pop()
+            if name in RECORD_ELEMENTS:
+                open_records -= 1
+                rule = self.parse_record(name, element)
+                if rule is not None:
+                    yield rule
+            # the element is its parent's last child; children of rules are kept until the rule ends
+            if stack and not open_records:
+                del stack[-1][-1]
+
+    def parse_record(self, name, element):
+        """Handle a rule definition or a rule result.
+
+        Positional arguments:
+            name    -- a string representing the element's name without namespace
+            element -- the complete element
+
+        Return value:
+            a (title, rule id, result, severity) tuple for a rule result, None otherwise.
+        """
+        if name == XCCDF_RULE:
+            self.add_rule(element.get('id'), self.find_title(element), element.get(SEVERITY))
+        elif name == XCCDF_RULE_RESULT:
+            return self.get_xccdf_result(element)
+        elif not self.oval:
+            return None
+        elif element.get('id') is not None:
+            self.add_oval_definition(element)
+        elif element.get('definition_id') is not None:
+            return self.get_oval_result(element)
+        return None
+
+    def add_rule(self, rule_id, title, severity):
+        """Keep the title and severity of a rule, if known."""
+        if title:
+            self.titles[rule_id] = title
+        if severity:
+            self.severities[rule_id] = severity
+
+    def find_title(self, element):
+        """Return the text of the first title child of an element, or None."""
+        for child in element:
+            if get_local_name(child.tag) == TITLE:
+                return get_text(child)
+        return None
+
+    def get_xccdf_result(self, element):
+        """Return the (title, rule id, result, severity) tuple of an XCCDF rule-result element,
+        or None if the rule was not selected."""
+        rule_id = element.get('idref')
+        result = None
+        for child in element:
+            if get_local_name(child.tag) == RESULT:
+                result = get_text(child)
+                break
+        if result is None or result in SKIPPED_RESULTS:
+            return None
+        severity = element.get(SEVERITY) or self.severities.get(rule_id, DEFAULT_SEVERITY)
+        return self.titles.get(rule_id, rule_id), rule_id, result, severity
+
+    def add_oval_definition(self, element):
+        """Keep the class, title and (advisory) severity of an OVAL definition."""
+        definition_id = element.get('id')
+        self.classes[definition_id] = element.get('class')
+        for child in element:
+            if get_local_name(child.tag) == OVAL_METADATA:
+                severity = None
+                for advisory in child:
+                    if get_local_name(advisory.tag) == OVAL_ADVISORY:
+                        severity = self.find_severity(advisory)
+                self.add_rule(definition_id, self.find_title(child), severity)
+                break
+
+    def find_severity(self, element):
+        """Return the text of the first severity child of an element, or None."""
+        for child in element:
+            if get_local_name(child.tag) == SEVERITY:
+                return get_text(child).lower()
+        return None
+
+    def get_oval_result(self, element):
+        """Return the (title, rule id, result, severity) tuple of an OVAL definition result."""
+        definition_id = element.get('definition_id')
+        result = element.get(RESULT, '')
+        if self.classes.get(definition_id) in OVAL_NEGATED_CLASSES:
+            result = OVAL_NEGATED_RESULTS.get(result, OVAL_RESULTS.get(result, result))
+        else:
+            result = OVAL_RESULTS.get(result, result)
+        return (
+            self.titles.get(definition_id, definition_id),
+            definition_id,
+            result,
+            self.severities.get(definition_id, DEFAULT_SEVERITY)
+        )
@@ -0,0 +1,293 @@
+import os
+import re
+import sqlite3
+import datetime
+import threading
+import contextlib
+
+from oscaptool.sample.history import ScanHistoryIndex, MAX_CHARACTER
+from oscaptool.sample.util import FileHelper
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS rules (
+    id INTEGER PRIMARY KEY,
+    rule_id TEXT UNIQUE NOT NULL,
+    title TEXT
+);
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    scan_id TEXT UNIQUE NOT NULL,
+    scan_type TEXT,
+    scan_subtype TEXT
+);
+CREATE TABLE IF NOT EXISTS results (
+    rule INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    scan INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS results_rule ON results(rule, result, scan);
+CREATE INDEX IF NOT EXISTS results_scan ON results(scan, rule);
+CREATE TABLE IF NOT EXISTS indexed_sources (
+    source TEXT PRIMARY KEY
+);
+'''
+# results tables created by older versions were WITHOUT ROWID tables, which need SQLite 3.8.2,
+# they are copied to a table with row ids in a single transaction
+RESULTS_MIGRATION = f'''
+BEGIN;
+DROP INDEX IF EXISTS results_scan;
+ALTER TABLE results RENAME TO old_results;
+{SCHEMA}
+INSERT INTO results (rule, result, scan) SELECT rule, result, scan FROM old_results;
+DROP TABLE old_results;
+COMMIT;
+'''
+TIMESTAMP_FORMAT = '%Y-%m-%d_%H:%M:%S'
+EPOCH = datetime.datetime(1970, 1, 1)
+# scan row ids are the scan timestamp in seconds shifted by SCAN_KEY_BITS, plus a sequence
+# number for the scans of the same second, so they sort like the scan ids
+SCAN_KEY_BITS = 16
+LIKE_ESCAPE = '\\'
+RESULT_COLUMNS = 'rules.rule_id, rules.title, scans.scan_id, results.result'
+JOIN = 'results JOIN rules ON rules.id = results.rule JOIN scans ON scans.id = results.scan'
+
+def regexp(pattern, value):
+    """The sqlite REGEXP function: True if the pattern matches the value (re.search)."""
+    return value is not None and re.search(pattern, value) is not None
+
+def get_scan_key(scan_id):
+    """Return the first row id of the scans of the same second as a scan id, or None if
+    the scan id doesn't start with a timestamp."""
+    timestamp = ScanHistoryIndex.parse_scan_id(scan_id)[0]
+    if timestamp is None:
+        return None
+    seconds = int((datetime.datetime.strptime(timestamp, TIMESTAMP_FORMAT) - EPOCH).total_seconds())
+    return seconds << SCAN_KEY_BITS
+
+def escape_like(value):
+    """Escape the LIKE wildcards of a string so it matches as a plain substring."""
+    for character in (LIKE_ESCAPE, '%', '_'):
+        value = value.replace(character, LIKE_ESCAPE + character)
+    return value
+
+class RuleIndex:
+    """A helper class to keep an inverted index of rule results in a sqlite file, so the
+    results of a rule can be found across every saved scan without loading the scans.
+
+    Rule ids (with their latest title) and scan ids are kept once, and each result is
+    a (rule, result, scan) row. A covering index by rule and result makes the history of
+    a rule a range of consecutive index entries. Scan row ids sort like the scan ids (see
+    get_scan_key), so the last scan with a given result is the end of that range. A second
+    index by scan serves the queries by date.
+    """
+    # database files whose schema is up to date, see FileHelper.get_file_id
+    _initialized = set()
+    _initialized_lock = threading.Lock()
+
+    def __init__(self, filename):
+        """Initialize the index, creating the database file if it doesn't exist. The schema
+        is only set up the first time a database file is opened by the process.
+
+        Positional arguments:
+            filename -- a string representing the database file's absolute path
+        """
+        self.filename = filename
+        with RuleIndex._initialized_lock:
+            if FileHelper.get_file_id(filename) in RuleIndex._initialized:
+                return
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            with self.connect() as connection:
+                row = connection.execute(
+                    "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'results'"
+                ).fetchone()
+                if row is not None and 'WITHOUT ROWID' in row[0].upper():
+                    connection.executescript(RESULTS_MIGRATION)
+                else:
+                    connection.executescript(SCHEMA)
+            RuleIndex._initialized.add(FileHelper.get_file_id(filename))
+
+    @contextlib.contextmanager
+    def connect(self):
+        """Open a connection to the database, commit on success and close it on exit."""
+        connection = sqlite3.connect(self.filename)
+        connection.create_function('REGEXP', 2, regexp)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def add_scan(self, scan_id, rules):
+        """Add (or replace) the results of a scan.
+
+        Positional arguments:
+            scan_id -- a string representing the scan id
+            rules   -- an iterable of (title, rule id, result) tuples
+        """
+        self.add_scans([(scan_id, rules)])
+
+    def add_scans(self, scans):
+        """Add (or replace) the results of many scans in a single transaction. The transaction
+        takes the write lock before reading the rules and the scan row ids, so scans saved at
+        the same time by other threads or processes can't add the same rule or row id.
+
+        Positional arguments:
+            scans -- an iterable of (scan id, rules) tuples, see add_scan
+        """
+        with self.connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            rule_ids = {}
+            for row_id, rule_id, title in connection.execute('SELECT id, rule_id, title FROM rules'):
+                rule_ids[rule_id] = (row_id, title)
+            for scan_id, rules in scans:
+                self._remove_scans(connection, [scan_id])
+                scan = connection.execute(
+                    'INSERT INTO scans (id, scan_id, scan_type, scan_subtype) VALUES (?, ?, ?, ?)',
+                    (self._get_scan_row_id(connection, scan_id), scan_id) + ScanHistoryIndex.parse_scan_id(scan_id)[1:]
+                ).lastrowid
+                results = {}
+                for title, rule_id, result in rules:
+                    known = rule_ids.get(rule_id)
+                    if known is None:
+                        known = (connection.execute(
+                            'INSERT INTO rules (rule_id, title) VALUES (?, ?)', (rule_id, title)
+                        ).lastrowid, title)
+                        rule_ids[rule_id] = known
+                    elif title and known[1] != title:
+                        connection.execute('UPDATE rules SET title = ? WHERE id = ?', (title, known[0]))
+                        known = rule_ids[rule_id] = (known[0], title)
+                    results[known[0]] = result
+                connection.executemany(
+                    'INSERT INTO results (rule, scan, result) VALUES (?, ?, ?)',
+                    ((rule, scan, result) for rule, result in results.items())
+                )
+
+    def _get_scan_row_id(self, connection, scan_id):
+        """Return the row id of a new scan: the next free id of its second, or None to let
+        sqlite choose one if the scan id has no timestamp."""
+        key = get_scan_key(scan_id)
+        if key is None:
+            return None
+        row = connection.execute(
+            'SELECT MAX(id) FROM scans WHERE id >= ? AND id < ?', (key, key + (1 << SCAN_KEY_BITS))
+        ).fetchone()
+        return key if row[0] is None else row[0] + 1
+
+    def remove_scans(self, scan_ids):
+        """Remove the results of many scans.
+
+        Positional arguments:
+            scan_ids -- an iterable of strings representing the scan ids
+        """
+        with self.connect() as connection:
+            self._remove_scans(connection, scan_ids)
+
+    def _remove_scans(self, connection, scan_ids):
+        """Remove the results of many scans with an open connection."""
+        for scan_id in scan_ids:
+            row = connection.execute('SELECT id FROM scans WHERE scan_id = ?', (scan_id,)).fetchone()
+            if row is not None:
+                connection.execute('DELETE FROM results WHERE scan = ?', row)
+                connection.execute('DELETE FROM scans WHERE id = ?', row)
+
+    def get_scan_ids(self):
+        """Return a set of all the scan ids in the index."""
+        with self.connect() as connection:
+            return {row[0] for row in connection.execute('SELECT scan_id FROM scans')}
+
+    def is_indexed(self, source):
+        """Return True if the scans of a source (e.g. a scan store) were already added."""
+        with self.connect() as connection:
+            row = connection.execute('SELECT 1 FROM indexed_sources WHERE source = ?', (source,)).fetchone()
+        return row is not None
+
+    def set_indexed(self, source):
+        """Mark the scans of a source as added to the index."""
+        with self.connect() as connection:
+            connection.execute('INSERT OR IGNORE INTO indexed_sources (source) VALUES (?)', (source,))
+
+    def query(self, rule_id=None, prefix=None, pattern=None, title=None, result=None, since=None,
+              until=None, scan_type=None, scan_subtype=None, last=False, every=False, limit=None):
+        """Return the rule results matching the given filters. Rule filters are combined,
+        e.g. a prefix and a title. Scan ids start with a '%Y-%m-%d_%H:%M:%S' timestamp,
+        so dates can be given with any precision.
+
+        Positional arguments:
+            rule_id      -- a string representing a rule id, or None
+            prefix       -- a string representing the start of the rule ids, or None
+            pattern      -- a regular expression searched in the rule ids, or None
+            title        -- a string contained in the titles (case insensitive), or None
+            result       -- a string representing a result (pass, fail...), or None
+            since        -- a string representing the first date, or None
+            until        -- a string representing the last date (inclusive), or None
+            scan_type    -- a string representing the scan type, or None
+            scan_subtype -- a string representing the scan subtype, or None
+            last         -- a boolean, True to return the newest matching result of each rule only
+            every        -- a boolean, True to return the rules with the result in every
+                            matching scan that evaluated them
+            limit        -- the maximum number of rows to return, or None
+
+        Return value:
+            a list of (rule id, title, scan id, result) tuples sorted by rule id and scan id,
+            or, if every is set, a list of (rule id, title, result, scans, first scan id,
+            last scan id) tuples sorted by rule id.
+        """
+        rule_conditions = []
+        scan_conditions = []
+        parameters = {'result': result, 'limit': -1 if limit is None else limit}
+        if rule_id:
+            rule_conditions.append('rules.rule_id = :rule_id')
+            parameters['rule_id'] = rule_id
+        if prefix:
+            rule_conditions.append('rules.rule_id >= :prefix AND rules.rule_id < :prefix_end')
+            parameters.update(prefix=prefix, prefix_end=prefix + MAX_CHARACTER)
+        if pattern:
+            rule_conditions.append('rules.rule_id REGEXP :pattern')
+            parameters['pattern'] = pattern
+        if title:
+            rule_conditions.append(f"rules.title LIKE :title ESCAPE '{LIKE_ESCAPE}'")
+            parameters['title'] = f'%{escape_like(title)}%'
+        if since:
+            scan_conditions.append('scans.scan_id >= :since')
+            parameters['since'] = since
+        if until:
+            scan_conditions.append('scans.scan_id <= :until')
+            parameters['until'] = until + MAX_CHARACTER
+        if scan_type:
+            scan_conditions.append('scans.scan_type = :scan_type')
+            parameters['scan_type'] = scan_type
+        if scan_subtype:
+            scan_conditions.append('scans.scan_subtype = :scan_subtype')
+            parameters['scan_subtype'] = scan_subtype
+        # the rule filters are applied to the rules table first, not to every result
+        rules_where = f"WHERE {' AND '.join(rule_conditions)}" if rule_conditions else ''
+        conditions = list(scan_conditions)
+        if rule_conditions:
+            conditions.append(f'results.rule IN (SELECT rules.id FROM rules {rules_where})')
+        if result and not every:
+            conditions.append('results.result = :result')
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ''
+        if every:
+            statement = (
+                f'SELECT rules.rule_id, rules.title, :result, COUNT(*), MIN(scans.scan_id), MAX(scans.scan_id) '
+                f'FROM {JOIN} {where}GROUP BY results.rule '
+                f'HAVING SUM(results.result = :result) = COUNT(*) ORDER BY rules.rule_id'
+            )
+        elif last:
+            # the newest matching scan of each rule is found in its own range of the results
+            last_where = ' AND '.join(['results.rule = rules.id'] + scan_conditions + (
+                ['results.result = :result'] if result else []
+            ))
+            last_join = 'JOIN scans ON scans.id = results.scan ' if scan_conditions else ''
+            statement = (
+                f'SELECT {RESULT_COLUMNS} FROM (SELECT rules.id AS rule, (SELECT MAX(results.scan) '
+                f'FROM results {last_join}WHERE {last_where}) AS scan '
+                f'FROM rules {rules_where}) AS last_results '
+                f'JOIN results ON results.rule = last_results.rule AND results.scan = last_results.scan '
+                f'JOIN rules ON rules.id = results.rule JOIN scans ON scans.id = results.scan '
+                f'ORDER BY rules.rule_id'
+            )
+        else:
+            statement = f'SELECT {RESULT_COLUMNS} FROM {JOIN} {where}ORDER BY rules.rule_id, results.scan'
+        with self.connect() as connection:
+            return connection.execute(f'{statement} LIMIT :limit', parameters).fetchall()
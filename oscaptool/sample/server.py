@@ -0,0 +1,204 @@
+import io
+import os
+import sys
+import json
+import socket
+import logging
+import argparse
+import time
+import threading
+import socketserver
+
+from actionmanager.manager import ActionManager, WorkflowMetadata, add_thread_step_hook
+from oscaptool.sample.actions import GetScanResult, PARALLEL_PARSE, TRUE_VALUES
+from oscaptool.sample import metrics
+
+WORKFLOW_ID = 'workflow_id'
+INPUTS = 'inputs'
+STATUS = 'status'
+OUTPUT = 'output'
+ERROR = 'error'
+ENCODING = 'utf-8'
+DEFAULT_SOCKET_PATH = '/home/oscaptool/oscaptool.sock'
+RECV_SIZE = 65536
+HTTP_ADDRESS = 'http_address'
+HTTP_PORT = 'http_port'
+DEFAULT_HTTP_ADDRESS = '127.0.0.1'
+
+class ThreadStdout(io.TextIOBase):
+    """A stdout replacement that sends the output of each thread to the sink set for it,
+    so concurrent workflows printing to the stdout don't mix their output.
+
+    The sink is a thread step hook of the action manager (see add_thread_step_hook): the
+    worker threads running the steps of a workflow write to the sink of the thread running
+    the workflow.
+    """
+    def __init__(self, stdout):
+        """Initialize the object with the original stdout, used by threads without a sink."""
+        self._stdout = stdout
+        self._local = threading.local()
+
+    def get_thread_state(self):
+        """Return the sink of the current thread, or None."""
+        return getattr(self._local, 'sink', None)
+
+    def set_thread_state(self, sink):
+        """Set the sink of the current thread, a file like object or None for the original stdout."""
+        self._local.sink = sink
+
+    def write(self, text):
+        """Write text to the current thread's sink or to the original stdout."""
+        sink = self.get_thread_state()
+        if sink is None:
+            return self._stdout.write(text)
+        return sink.write(text)
+
+    def flush(self):
+        """Flush the original stdout."""
+        self._stdout.flush()
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """A class to handle a single workflow request. Requests and responses are JSON
+    objects sent as a single line."""
+    def handle(self):
+        """Run the requested workflow and send back its output."""
+        try:
+            request = json.loads(self.rfile.readline().decode(ENCODING))
+            response = self.server.run_workflow(request[WORKFLOW_ID], request.get(INPUTS, {}))
+        except (ValueError, KeyError) as e:
+            response = {STATUS: 1, ERROR: f'invalid request: {e}'}
+        self.wfile.write(json.dumps(response).encode(ENCODING) + b'\n')
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """A server running workflow requests concurrently over a unix domain socket.
+
+    The action manager configuration and all the workflow actions are loaded once
+    and shared by every request, as are the action manager's step pools. The parse pool
+    and the step process pool are started before serving, see start_parse_pool. If the metrics config sets an http_port, the metrics
+    are exposed on http://<http_address>:<http_port>/metrics while the server runs.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, action_manager_config, metrics_config=None):
+        """Initialize the server, replacing a stale socket file if present.
+
+        Positional arguments:
+            socket_path           -- a string representing the socket file's absolute path
+            action_manager_config -- the configuration dictionary for the action manager
+            metrics_config        -- optional, the metrics configuration dictionary
+        """
+        self.logger = logging.getLogger()
+        self._action_manager_config = action_manager_config
+        self._action_manager = ActionManager(action_manager_config)
+        self._stdout = ThreadStdout(sys.stdout)
+        add_thread_step_hook('stdout', self._stdout)
+        self.start_parse_pool()
+        self._action_manager.start_process_pool()
+        self._metrics_server = None
+        if metrics_config and metrics_config.get(HTTP_PORT):
+            self._metrics_server = metrics.MetricsServer(
+                metrics_config.get(HTTP_ADDRESS, DEFAULT_HTTP_ADDRESS),
+                metrics_config[HTTP_PORT],
+                metrics.REGISTRY
+            )
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, RequestHandler)
+
+    def start_parse_pool(self):
+        """Start the worker processes of the scan file parse pool, if a workflow parses in
+        parallel, see GetScanResult.get_parse_pool. The workers are forked before the server
+        starts any thread: a process forked while another thread holds a lock (e.g. a
+        logging handler's) can hang, and Python 3.6 pools can't use another start method.
+        """
+        for workflow_actions in self._action_manager._actions.values():
+            for action in workflow_actions.values():
+                if isinstance(action, GetScanResult) and action.config.get(PARALLEL_PARSE) in TRUE_VALUES:
+                    action.start_parse_pool()
+                    return
+
+    def run_workflow(self, workflow_id, inputs):
+        """Run a workflow capturing everything it prints in a sink of its own.
+
+        Return value:
+            a response dictionary including the status and the output or error message.
+        """
+        self.logger.debug(f'Running workflow {workflow_id} for server request')
+        sink = io.StringIO()
+        self._stdout.set_thread_state(sink)
+        start_time = time.perf_counter()
+        try:
+            ActionManager(
+                self._action_manager_config, self._action_manager._actions, self._action_manager._pools
+            ).run_workflow(WorkflowMetadata(workflow_id, inputs))
+            status = 'ok'
+            return {STATUS: 0, OUTPUT: sink.getvalue()}
+        except Exception as e:
+            status = 'error'
+            self.logger.error(f'Error while running workflow {workflow_id} for server request', exc_info=1)
+            return {STATUS: 1, OUTPUT: sink.getvalue(), ERROR: str(e)}
+        finally:
+            self._stdout.set_thread_state(None)
+            metrics.WORKFLOW_DURATION.observe(time.perf_counter() - start_time, (workflow_id, status))
+
+    def serve_forever(self, *args, **kwargs):
+        """Redirect the stdout to the per-request sinks and handle requests until shutdown."""
+        sys.stdout = self._stdout
+        if self._metrics_server:
+            self._metrics_server.start()
+        try:
+            super().serve_forever(*args, **kwargs)
+        finally:
+            sys.stdout = self._stdout._stdout
+            GetScanResult.shutdown_parse_pool()
+            self._action_manager.shutdown()
+            if self._metrics_server:
+                self._metrics_server.shutdown()
+                self._metrics_server.server_close()
+            self.server_close()
+            os.remove(self.server_address)
+
+def send_request(socket_path, workflow_id, inputs):
+    """Send a workflow request to a running server and wait for the response.
+
+    Positional arguments:
+        socket_path -- a string representing the server's socket file
+        workflow_id -- a string representing the workflow to run
+        inputs      -- a dictionary including the workflow's initial inputs
+
+    Return value:
+        the response dictionary sent by the server.
+    """
+    request = json.dumps({WORKFLOW_ID: workflow_id, INPUTS: inputs}).encode(ENCODING) + b'\n'
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client_socket:
+        client_socket.connect(socket_path)
+        client_socket.sendall(request)
+        response = b''
+        while not response.endswith(b'\n'):
+            data = client_socket.recv(RECV_SIZE)
+            if not data:
+                break
+            response += data
+    return json.loads(response.decode(ENCODING))
+
+def run_client():
+    """Thin client's entry point: sends a workflow request built from the command line
+    to a running server and prints the workflow output."""
+    parser = argparse.ArgumentParser(prog='oscaptool-client')
+    parser.add_argument('workflow_id', help='The workflow to run (e.g. show-scan-result)')
+    parser.add_argument('inputs', nargs='*', help='The workflow inputs as key=value pairs')
+    parser.add_argument('--socket', default=DEFAULT_SOCKET_PATH, help='The server socket file')
+    args = parser.parse_args()
+    try:
+        inputs = dict(item.split('=', 1) for item in args.inputs)
+    except ValueError:
+        parser.error('inputs must be key=value pairs')
+    try:
+        response = send_request(args.socket, args.workflow_id, inputs)
+    except (OSError, ValueError) as e:
+        print(f"Can't send request to {args.socket}: {e}")
+        sys.exit(1)
+    print(response.get(OUTPUT, ''), end='')
+    if response[STATUS]:
+        print(response[ERROR])
+    sys.exit(response[STATUS])
@@ -0,0 +1,416 @@
+import os
+import time
+import sqlite3
+import threading
+import contextlib
+import collections
+
+from oscaptool.sample.util import FileHelper
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS scans (
+    id INTEGER PRIMARY KEY,
+    scan_id TEXT UNIQUE NOT NULL,
+    pass_count INTEGER NOT NULL,
+    fail_count INTEGER NOT NULL,
+    na_count INTEGER NOT NULL,
+    total INTEGER NOT NULL,
+    base INTEGER,
+    chain TEXT,
+    created REAL,
+    content_hash TEXT
+);
+CREATE TABLE IF NOT EXISTS titles (
+    id INTEGER PRIMARY KEY,
+    title TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rules (
+    scan INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    rule_id TEXT NOT NULL,
+    result TEXT NOT NULL,
+    title INTEGER NOT NULL REFERENCES titles(id),
+    PRIMARY KEY (scan, position)
+);
+CREATE TABLE IF NOT EXISTS changes (
+    scan INTEGER NOT NULL REFERENCES scans(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    old TEXT NOT NULL,
+    new TEXT NOT NULL,
+    PRIMARY KEY (scan, position)
+);
+CREATE INDEX IF NOT EXISTS rules_rule_id ON rules(rule_id);
+'''
+# columns added for delta encoding and deduplication, missing from stores created by older versions
+DELTA_COLUMNS = (('base', 'INTEGER'), ('chain', 'TEXT'), ('created', 'REAL'), ('content_hash', 'TEXT'))
+DELTA_INDEXES = '''
+CREATE INDEX IF NOT EXISTS scans_base ON scans(base);
+CREATE INDEX IF NOT EXISTS scans_chain ON scans(chain, id);
+'''
+PASS_RESULT = 'pass'
+FAIL_RESULT = 'fail'
+KEYFRAME_CACHE_ENTRIES = 8
+
+class ScanStore:
+    """A helper class to keep parsed scan results in a single sqlite file.
+
+    Each scan is stored as its stats plus one row per rule (rule id, result and
+    a reference to a shared title dictionary), so scans can be loaded again
+    without parsing the original text output.
+
+    Scans saved with a chain (e.g. the scan type and subtype) can be delta encoded:
+    a scan with the same rules as the previous scan of its chain is stored as the
+    results that changed (a delta against the previous scan), and a full keyframe
+    is stored every keyframe_interval scans. Delta scans are rebuilt from their
+    keyframe, which is kept in a small in-memory cache.
+
+    Scans can also keep the hash of their rules and results, see save_duplicate_scan.
+    """
+    _keyframe_cache = collections.OrderedDict()
+    _keyframe_cache_lock = threading.Lock()
+    # database files whose schema is up to date, see FileHelper.get_file_id
+    _initialized = set()
+    _initialized_lock = threading.Lock()
+
+    def __init__(self, filename):
+        """Initialize the store, creating the database file if it doesn't exist. The schema
+        is only set up the first time a database file is opened by the process.
+
+        Positional arguments:
+            filename -- a string representing the database file's absolute path
+        """
+        self.filename = filename
+        with ScanStore._initialized_lock:
+            if FileHelper.get_file_id(filename) in ScanStore._initialized:
+                return
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            with self.connect() as connection:
+                connection.executescript(SCHEMA)
+                columns = {row[1] for row in connection.execute('PRAGMA table_info(scans)')}
+                for name, column_type in DELTA_COLUMNS:
+                    if name not in columns:
+                        connection.execute(f'ALTER TABLE scans ADD COLUMN {name} {column_type}')
+                connection.executescript(DELTA_INDEXES)
+            ScanStore._initialized.add(FileHelper.get_file_id(filename))
+
+    @contextlib.contextmanager
+    def connect(self):
+        """Open a connection to the database, commit on success and close it on exit."""
+        connection = sqlite3.connect(self.filename)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @contextlib.contextmanager
+    def snapshot(self):
+        """Open a connection reading from a single snapshot of the database, so a scan saved
+        again or removed by another thread or process between two queries can't be seen half
+        way through."""
+        with self.connect() as connection:
+            connection.execute('BEGIN')
+            yield connection
+
+    def has_scan(self, scan_id):
+        """Return True if the given scan id is present in the store."""
+        with self.connect() as connection:
+            row = connection.execute('SELECT 1 FROM scans WHERE scan_id = ?', (scan_id,)).fetchone()
+        return row is not None
+
+    def save_scan(self, scan_id, rules, stats, chain=None, keyframe_interval=0, content_hash=None):
+        """Save (or replace) a parsed scan.
+
+        Positional arguments:
+            scan_id           -- a string representing the scan id
+            rules             -- an iterable of (title, rule id, result) tuples
+            stats             -- a (pass, fail, notapplicable, total) tuple
+            chain             -- optional, a string grouping the scans that can be delta encoded
+            keyframe_interval -- optional, the maximum number of scans from a keyframe to
+                                 the last delta scan, 0 to store full scans only
+            content_hash      -- optional, a string representing the hash of the rules and results
+        """
+        with self.connect() as connection:
+            self._save_scan(connection, scan_id, rules, stats, chain, content_hash, keyframe_interval)
+
+    def save_scans(self, scans, keyframe_interval=0):
+        """Save many parsed scans in a single transaction.
+
+        Positional arguments:
+            scans             -- an iterable of (scan id, rules, stats) tuples, optionally followed
+                                 by the chain and the content hash, see save_scan
+            keyframe_interval -- optional, see save_scan
+        """
+        title_ids = {}
+        last_rules = {}
+        with self.connect() as connection:
+            for scan in scans:
+                self._save_scan(
+                    connection, *scan,
+                    keyframe_interval=keyframe_interval, title_ids=title_ids, last_rules=last_rules
+                )
+
+    def _save_scan(self, connection, scan_id, rules, stats, chain=None, content_hash=None, keyframe_interval=0,
+                   title_ids=None, last_rules=None):
+        """Insert a scan and its rules (or its changes) using an open connection, see
+        _insert_rules for title_ids and _find_base for last_rules."""
+        self._remove_scan(connection, scan_id)
+        rules = list(rules)
+        base, base_rules = self._find_base(connection, rules, chain, keyframe_interval, last_rules)
+        cursor = connection.execute(
+            'INSERT INTO scans (scan_id, pass_count, fail_count, na_count, total, base, chain, created, content_hash) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (scan_id,) + tuple(stats) + (base, chain, time.time(), content_hash)
+        )
+        scan = cursor.lastrowid
+        if last_rules is not None and chain:
+            last_rules[chain] = (scan, rules)
+        if base is None:
+            self._insert_rules(connection, scan, rules, title_ids)
+        else:
+            connection.executemany(
+                'INSERT INTO changes (scan, position, old, new) VALUES (?, ?, ?, ?)',
+                (
+                    (scan, position, old[2], new[2])
+                    for position, (old, new) in enumerate(zip(base_rules, rules)) if old[2] != new[2]
+                )
+            )
+
+    def save_duplicate_scan(self, scan_id, duplicated_scan_id, keyframe_interval=0):
+        """Save a scan with exactly the same rules and results as a stored scan (same content
+        hash). Like in save_scan, it's saved as a delta of that scan without changes if the
+        keyframe is less than keyframe_interval scans away, otherwise as a keyframe with a
+        copy of its rules, so delta paths stay bounded.
+
+        Positional arguments:
+            scan_id            -- a string representing the new scan id
+            duplicated_scan_id -- a string representing the stored scan id
+            keyframe_interval  -- optional, see save_scan
+
+        Return value:
+            True if the scan was saved, False if the duplicated scan is not in the store.
+        """
+        with self.connect() as connection:
+            self._remove_scan(connection, scan_id)
+            row = connection.execute(
+                'SELECT id, chain FROM scans WHERE scan_id = ?', (duplicated_scan_id,)
+            ).fetchone()
+            if row is None:
+                return False
+            duplicated, chain = row
+            keyframe = (
+                not chain or not keyframe_interval
+                or len(self._get_path(connection, duplicated)) >= keyframe_interval
+            )
+            scan = connection.execute(
+                'INSERT INTO scans (scan_id, pass_count, fail_count, na_count, total, base, chain, created, content_hash) '
+                'SELECT ?, pass_count, fail_count, na_count, total, ?, chain, ?, content_hash FROM scans WHERE id = ?',
+                (scan_id, None if keyframe else duplicated, time.time(), duplicated)
+            ).lastrowid
+            if keyframe:
+                self._insert_rules(connection, scan, self._load_rules(connection, duplicated))
+            return True
+
+    def get_last_scan(self, chain):
+        """Return the (scan id, content hash) tuple of the last scan saved in a chain, or None
+        if the chain is empty. The content hash is None if it wasn't saved with the scan."""
+        with self.connect() as connection:
+            return connection.execute(
+                'SELECT scan_id, content_hash FROM scans WHERE chain = ? ORDER BY id DESC LIMIT 1',
+                (chain,)
+            ).fetchone()
+
+    def get_content_hash(self, scan_id):
+        """Return the content hash of a scan, or None if it's unknown."""
+        with self.connect() as connection:
+            row = connection.execute('SELECT content_hash FROM scans WHERE scan_id = ?', (scan_id,)).fetchone()
+        return row[0] if row else None
+
+    def _insert_rules(self, connection, scan, rules, title_ids=None):
+        """Insert the full list of rules of a scan using an open connection. The title ids
+        looked up are added to the title_ids dictionary, which can be shared by the scans
+        saved in the same transaction so each title is only looked up once."""
+        if title_ids is None:
+            title_ids = {}
+        rows = []
+        for position, (title, rule_id, result) in enumerate(rules):
+            if title not in title_ids:
+                connection.execute('INSERT OR IGNORE INTO titles (title) VALUES (?)', (title,))
+                title_ids[title] = connection.execute('SELECT id FROM titles WHERE title = ?', (title,)).fetchone()[0]
+            rows.append((scan, position, rule_id, result, title_ids[title]))
+        connection.executemany(
+            'INSERT INTO rules (scan, position, rule_id, result, title) VALUES (?, ?, ?, ?, ?)',
+            rows
+        )
+
+    def _find_base(self, connection, rules, chain, keyframe_interval, last_rules=None):
+        """Find the scan a new scan can be delta encoded against: the last scan of the chain,
+        if its keyframe is less than keyframe_interval scans away and it has the same rules
+        (same titles and rule ids in the same order, without duplicated rule ids). When many
+        scans are saved at once, last_rules maps each chain to the (scan row id, rules) of the
+        last scan saved, so its rules don't have to be rebuilt from the database.
+
+        Return value:
+            a (scan row id, list of rule tuples) tuple, or (None, None) to store a keyframe.
+        """
+        if not chain or not keyframe_interval:
+            return None, None
+        row = connection.execute('SELECT id FROM scans WHERE chain = ? ORDER BY id DESC LIMIT 1', (chain,)).fetchone()
+        if row is None or len(self._get_path(connection, row[0])) >= keyframe_interval:
+            return None, None
+        if last_rules and last_rules.get(chain, (None,))[0] == row[0]:
+            base_rules = last_rules[chain][1]
+        else:
+            base_rules = self._load_rules(connection, row[0])
+        if len(base_rules) != len(rules) or len({rule[1] for rule in rules}) != len(rules):
+            return None, None
+        for old, new in zip(base_rules, rules):
+            if old[0] != new[0] or old[1] != new[1]:
+                return None, None
+        return row[0], base_rules
+
+    def _get_path(self, connection, scan):
+        """Return the row ids of a scan and of the scans it depends on, ending with its keyframe.
+        The base pointers are followed one query at a time, recursive queries need SQLite 3.8.3
+        and the paths are at most keyframe_interval scans long."""
+        path = [scan]
+        base = connection.execute('SELECT base FROM scans WHERE id = ?', (scan,)).fetchone()[0]
+        while base is not None:
+            path.append(base)
+            base = connection.execute('SELECT base FROM scans WHERE id = ?', (base,)).fetchone()[0]
+        return path
+
+    def _get_changes(self, connection, scan):
+        """Return a list of (position, old result, new result) tuples of a delta scan."""
+        return connection.execute('SELECT position, old, new FROM changes WHERE scan = ?', (scan,)).fetchall()
+
+    def _load_rules(self, connection, scan):
+        """Return the list of rule tuples of a scan, applying the changes of every delta scan
+        on the path from its keyframe."""
+        path = self._get_path(connection, scan)
+        rules = list(self._get_keyframe_rules(connection, path[-1]))
+        for delta_scan in reversed(path[:-1]):
+            for position, _, new in self._get_changes(connection, delta_scan):
+                title, rule_id, _ = rules[position]
+                rules[position] = (title, rule_id, new)
+        return rules
+
+    def _get_keyframe_rules(self, connection, scan):
+        """Return the rule tuples of a keyframe scan, using the keyframe cache."""
+        created = connection.execute('SELECT created FROM scans WHERE id = ?', (scan,)).fetchone()[0]
+        key = (self.filename, scan, created)
+        with ScanStore._keyframe_cache_lock:
+            if key in ScanStore._keyframe_cache:
+                ScanStore._keyframe_cache.move_to_end(key)
+                return ScanStore._keyframe_cache[key]
+        rules = tuple(connection.execute(
+            'SELECT titles.title, rules.rule_id, rules.result FROM rules '
+            'JOIN titles ON rules.title = titles.id '
+            'WHERE rules.scan = ? ORDER BY rules.position',
+            (scan,)
+        ))
+        with ScanStore._keyframe_cache_lock:
+            ScanStore._keyframe_cache[key] = rules
+            while len(ScanStore._keyframe_cache) > KEYFRAME_CACHE_ENTRIES:
+                ScanStore._keyframe_cache.popitem(last=False)
+        return rules
+
+    def remove_scans(self, scan_ids):
+        """Remove many scans and their rules in a single transaction.
+
+        Positional arguments:
+            scan_ids -- an iterable of strings representing the scan ids
+        """
+        with self.connect() as connection:
+            for scan_id in scan_ids:
+                self._remove_scan(connection, scan_id)
+
+    def _remove_scan(self, connection, scan_id):
+        """Remove a scan using an open connection. A delta scan depending on the removed
+        scan is re-encoded first: it becomes a keyframe if the removed scan was a keyframe,
+        otherwise the changes of both scans are merged."""
+        row = connection.execute('SELECT id, base FROM scans WHERE scan_id = ?', (scan_id,)).fetchone()
+        if row is None:
+            return
+        scan, base = row
+        for (dependent,) in connection.execute('SELECT id FROM scans WHERE base = ?', (scan,)).fetchall():
+            if base is None:
+                rules = self._load_rules(connection, dependent)
+                self._insert_rules(connection, dependent, rules)
+                connection.execute('DELETE FROM changes WHERE scan = ?', (dependent,))
+            else:
+                changes = {position: (old, new) for position, old, new in self._get_changes(connection, scan)}
+                for position, old, new in self._get_changes(connection, dependent):
+                    changes[position] = (changes[position][0] if position in changes else old, new)
+                connection.execute('DELETE FROM changes WHERE scan = ?', (dependent,))
+                connection.executemany(
+                    'INSERT INTO changes (scan, position, old, new) VALUES (?, ?, ?, ?)',
+                    ((dependent, position, old, new) for position, (old, new) in changes.items() if old != new)
+                )
+            connection.execute('UPDATE scans SET base = ? WHERE id = ?', (base, dependent))
+        connection.execute('DELETE FROM rules WHERE scan = ?', (scan,))
+        connection.execute('DELETE FROM changes WHERE scan = ?', (scan,))
+        connection.execute('DELETE FROM scans WHERE id = ?', (scan,))
+
+    def get_stats(self, scan_id):
+        """Return the (pass, fail, notapplicable, total) tuple of a scan, or None if
+        the scan is not in the store."""
+        with self.connect() as connection:
+            return connection.execute(
+                'SELECT pass_count, fail_count, na_count, total FROM scans WHERE scan_id = ?',
+                (scan_id,)
+            ).fetchone()
+
+    def get_rules(self, scan_id):
+        """Return a list of (title, rule id, result) tuples in the original order."""
+        with self.snapshot() as connection:
+            row = connection.execute('SELECT id FROM scans WHERE scan_id = ?', (scan_id,)).fetchone()
+            if row is None:
+                return []
+            return self._load_rules(connection, row[0])
+
+    def compare(self, scan_id_1, scan_id_2):
+        """Count the introduced (pass to fail) and fixed (fail to pass) results between two
+        scans of the same delta chain, using only the changes stored between them.
+
+        Positional arguments:
+            scan_id_1 -- a string representing the oldest scan id
+            scan_id_2 -- a string representing the newest scan id
+
+        Return value:
+            an (introduced, fixed) tuple, or None if one scan doesn't depend on the other.
+        """
+        with self.snapshot() as connection:
+            rows = [
+                connection.execute('SELECT id FROM scans WHERE scan_id = ?', (scan_id,)).fetchone()
+                for scan_id in (scan_id_1, scan_id_2)
+            ]
+            if None in rows:
+                return None
+            scan_1, scan_2 = rows[0][0], rows[1][0]
+            for oldest, newest, swapped in ((scan_1, scan_2, False), (scan_2, scan_1, True)):
+                path = self._get_path(connection, newest)
+                if oldest in path:
+                    break
+            else:
+                return None
+            changes = {}
+            for delta_scan in reversed(path[:path.index(oldest)]):
+                for position, old, new in self._get_changes(connection, delta_scan):
+                    changes[position] = (changes[position][0] if position in changes else old, new)
+
+        introduced = 0
+        fixed = 0
+        for old, new in changes.values():
+            if swapped:
+                old, new = new, old
+            if old == PASS_RESULT and new == FAIL_RESULT:
+                introduced += 1
+            elif old == FAIL_RESULT and new == PASS_RESULT:
+                fixed += 1
+        return introduced, fixed
+
+    def get_scan_ids(self):
+        """Return a list of all the scan ids in the store."""
+        with self.connect() as connection:
+            return [row[0] for row in connection.execute('SELECT scan_id FROM scans ORDER BY scan_id')]
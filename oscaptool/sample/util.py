@@ -1,6 +1,17 @@
+import io
 import os
+import re
+import bz2
+import csv
+import gzip
+import json
+import lzma
 import logging
+import marshal
+import mmap
 import argparse
+import shutil
+import zipfile
 
 SUBPARSERS = 'subparsers'
 REQUIRED = 'required'
@@ -11,54 +22,169 @@ HELP = 'help'
 ARGS = 'args'
 WRITE_MODE = 'w'
 KWARGS = 'kwargs'
+ACTION = 'action'
+NARGS = 'nargs'
+# argparse actions of the options taking no value
+NO_VALUE_ACTIONS = ('store_true', 'store_false', 'store_const', 'append_const', 'count', 'help', 'version')
+VARIABLE_NARGS = ('?', '*', '+')
+OPTION_PREFIX = '-'
+LONG_OPTION_PREFIX = '--'
+READ_TEXT_MODE = 'rt'
+WRITE_TEXT_MODE = 'wt'
+READ_BINARY_MODE = 'rb'
+WRITE_BINARY_MODE = 'wb'
+COMPRESSION_MODULES = {'gzip': gzip, 'bz2': bz2, 'lzma': lzma}
+COMPRESSION_EXTENSIONS = {'gzip': '.gz', 'bz2': '.bz2', 'lzma': '.xz'}
+MAGIC_NUMBERS = ((b'\x1f\x8b', gzip), (b'BZh', bz2), (b'\xfd7zXZ\x00', lzma))
+MAGIC_NUMBER_SIZE = 6
+# lines end with \n, \r or \r\n, as in files opened in text mode
+LINE_SEPARATOR_PATTERN = rb'(?:\r\n|\r(?!\n)|\n)'
+LINE_PATTERN = rb'([^\r\n]*)'
+TEXT_FORMAT = 'text'
+JSON_FORMAT = 'json'
+JSONL_FORMAT = 'jsonl'
+CSV_FORMAT = 'csv'
+OUTPUT_FORMATS = (TEXT_FORMAT, JSON_FORMAT, JSONL_FORMAT, CSV_FORMAT)
+VALUE_FIELD = 'value'
+ARCHIVE_COMPRESSION = {'gzip': zipfile.ZIP_DEFLATED, 'bz2': zipfile.ZIP_BZIP2, 'lzma': zipfile.ZIP_LZMA}
  
 class ArgsParser:
     """A helper class to validate arguments."""
     def __init__(self, config):
-        """Initialize instance with given config."""
+        """Initialize instance with given config. Parsers are created when arguments
+        are parsed, see parse()."""
         self.logger = logging.getLogger()
-        self.load_parsers(config)
+        self.config = config
+        self.parser = None
 
-    def load_parsers(self, config):
-        """Create arg parser object."""
+    def load_parsers(self, config, arguments=None):
+        """Create arg parser object.
+
+        Positional arguments:
+            config    -- the configuration dict for the parser
+            arguments -- optional, a list of strings representing the arguments to parse.
+                         If given, only the subparsers selected by the arguments get their
+                         own arguments and subparsers, the others are only listed.
+        """
         self.logger.debug('Creating parser objects using config dictionary')
         self.parser = argparse.ArgumentParser()
+        self.load_arguments(config.get(ARGS, []), self.parser)
         if SUBPARSERS in config:
-            self.load_subparsers(config[SUBPARSERS], self.parser)
-    
-    def load_subparsers(self, subparsers_config, parent_parser):
+            self.load_subparsers(config[SUBPARSERS], self.parser, arguments, config.get(ARGS, []))
+
+    def load_subparsers(self, subparsers_config, parent_parser, arguments=None, parent_args_config=()):
         """Add subparsers to parent parser recursively.
 
         Positional arguments:
-            subparsers_config -- the configuration dict for the current subparser
-            parent_parser     -- the parent object to add the parsers to.
+            subparsers_config  -- the configuration dict for the current subparser
+            parent_parser      -- the parent object to add the parsers to.
+            arguments          -- optional, a list of strings representing the remaining arguments,
+                                  used to load only the selected subparser
+            parent_args_config -- optional, the argument configuration dicts of the parent parser,
+                                  used to skip the values of its options
         """
         self.logger.debug('Loading subparsers recursively')
         # create subparsers
         subparsers = parent_parser.add_subparsers(dest=subparsers_config[ID])
         subparsers.required = subparsers_config[REQUIRED]
+        selected_name, remaining_arguments = self.find_selected_subparser(
+            subparsers_config, arguments, parent_args_config
+        )
         for subparser_config in subparsers_config[SUBPARSERS_CFGS]:
             subparser = subparsers.add_parser(subparser_config[NAME], help=subparser_config[HELP])
+            if arguments is not None and subparser_config[NAME] != selected_name:
+                continue
 
             # load arguments for subparser
-            for arg in subparser_config[ARGS]:
-                if KWARGS in arg:
-                    subparser.add_argument(arg[ID], **arg[KWARGS])
-                else:
-                    subparser.add_argument(arg[ID])
+            self.load_arguments(subparser_config[ARGS], subparser)
 
             if SUBPARSERS in subparser_config:
-                self.load_subparsers(subparser_config[SUBPARSERS], subparser)
+                self.load_subparsers(
+                    subparser_config[SUBPARSERS], subparser, remaining_arguments, subparser_config[ARGS]
+                )
+
+    def load_arguments(self, args_config, parser):
+        """Add the arguments of a parser.
+
+        Positional arguments:
+            args_config -- a list of argument configuration dicts
+            parser      -- the parser object to add the arguments to.
+        """
+        for arg in args_config:
+            if KWARGS in arg:
+                parser.add_argument(arg[ID], **arg[KWARGS])
+            else:
+                parser.add_argument(arg[ID])
+
+    def find_selected_subparser(self, subparsers_config, arguments, parent_args_config=()):
+        """Find the first argument matching the name of a subparser, skipping the values
+        of the parent parser's options (e.g. --profile-dump scan show selects show).
+
+        Positional arguments:
+            subparsers_config  -- the configuration dict for the current subparser
+            arguments          -- a list of strings representing the arguments, or None
+            parent_args_config -- optional, the argument configuration dicts of the parent parser
+
+        Return value:
+            a (subparser name, arguments after the name) tuple, or (None, None) if no
+            argument selects a subparser.
+        """
+        if arguments is None:
+            return None, None
+        names = {subparser_config[NAME] for subparser_config in subparsers_config[SUBPARSERS_CFGS]}
+        options = self.get_option_nargs(parent_args_config)
+        index = 0
+        while index < len(arguments):
+            argument = arguments[index]
+            index += 1
+            if argument in names:
+                return argument, arguments[index:]
+            nargs = options.get(self.expand_option(argument, options), 0)
+            if nargs in VARIABLE_NARGS:
+                # like argparse, optional values are taken up to the next option
+                count = 1 if nargs == '?' else len(arguments)
+                while count and index < len(arguments) and not arguments[index].startswith(OPTION_PREFIX):
+                    index += 1
+                    count -= 1
+            else:
+                index += nargs
+        return None, None
+
+    def get_option_nargs(self, args_config):
+        """Return a dictionary mapping the options of a parser to the number of values they
+        take: an int, or the nargs setting if it's variable ('?', '*', '+')."""
+        options = {}
+        for arg in args_config:
+            if not arg[ID].startswith(OPTION_PREFIX):
+                continue
+            kwargs = arg.get(KWARGS, {})
+            if kwargs.get(ACTION) in NO_VALUE_ACTIONS:
+                options[arg[ID]] = 0
+            else:
+                nargs = kwargs.get(NARGS)
+                options[arg[ID]] = 1 if nargs is None else nargs
+        return options
+
+    def expand_option(self, argument, options):
+        """Return the option an argument stands for, which argparse also accepts as a
+        unique prefix of a long option. Other arguments (including --option=value) are
+        returned unchanged."""
+        if argument in options or not argument.startswith(LONG_OPTION_PREFIX):
+            return argument
+        matches = [option for option in options if option.startswith(argument)]
+        return matches[0] if len(matches) == 1 else argument
 
     def parse(self, arguments):
         """Parse a list of arguments and return a dictionary with the result.
-        
+        Only the parsers selected by the arguments are fully loaded.
+
         Positional arguments:
             arguments -- a list of strings representing arguments
 
         Return value:
             a dictionary with the result of argparse.ArgumentParser.parse_args()
         """
+        self.load_parsers(self.config, arguments)
         self.logger.debug('Parsing arguments')
         args = self.parser.parse_args(arguments)
         return vars(args)
@@ -66,21 +192,135 @@ class ArgsParser:
 class FileHelper:
     """A helper class to handle file I/O"""
     @staticmethod
-    def write_lines(filename, lines):
+    def write_lines(filename, lines, compression=None):
         """Open a file in write mode and add a list of strings.
         Create the parent directory if it doesn't exist.
 
         Positional arguments:\n
-        filename -- a string representing the file's absolute path\n
-        lines    -- a list of strings representing the content
+        filename    -- a string representing the file's absolute path\n
+        lines       -- a list of strings representing the content\n
+        compression -- optional, a string representing the codec (gzip, bz2, lzma)
         """
         os.makedirs(os.path.dirname(filename), exist_ok=True)
-        with open(filename, WRITE_MODE) as file_writer:
+        if compression:
+            file_writer = COMPRESSION_MODULES[compression].open(filename, WRITE_TEXT_MODE, newline='')
+        else:
+            file_writer = open(filename, WRITE_MODE)
+        with file_writer:
             file_writer.writelines(lines)
 
+    @staticmethod
+    def compress(source, destination, compression):
+        """Compress a file chunk by chunk into a new file and remove the source file.
+        The destination file is only created once the compression is complete.
+
+        Positional arguments:\n
+        source      -- a string representing the file's current path\n
+        destination -- a string representing the compressed file's path\n
+        compression -- a string representing the codec (gzip, bz2, lzma)
+        """
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        temp_destination = f'{destination}.{os.getpid()}.tmp'
+        with open(source, READ_BINARY_MODE) as file_reader:
+            with COMPRESSION_MODULES[compression].open(temp_destination, WRITE_BINARY_MODE) as file_writer:
+                shutil.copyfileobj(file_reader, file_writer)
+        os.replace(temp_destination, destination)
+        os.remove(source)
+
+    @staticmethod
+    def open_text(filename):
+        """Open a plain or compressed (gzip, bz2, lzma) file in text mode. The format is
+        detected from the file's first bytes and compressed files are decompressed as
+        they are read.
+
+        Positional arguments:
+            filename -- a string representing the file's absolute path
+
+        Return value:
+            a file object.
+        """
+        module = FileHelper.get_compression_module(filename)
+        if module:
+            return module.open(filename, READ_TEXT_MODE)
+        return open(filename)
+
+    @staticmethod
+    def open_binary(filename):
+        """Open a plain or compressed (gzip, bz2, lzma) file in binary mode, see open_text."""
+        module = FileHelper.get_compression_module(filename)
+        if module:
+            return module.open(filename, READ_BINARY_MODE)
+        return open(filename, READ_BINARY_MODE)
+
+    @staticmethod
+    def get_compression_module(filename):
+        """Return the module able to decompress a file (gzip, bz2 or lzma), detected from
+        the file's first bytes, or None if the file is not compressed."""
+        with open(filename, READ_BINARY_MODE) as file_reader:
+            magic_number = file_reader.read(MAGIC_NUMBER_SIZE)
+        for prefix, module in MAGIC_NUMBERS:
+            if magic_number.startswith(prefix):
+                return module
+        return None
+
+    @staticmethod
+    def add_to_archive(archive_name, files, compression):
+        """Add files to a zip archive, creating it if it doesn't exist. Compressed files are
+        decompressed first, so each member is compressed only once. Files already present
+        in the archive are skipped.
+
+        Positional arguments:\n
+        archive_name -- a string representing the archive's absolute path\n
+        files        -- an iterable of (member name, file path) tuples\n
+        compression  -- a string representing the codec (gzip, bz2, lzma)
+        """
+        os.makedirs(os.path.dirname(archive_name), exist_ok=True)
+        with zipfile.ZipFile(archive_name, 'a', ARCHIVE_COMPRESSION[compression]) as archive:
+            member_names = set(archive.namelist())
+            for member_name, filename in files:
+                if member_name in member_names:
+                    continue
+                with FileHelper.open_binary(filename) as file_reader, archive.open(member_name, 'w') as member_writer:
+                    shutil.copyfileobj(file_reader, member_writer)
+                member_names.add(member_name)
+
+    @staticmethod
+    def get_archive_members(archive_name):
+        """Return a list of the member names in a zip archive."""
+        with zipfile.ZipFile(archive_name) as archive:
+            return archive.namelist()
+
+    @staticmethod
+    def read_archive_lines(archive_name, member_name):
+        """Yield the content of a zip archive member one line at a time, decompressing it
+        as it is read. Line endings are handled as in a file opened in text mode.
+
+        Positional arguments:
+            archive_name -- a string representing the archive's absolute path
+            member_name  -- a string representing the member's name
+
+        Return value:
+            an iterator of strings, each string representing a line of the member.
+        """
+        with zipfile.ZipFile(archive_name) as archive:
+            with io.TextIOWrapper(archive.open(member_name)) as member_reader:
+                for line in member_reader:
+                    yield line
+
+    @staticmethod
+    def move(source, destination):
+        """Atomically rename a file, creating the destination's parent directory if it doesn't exist.
+
+        Positional arguments:\n
+        source      -- a string representing the file's current path\n
+        destination -- a string representing the file's new path
+        """
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(source, destination)
+
     @staticmethod
     def read(filename):
-        """Open a file in read mode and extract the content.
+        """Open a plain or compressed file in read mode and extract the content.
 
         Positional arguments:
             filename -- a string representing the file's absolute path
@@ -89,10 +329,104 @@ class FileHelper:
             a string representing the file content
         """
         data = None
-        with open(filename) as file_reader:
+        with FileHelper.open_text(filename) as file_reader:
             data = file_reader.read()
         return data
 
+    @staticmethod
+    def read_lines(filename):
+        """Open a plain or compressed file in read mode and yield its content one line
+        at a time, so only the current line is kept in memory.
+
+        Positional arguments:
+            filename -- a string representing the file's absolute path
+
+        Return value:
+            an iterator of strings, each string representing a line in the file.
+        """
+        with FileHelper.open_text(filename) as file_reader:
+            for line in file_reader:
+                yield line
+
+    @staticmethod
+    def map_file(filename):
+        """Map a plain file in memory (read only). Pages are read from the file as they are
+        accessed, so the content is neither loaded as a whole nor decoded.
+
+        Positional arguments:
+            filename -- a string representing the file's absolute path
+
+        Return value:
+            an mmap object to be closed by the caller, or None if the file is compressed
+            or empty (which can't be mapped).
+        """
+        if FileHelper.get_compression_module(filename):
+            return None
+        with open(filename, READ_BINARY_MODE) as file_reader:
+            if os.fstat(file_reader.fileno()).st_size == 0:
+                return None
+            return mmap.mmap(file_reader.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @staticmethod
+    def find_marked_lines(data, markers, start=0):
+        """Find the lines following a sequence of marker lines in a bytes-like object (e.g. a
+        mapped file) with a single regular expression, without splitting it into lines.
+        After each first marker line, the line following it is captured, then the line
+        following the next second marker line, and so on, ignoring any other line in between
+        as a state machine reading one line at a time would.
+
+        Positional arguments:
+            data    -- a bytes-like object
+            markers -- a sequence of bytes objects without line separators
+            start   -- optional, the offset where the search starts, e.g. the start of a line
+
+        Return value:
+            an iterator of match objects, where group i is the line following the i-th
+            marker line.
+        """
+        first_marker = re.escape(markers[0])
+        pattern = first_marker + rb'(?<![^\r\n]' + first_marker + rb')' + LINE_SEPARATOR_PATTERN + rb'(?!\Z)' + LINE_PATTERN
+        for marker in markers[1:]:
+            marker_line = re.escape(marker) + LINE_SEPARATOR_PATTERN
+            pattern += (
+                rb'(?:' + LINE_SEPARATOR_PATTERN + rb'(?!' + marker_line + rb')[^\r\n]*)*' +
+                LINE_SEPARATOR_PATTERN + marker_line + rb'(?!\Z)' + LINE_PATTERN
+            )
+        return re.compile(pattern).finditer(data, start)
+
+    @staticmethod
+    def split_at_lines(data, marker, size):
+        """Split a bytes-like object (e.g. a mapped file) into ranges of about size bytes,
+        each one starting at a marker line (or at the start of the data).
+
+        Positional arguments:
+            data   -- a bytes-like object
+            marker -- a bytes object without line separators
+            size   -- the minimum number of bytes of each range but the last one
+
+        Return value:
+            a list of (start, end) offsets.
+        """
+        pattern = re.compile(rb'(?<![^\r\n])' + re.escape(marker) + LINE_SEPARATOR_PATTERN)
+        offsets = [0]
+        while offsets[-1] + size < len(data):
+            match = pattern.search(data, offsets[-1] + size)
+            if match is None:
+                break
+            offsets.append(match.start())
+        offsets.append(len(data))
+        return list(zip(offsets, offsets[1:]))
+
+    @staticmethod
+    def get_file_id(filename):
+        """Return a (path, device, inode) tuple identifying a file, which changes if the file
+        is replaced, or None if the file doesn't exist."""
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            return None
+        return filename, stat.st_dev, stat.st_ino
+
     @staticmethod
     def get_files_from_dir(dir_path):
         """Get the names of all the files in a given directory.
@@ -103,4 +437,141 @@ class FileHelper:
         Return valule:
             a list of strings, each string representing a file in the directory.
         """
-        return [file for file in os.listdir(dir_path) if os.path.isfile(os.path.join(dir_path, file))]
+        with os.scandir(dir_path) as entries:
+            return [entry.name for entry in entries if entry.is_file()]
+
+    @staticmethod
+    def read_json(filename, cache_filename=None):
+        """Load a JSON file. If a cache file name is given, the decoded content is also
+        saved in a precompiled (marshal) form and reused while the JSON file's size and
+        mtime don't change.
+
+        Positional arguments:
+            filename       -- a string representing the JSON file's path
+            cache_filename -- optional, a string representing the precompiled file's path
+
+        Return value:
+            the decoded content of the JSON file.
+        """
+        stat = os.stat(filename)
+        key = (stat.st_size, stat.st_mtime_ns)
+        if cache_filename:
+            try:
+                with open(cache_filename, 'rb') as cache_reader:
+                    cached_key, data = marshal.loads(cache_reader.read())
+                if cached_key == key:
+                    return data
+            except (OSError, ValueError, EOFError, TypeError):
+                pass
+
+        with open(filename) as file_reader:
+            data = json.loads(file_reader.read())
+
+        if cache_filename:
+            try:
+                temp_filename = f'{cache_filename}.{os.getpid()}.tmp'
+                with open(temp_filename, 'wb') as cache_writer:
+                    cache_writer.write(marshal.dumps((key, data)))
+                os.replace(temp_filename, cache_filename)
+            except OSError:
+                pass
+        return data
+
+class OutputWriter:
+    """A helper class to write an action's output to a stream as text, JSON, JSON Lines
+    or CSV. The output is written one line (or record) at a time, so a big output is
+    never built as a single string.
+
+    Structured outputs implement get_lines() (an iterator of text chunks), get_records()
+    (an iterator of flat dictionaries, the JSON Lines and CSV rows) and get_summary()
+    (a dictionary with the fields which are not rows). Their RECORDS_NAME attribute is
+    the JSON key holding the rows, or None if the JSON output is the summary only.
+    Other outputs (strings, numbers) are written as single values and lists are
+    written item by item.
+    """
+    def __init__(self, stream, output_format=TEXT_FORMAT):
+        """Initialize the writer.
+
+        Positional arguments:
+            stream        -- a text file object, e.g. sys.stdout
+            output_format -- one of OUTPUT_FORMATS
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f'unknown output format {output_format}')
+        self.stream = stream
+        self.output_format = output_format
+
+    def write(self, output):
+        """Write an output in the writer's format."""
+        getattr(self, f'write_{self.output_format}')(output)
+
+    def write_text(self, output):
+        """Write each item followed by a new line, structured items chunk by chunk."""
+        for item in (output if isinstance(output, list) else [output]):
+            if hasattr(item, 'get_lines'):
+                for chunk in item.get_lines():
+                    self.stream.write(chunk)
+            else:
+                self.stream.write(str(item))
+            self.stream.write('\n')
+
+    def write_json(self, output):
+        """Write a JSON document, a list of outputs as a JSON array."""
+        if isinstance(output, list):
+            self.stream.write('[')
+            for index, item in enumerate(output):
+                if index:
+                    self.stream.write(', ')
+                self.write_json_value(item)
+            self.stream.write(']')
+        else:
+            self.write_json_value(output)
+        self.stream.write('\n')
+
+    def write_json_value(self, item):
+        """Write a single JSON value. The rows of structured items are written one at a time."""
+        if not hasattr(item, 'get_summary'):
+            self.stream.write(json.dumps(item))
+            return
+        if item.RECORDS_NAME is None:
+            self.stream.write(json.dumps(item.get_summary()))
+            return
+        self.stream.write('{')
+        for key, value in item.get_summary().items():
+            self.stream.write(f'{json.dumps(key)}: {json.dumps(value)}, ')
+        self.stream.write(f'{json.dumps(item.RECORDS_NAME)}: [')
+        for index, record in enumerate(item.get_records()):
+            if index:
+                self.stream.write(', ')
+            self.stream.write(json.dumps(record))
+        self.stream.write(']}')
+
+    def write_jsonl(self, output):
+        """Write one JSON object (or value) per line."""
+        for record in self.get_records(output):
+            self.stream.write(json.dumps(record))
+            self.stream.write('\n')
+
+    def write_csv(self, output):
+        """Write the records as CSV rows, with a header taken from the first record.
+        List values are joined with spaces."""
+        writer = csv.writer(self.stream)
+        fields = None
+        for record in self.get_records(output):
+            if not isinstance(record, dict):
+                record = {VALUE_FIELD: record}
+            if fields is None:
+                fields = list(record)
+                writer.writerow(fields)
+            writer.writerow([
+                ' '.join(record[field]) if isinstance(record.get(field), list) else record.get(field)
+                for field in fields
+            ])
+
+    def get_records(self, output):
+        """Return an iterator of the rows of an output."""
+        for item in (output if isinstance(output, list) else [output]):
+            if hasattr(item, 'get_records'):
+                yield from item.get_records()
+            else:
+                yield item
@@ -0,0 +1,64 @@
+import os
+import sys
+import json
+import stat
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def make_scan_output(results):
+    """Return the lines of an oscap scan output with a rule per result. Titles and rule ids
+    include result names, which must not be counted."""
+    lines = ['--- Starting Evaluation ---\n', '\n']
+    for index, result in enumerate(results):
+        lines += [
+            f'Title\r\tEnsure pass and fail are not counted {index}\n',
+            f'Rule\r\txccdf_org.ssgproject.content_rule_pass_fail_{index}\n',
+            f'Ident\r\tCCE-{index}\n',
+            f'Result\r\t{result}\n',
+            '\n'
+        ]
+    return ''.join(lines).splitlines()
+
+def write_scan_file(file_name, results):
+    """Write an oscap scan output with a rule per result to a file."""
+    with open(file_name, 'w') as file_writer:
+        file_writer.write('\n'.join(make_scan_output(results)) + '\n')
+    return file_name
+
+STUB_OSCAP = '''#!{python}
+import os
+import sys
+# oscap separates the markers from the values with carriage returns
+for index, result in enumerate({results!r}):
+    sys.stdout.write(f'Title\\r\\tEnsure rule {{index}} passes\\n')
+    sys.stdout.write(f'Rule\\r\\txccdf_org.ssgproject.content_rule_{{index}}\\n')
+    sys.stdout.write(f'Result\\r\\t{{result}}\\n\\n')
+    sys.stdout.flush()
+# the same rules in the results file, replaced at once as scans of a batch may share it
+if '--results' in sys.argv:
+    results_file = sys.argv[sys.argv.index('--results') + 1]
+    with open(f'{{results_file}}.{{os.getpid()}}', 'w') as file_writer:
+        file_writer.write('<Benchmark xmlns="http://checklists.nist.gov/xccdf/1.2"><TestResult>')
+        for index, result in enumerate({results!r}):
+            file_writer.write(
+                f'<rule-result idref="xccdf_org.ssgproject.content_rule_{{index}}"><result>{{result}}</result></rule-result>'
+            )
+        file_writer.write('</TestResult></Benchmark>')
+    os.replace(f'{{results_file}}.{{os.getpid()}}', results_file)
+sys.exit({returncode})
+'''
+
+def install_stub_oscap(path, monkeypatch, results, returncode=2):
+    """Put a stub oscap script, printing a scan output, writing the same rules to the
+    --results file and exiting with 2 like oscap does when rules fail, first in the PATH."""
+    script = path / 'bin' / 'oscap'
+    script.parent.mkdir(exist_ok=True)
+    script.write_text(STUB_OSCAP.format(python=sys.executable, results=results, returncode=returncode))
+    script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', f'{script.parent}{os.pathsep}{os.environ["PATH"]}')
+    return script
+
+def load_config(home):
+    """Load config.json with the /home/oscaptool/ directories moved to another directory."""
+    with open(os.path.join(ROOT, 'config.json')) as file_reader:
+        return json.loads(file_reader.read().replace('/home/oscaptool/', f'{home}/'))
@@ -0,0 +1,180 @@
+import os
+import time
+
+import pytest
+
+from actionmanager.actions import Action, ActionError
+from actionmanager.manager import ActionManager, ActionManagerError, WorkflowMetadata
+
+NAME = 'name'
+SLEEP = 'sleep'
+FAIL = 'fail'
+PID = 'pid'
+STEPS = 'steps'
+
+class RecordStep(Action):
+    """A test action recording when it ran, after checking that the steps it depends on ran."""
+    def __init__(self, config):
+        self.config = config
+
+    def execute(self, input_data):
+        start_time = time.time()
+        for dependency in self.config.get(ActionManager.DEPENDS_ON, []):
+            if dependency not in input_data:
+                raise ActionError(f'{dependency} did not run before {self.config[NAME]}')
+        if self.config.get(FAIL):
+            raise ActionError(f'{self.config[NAME]} failed')
+        time.sleep(self.config.get(SLEEP, 0))
+        input_data[self.config[NAME]] = (start_time, time.time(), os.getpid())
+        return input_data
+
+class CountStep(Action):
+    """A test action counting the instances created and the steps run."""
+    instances = 0
+
+    def __init__(self, config):
+        CountStep.instances += 1
+        self.config = config
+
+    def execute(self, input_data):
+        input_data[STEPS] = input_data.get(STEPS, 0) + 1
+        input_data[ActionManager.NEXT_ACTION] = self.config[ActionManager.NEXT_ACTION]
+        return input_data
+
+def create_chain_config(steps):
+    """Return the configuration of a workflow running a chain of CountStep actions."""
+    names = [ActionManager.INITIAL_ACTION] + [f'step_{index}' for index in range(1, steps)]
+    return {'workflows': {'count': {
+        name: {
+            ActionManager.MODULE: __name__,
+            ActionManager.CLASS: CountStep.__name__,
+            ActionManager.CONFIG: {ActionManager.NEXT_ACTION: next_name}
+        } for name, next_name in zip(names, names[1:] + [''])
+    }}}
+
+def create_config(dependencies, **step_settings):
+    """Return the configuration of a workflow running a RecordStep action per step, with
+    the given step dependencies and settings."""
+    steps = {}
+    for name, depends_on in dependencies.items():
+        config = dict(step_settings.get(name, {}), **{NAME: name, ActionManager.DEPENDS_ON: depends_on})
+        steps[name] = {
+            ActionManager.MODULE: __name__,
+            ActionManager.CLASS: RecordStep.__name__,
+            ActionManager.DEPENDS_ON: depends_on,
+            ActionManager.CONFIG: config
+        }
+        if config.get(ActionManager.EXECUTOR):
+            steps[name][ActionManager.EXECUTOR] = config[ActionManager.EXECUTOR]
+    return {ActionManager.MAX_WORKERS: 4, 'workflows': {'dag': steps}}
+
+def run(config):
+    return ActionManager(config).run_workflow(WorkflowMetadata('dag', {}))
+
+def test_steps_run_after_their_dependencies():
+    dependencies = {
+        ActionManager.INITIAL_ACTION: [], 'load_1': [ActionManager.INITIAL_ACTION],
+        'load_2': [ActionManager.INITIAL_ACTION], 'compare': ['load_1', 'load_2'], 'print': ['compare']
+    }
+    output = run(create_config(dependencies, load_1={SLEEP: 0.2}, load_2={SLEEP: 0.2}))
+    for name, depends_on in dependencies.items():
+        for dependency in depends_on:
+            assert output[dependency][1] <= output[name][0]
+    # independent steps run concurrently
+    assert output['load_2'][0] < output['load_1'][1]
+    assert output['load_1'][0] < output['load_2'][1]
+
+def test_steps_run_in_processes():
+    output = run(create_config(
+        {ActionManager.INITIAL_ACTION: [], 'load': [ActionManager.INITIAL_ACTION]},
+        load={ActionManager.EXECUTOR: ActionManager.PROCESS_EXECUTOR}
+    ))
+    assert output[ActionManager.INITIAL_ACTION][2] == os.getpid()
+    assert output['load'][2] != os.getpid()
+
+def test_cyclic_dependencies_fail():
+    with pytest.raises(ActionManagerError) as error:
+        run(create_config({ActionManager.INITIAL_ACTION: [], 'a': ['b'], 'b': ['c'], 'c': ['a']}))
+    assert 'cyclic' in error.value.message
+    assert "['a', 'b', 'c']" in error.value.message
+
+def test_unknown_dependencies_fail():
+    with pytest.raises(ActionManagerError) as error:
+        run(create_config({ActionManager.INITIAL_ACTION: ['missing']}))
+    assert 'missing' in error.value.message
+
+@pytest.mark.parametrize('executor', ['thread', ActionManager.PROCESS_EXECUTOR])
+def test_failures_are_propagated(executor):
+    config = create_config(
+        {ActionManager.INITIAL_ACTION: [], 'load': [ActionManager.INITIAL_ACTION], 'slow': [ActionManager.INITIAL_ACTION],
+         'compare': ['load']},
+        load={FAIL: True, ActionManager.EXECUTOR: executor}, slow={SLEEP: 0.3}
+    )
+    start_time = time.perf_counter()
+    with pytest.raises(ActionError) as error:
+        run(config)
+    assert error.value.message == 'load failed'
+    # the running steps are waited for
+    assert time.perf_counter() - start_time >= 0.3
+
+def test_pools_are_kept_until_shutdown():
+    config = create_config(
+        {ActionManager.INITIAL_ACTION: [], 'load': [ActionManager.INITIAL_ACTION]},
+        load={ActionManager.EXECUTOR: ActionManager.PROCESS_EXECUTOR}
+    )
+    manager = ActionManager(config)
+    manager.run_workflow(WorkflowMetadata('dag', {}))
+    pools = (manager._pools._thread_pool, manager._pools._process_pool)
+    assert None not in pools
+    # managers sharing the pools run their steps in them
+    other_manager = ActionManager(config, manager._actions, manager._pools)
+    for _ in range(3):
+        other_manager.run_workflow(WorkflowMetadata('dag', {}))
+        assert (manager._pools._thread_pool, manager._pools._process_pool) == pools
+    manager.shutdown()
+    assert (manager._pools._thread_pool, manager._pools._process_pool) == (None, None)
+    # the pools are created again if the manager is used after a shutdown
+    assert manager.run_workflow(WorkflowMetadata('dag', {}))['load'][2] != os.getpid()
+    manager.shutdown()
+
+def test_process_pool_is_started_if_used():
+    manager = ActionManager(create_config({ActionManager.INITIAL_ACTION: []}))
+    manager.start_process_pool()
+    assert manager._pools._process_pool is None
+    manager = ActionManager(create_config(
+        {ActionManager.INITIAL_ACTION: []}, **{ActionManager.INITIAL_ACTION: {ActionManager.EXECUTOR: ActionManager.PROCESS_EXECUTOR}}
+    ))
+    manager.start_process_pool()
+    assert manager._pools._process_pool._processes
+    manager.shutdown()
+
+def test_actions_are_created_once():
+    CountStep.instances = 0
+    manager = ActionManager(create_chain_config(5))
+    assert CountStep.instances == 5
+    for _ in range(3):
+        assert manager.run_workflow(WorkflowMetadata('count', {}))[STEPS] == 5
+    assert CountStep.instances == 5
+
+def test_actions_are_shared():
+    manager = ActionManager(create_chain_config(5))
+    CountStep.instances = 0
+    other_manager = ActionManager(manager._config, manager._actions)
+    assert other_manager.run_workflow(WorkflowMetadata('count', {}))[STEPS] == 5
+    assert CountStep.instances == 0
+
+def test_bad_action_fails_on_creation():
+    config = create_chain_config(2)
+    config['workflows']['count']['step_1'][ActionManager.CLASS] = 'MissingStep'
+    with pytest.raises(ActionManagerError) as error:
+        ActionManager(config)
+    assert 'step_1' in error.value.message
+
+def test_steps_per_second():
+    manager = ActionManager(create_chain_config(100))
+    start_time = time.perf_counter()
+    for _ in range(100):
+        manager.run_workflow(WorkflowMetadata('count', {}))
+    steps_per_second = 10000 / (time.perf_counter() - start_time)
+    # a loose bound, steps used to import the module and create the action every time
+    assert steps_per_second > 20000
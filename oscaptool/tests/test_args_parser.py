@@ -0,0 +1,115 @@
+import os
+import sys
+import json
+import time
+import marshal
+import subprocess
+
+import pytest
+
+from oscaptool.sample.util import ArgsParser, FileHelper
+from oscaptool.tests import ROOT
+
+STARTUP_SCRIPT = '''
+import sys
+import json
+import time
+start_time = time.perf_counter()
+from oscaptool.sample.app import Client
+with open('config.json') as file_reader:
+    config = json.loads(file_reader.read().replace('/home/oscaptool/', sys.argv[1]))
+sys.argv = ['oscaptool', 'show', '--scan-id', 'missing']
+client = Client(config)
+client.build_workflow_metadata(client.parse_args())
+print(time.perf_counter() - start_time)
+'''
+
+@pytest.fixture(scope='module')
+def args_parser():
+    with open(os.path.join(ROOT, 'config.json')) as file_reader:
+        return ArgsParser(json.load(file_reader)['argparser'])
+
+@pytest.mark.parametrize('arguments', [
+    ['show'],
+    ['show', '--scan-id', 'a'],
+    ['comp', 'a', 'b'],
+    ['comp', '--scan-ids', 'a', 'b', 'c'],
+    ['comp', '--since', '2020-01-01', '--until', '2020-01-31'],
+    ['scan', 'xccdf', '1', '--profile', 'p', '--results', 'r', '--cpe-dict', 'c', '--scap-xccdf', 'x'],
+    ['scan', 'oval', '1', '--results', 'r', '--scap-oval', 'o'],
+    ['scan', '--batch', 'scans.json'],
+    ['migrate'],
+    ['serve'],
+])
+def test_selected_branch_parses_like_the_full_parser(args_parser, arguments):
+    full_parser = ArgsParser(args_parser.config)
+    full_parser.load_parsers(full_parser.config)
+    assert args_parser.parse(arguments) == vars(full_parser.parser.parse_args(arguments))
+
+@pytest.mark.parametrize('arguments', [
+    ['--profile-dump', 'scan', 'show', '--scan-id', 'a'],
+    ['--profile-dump=scan', 'show', '--scan-id', 'a'],
+    ['--profile-d', 'scan', 'show', '--scan-id', 'a'],
+    ['--profile', 'show', '--scan-id', 'a'],
+])
+def test_option_values_are_not_subparsers(args_parser, arguments):
+    parsed_args = args_parser.parse(arguments)
+    assert parsed_args['action'] == 'show'
+    assert parsed_args['scan_id'] == 'a'
+
+def test_nested_option_values_are_not_subparsers(args_parser):
+    parsed_args = args_parser.parse(['scan', '--batch', 'xccdf', 'oval', '1', '--results', 'r', '--scap-oval', 's'])
+    assert parsed_args['batch'] == 'xccdf'
+    assert parsed_args['scantype'] == 'oval'
+    assert parsed_args['results'] == 'r'
+
+def test_variable_values_are_skipped(args_parser):
+    parsed_args = args_parser.parse(['comp', '--scan-ids', 'a', 'b', '--format', 'json'])
+    assert parsed_args['scan_ids'] == ['a', 'b']
+    assert parsed_args['format'] == 'json'
+
+def test_config_is_precompiled(tmp_path):
+    file_name = tmp_path / 'config.json'
+    cache_file_name = str(tmp_path / '.config.json.cache')
+    file_name.write_text(json.dumps({'app_name': 'oscaptool'}))
+    assert FileHelper.read_json(str(file_name), cache_file_name) == {'app_name': 'oscaptool'}
+    # the precompiled copy is used while config.json doesn't change
+    with open(cache_file_name, 'rb') as cache_reader:
+        key, _ = marshal.loads(cache_reader.read())
+    with open(cache_file_name, 'wb') as cache_writer:
+        cache_writer.write(marshal.dumps((key, {'app_name': 'cached'})))
+    assert FileHelper.read_json(str(file_name), cache_file_name) == {'app_name': 'cached'}
+    assert FileHelper.read_json(str(file_name)) == {'app_name': 'oscaptool'}
+    file_name.write_text(json.dumps({'app_name': 'changed'}))
+    assert FileHelper.read_json(str(file_name), cache_file_name) == {'app_name': 'changed'}
+
+def test_startup_time(tmp_path):
+    # a new process, so the imports are measured too
+    output = subprocess.run(
+        [sys.executable, '-c', STARTUP_SCRIPT, f'{tmp_path}/'], cwd=ROOT, stdout=subprocess.PIPE, check=True
+    ).stdout
+    # a loose bound, only meant to catch the startup importing or building much more than needed
+    assert float(output) < 2.0
+
+def measure(parse, repeat=5, number=20):
+    """Return the best time of a few runs of a parse function, like timeit."""
+    times = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        for _ in range(number):
+            parse()
+        times.append(time.perf_counter() - start_time)
+    return min(times)
+
+def test_selected_branch_benchmark(args_parser):
+    arguments = ['show', '--scan-id', 'a']
+    full_parser = ArgsParser(args_parser.config)
+
+    def parse_with_full_parser():
+        full_parser.load_parsers(full_parser.config)
+        full_parser.parser.parse_args(arguments)
+
+    full_time = measure(parse_with_full_parser)
+    elapsed_time = measure(lambda: args_parser.parse(arguments))
+    # the scan subparsers make most of the configuration
+    assert elapsed_time < full_time / 2
@@ -0,0 +1,50 @@
+import os
+import json
+
+import pytest
+
+from oscaptool.sample.app import Client
+from oscaptool.sample.actions import get_scan_id
+from oscaptool.tests import install_stub_oscap, load_config
+
+XCCDF_SCAN = {
+    'scantype': 'xccdf', 'scansubtype': '1', 'profile': 'standard', 'cpe_dict': 'cpe.xml',
+    'results': 'results.xml', 'scap_xccdf': 'xccdf.xml'
+}
+SCANS = [
+    XCCDF_SCAN,
+    {'scantype': 'oval', 'scansubtype': '1', 'results': 'results.xml', 'scap_oval': 'oval.xml'},
+    dict(XCCDF_SCAN, scantag='tagged'),
+]
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    install_stub_oscap(tmp_path, monkeypatch, ['pass', 'fail'])
+    # the results files are written in the current directory
+    monkeypatch.chdir(tmp_path)
+    config = load_config(tmp_path)
+    config['batch']['max_workers'] = 2
+    return Client(config)
+
+def write_batch_file(tmp_path, scans):
+    batch_file = tmp_path / 'scans.json'
+    batch_file.write_text(json.dumps(scans))
+    return str(batch_file)
+
+def test_batch_runs_every_scan(tmp_path, client, capsys):
+    client.execute_batch(write_batch_file(tmp_path, SCANS))
+    summary = capsys.readouterr().out.splitlines()
+    assert [line.split(':')[0] for line in summary] == ['0', '1', '2']
+    assert all(line.endswith('exit status 2') for line in summary)
+    # every scan gets its own scan id and result file, even if they start in the same second
+    scan_ids = sorted(map(get_scan_id, os.listdir(tmp_path / 'scan_results')))
+    assert len(scan_ids) == 3
+    assert [scan_id.split('_', 2)[2] for scan_id in scan_ids] == ['oval_1_1', 'xccdf_1_0', 'xccdf_1_tagged']
+
+def test_failed_scan_fails_the_batch(tmp_path, client, capsys):
+    with pytest.raises(SystemExit) as error:
+        client.execute_batch(write_batch_file(tmp_path, SCANS[:1] + [{'scantype': 'missing', 'scansubtype': '1'}]))
+    assert error.value.code == 1
+    summary = capsys.readouterr().out.splitlines()
+    assert summary[0].endswith('exit status 2')
+    assert summary[1].startswith('1: failed:')
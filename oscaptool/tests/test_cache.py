@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from oscaptool.sample.actions import (
+    GetScanResult, NEXT_ACTION, SCAN_ID_KEY_NAME, OUTPUT_KEY_NAME, PATH, CACHE_PATH, MEMORY_CACHE_ENTRIES
+)
+from oscaptool.sample.cache import ScanCache, ENTRY_EXTENSION
+from oscaptool.tests import write_scan_file
+
+SCAN_ID = '2020-01-01_00:00:00_xccdf_1'
+
+@pytest.fixture
+def cache(tmp_path):
+    return ScanCache(f'{tmp_path}/cache', 1 << 20)
+
+def get_entries(cache):
+    return sorted(name for name in os.listdir(cache.path) if name.endswith(ENTRY_EXTENSION))
+
+def test_cached_value_round_trip(tmp_path, cache):
+    file_name = write_scan_file(f'{tmp_path}/{SCAN_ID}.txt', ['pass'])
+    assert cache.get(file_name) is None
+    cache.put(file_name, ((1, 0, 0, 1), [('Title', 'rule', 'pass')]))
+    assert cache.get(file_name) == ((1, 0, 0, 1), [('Title', 'rule', 'pass')])
+
+def test_modified_file_is_a_miss(tmp_path, cache):
+    file_name = write_scan_file(f'{tmp_path}/{SCAN_ID}.txt', ['pass'])
+    cache.put(file_name, 'value')
+    write_scan_file(file_name, ['pass', 'fail'])
+    assert cache.get(file_name) is None
+
+def test_least_recently_used_entries_are_evicted(tmp_path, cache):
+    file_names = [write_scan_file(f'{tmp_path}/{index}.txt', ['pass']) for index in range(3)]
+    value = os.urandom(1000).hex()
+    for index, file_name in enumerate(file_names):
+        cache.put(file_name, value)
+        entry_name = cache.get_entry_name(file_name)
+        os.utime(entry_name, ns=(index * 10 ** 9, index * 10 ** 9))
+    # a hit makes the oldest entry the most recently used one
+    assert cache.get(file_names[0]) == value
+    kept = [cache.get_entry_name(file_names[0]), cache.get_entry_name(file_names[2])]
+    cache.max_bytes = sum(map(os.path.getsize, kept))
+    cache.evict()
+    assert get_entries(cache) == sorted(map(os.path.basename, kept))
+
+def test_cached_scan_result_matches_parsed_scan_result(tmp_path):
+    file_name = write_scan_file(f'{tmp_path}/{SCAN_ID}.txt', ['pass', 'fail', 'notapplicable'] * 10)
+    config = {NEXT_ACTION: '', SCAN_ID_KEY_NAME: 'scan_id', OUTPUT_KEY_NAME: 'output', PATH: f'{tmp_path}/'}
+    expected = GetScanResult(config).get_scan_result(SCAN_ID)
+    action = GetScanResult(dict(config, **{CACHE_PATH: f'{tmp_path}/cache'}))
+    for _ in range(2):
+        scan_result = action.get_scan_result(SCAN_ID)
+        assert list(scan_result.get_rule_tuples()) == list(expected.get_rule_tuples())
+        assert scan_result._stats.to_tuple() == expected._stats.to_tuple()
+    assert len(os.listdir(f'{tmp_path}/cache')) == 1
+    # an edited scan file is parsed again
+    write_scan_file(file_name, ['fail'])
+    assert action.get_scan_result(SCAN_ID)._stats.to_tuple() == (0, 1, 0, 1)
+
+def test_memory_cache_keeps_the_last_scans(tmp_path):
+    file_names = [write_scan_file(f'{tmp_path}/{scan_id}.txt', ['pass']) for scan_id in ('a', 'b', 'c')]
+    action = GetScanResult({
+        NEXT_ACTION: '', SCAN_ID_KEY_NAME: 'scan_id', OUTPUT_KEY_NAME: 'output', PATH: f'{tmp_path}/',
+        MEMORY_CACHE_ENTRIES: 2
+    })
+    scan_result = action.get_scan_result('a')
+    assert action.get_scan_result('a') is scan_result
+    # the memory cache is shared by every action
+    assert GetScanResult(action.config).get_scan_result('a') is scan_result
+    action.get_scan_result('b')
+    action.get_scan_result('c')
+    assert action.get_scan_result('a') is not scan_result
+    # an edited scan file is parsed again
+    scan_result = action.get_scan_result('c')
+    write_scan_file(file_names[2], ['fail'])
+    assert action.get_scan_result('c')._stats.to_tuple() == (0, 1, 0, 1)
@@ -0,0 +1,69 @@
+import os
+import time
+
+import pytest
+
+from oscaptool.sample.actions import (
+    GetScanResult, SaveScanResult, GetScanHistory, ScanResultParser, ScanResult, CommandOutput,
+    get_scan_file_name, get_scan_id,
+    NEXT_ACTION, SCAN_ID_KEY_NAME, OUTPUT_KEY_NAME, PATH, COMPRESSION, CMD_STDOUT, SCAN_ID as SCAN_ID_INPUT
+)
+from oscaptool.sample.util import FileHelper, COMPRESSION_EXTENSIONS
+from oscaptool.tests import make_scan_output
+from actionmanager.actions import ActionError
+
+SCAN_ID = '2020-01-01_00:00:00_xccdf_1'
+
+@pytest.fixture(scope='module')
+def scan_lines():
+    return [f'{line}\n' for line in make_scan_output(['pass', 'fail', 'notapplicable', 'error'] * 2500)]
+
+def parse_scan_file(file_name):
+    parser = ScanResultParser()
+    return ScanResult(parser.parse(FileHelper.read_lines(file_name)), parser.stats)
+
+def measure_parse(file_name):
+    start_time = time.perf_counter()
+    scan_result = parse_scan_file(file_name)
+    return scan_result, time.perf_counter() - start_time
+
+@pytest.mark.parametrize('compression', sorted(COMPRESSION_EXTENSIONS))
+def test_compressed_reads_match_plain_reads(tmp_path, scan_lines, compression):
+    path = f'{tmp_path}/'
+    FileHelper.write_lines(f'{path}plain.txt', scan_lines)
+    FileHelper.write_lines(f'{path}{SCAN_ID}.txt', scan_lines)
+    FileHelper.compress(f'{path}{SCAN_ID}.txt', f'{path}{SCAN_ID}.txt{COMPRESSION_EXTENSIONS[compression]}', compression)
+    file_name = get_scan_file_name(path, SCAN_ID)
+    assert file_name.endswith(COMPRESSION_EXTENSIONS[compression])
+    assert get_scan_id(os.path.basename(file_name)) == SCAN_ID
+
+    plain_scan_result, plain_time = measure_parse(f'{path}plain.txt')
+    scan_result, elapsed_time = measure_parse(file_name)
+    assert list(scan_result.get_rule_tuples()) == list(plain_scan_result.get_rule_tuples())
+    assert scan_result._stats.to_tuple() == plain_scan_result._stats.to_tuple()
+    config = {NEXT_ACTION: '', SCAN_ID_KEY_NAME: 'scan_id', OUTPUT_KEY_NAME: 'output', PATH: path}
+    assert list(GetScanResult(config).get_scan_result(SCAN_ID).get_rule_tuples()) == list(scan_result.get_rule_tuples())
+
+    # size ratio against parse throughput: a 10000 rule scan compresses to a few percent
+    # of its size, and decompressing costs less than the parse itself
+    assert os.path.getsize(file_name) < os.path.getsize(f'{path}plain.txt') / 5
+    assert len(scan_result) / elapsed_time > 10000
+    assert elapsed_time < plain_time * 6
+
+@pytest.mark.parametrize('compression', sorted(COMPRESSION_EXTENSIONS))
+def test_compressed_scan_results_are_saved(tmp_path, scan_lines, compression):
+    path = f'{tmp_path}/'
+    action = SaveScanResult({NEXT_ACTION: '', PATH: path, COMPRESSION: compression})
+    FileHelper.write_lines(f'{path}.{SCAN_ID}.txt.tmp', scan_lines)
+    action.execute({SCAN_ID_INPUT: SCAN_ID, CMD_STDOUT: CommandOutput(f'{path}.{SCAN_ID}.txt.tmp')})
+    action.execute({SCAN_ID_INPUT: 'lines', CMD_STDOUT: scan_lines})
+    assert sorted(os.listdir(path)) == [f'{scan_id}.txt{COMPRESSION_EXTENSIONS[compression]}' for scan_id in (SCAN_ID, 'lines')]
+    for scan_id in (SCAN_ID, 'lines'):
+        assert list(FileHelper.read_lines(get_scan_file_name(path, scan_id))) == scan_lines
+    # the history lists compressed files by their plain name
+    history = GetScanHistory({NEXT_ACTION: '', PATH: path, OUTPUT_KEY_NAME: 'output'}).execute({})['output']
+    assert sorted(history) == [f'{SCAN_ID}.txt', 'lines.txt']
+
+def test_unknown_compression_fails():
+    with pytest.raises(ActionError):
+        SaveScanResult({NEXT_ACTION: '', PATH: '/tmp/', COMPRESSION: 'zip'})
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from oscaptool.sample.actions import (
+    SaveScanResult, GetScanResult, CompareScanResults, ScanResultParser, ScanResult,
+    ScanProgress, CommandOutput,
+    NEXT_ACTION, SCAN_ID_KEY_NAME, OUTPUT_KEY_NAME, PATH, STORE, SCAN_ID, CMD_STDOUT, DEDUPLICATE,
+    DUPLICATE_OF, KEYFRAME_INTERVAL, SCAN_RESULT_1_KEY_NAME, SCAN_RESULT_2_KEY_NAME
+)
+from oscaptool.sample import metrics
+from oscaptool.sample.store import ScanStore
+from oscaptool.tests import make_scan_output
+from actionmanager.actions import ActionError
+
+SCAN_IDS = ['2020-01-01_00:00:00_xccdf_1', '2020-01-02_00:00:00_xccdf_1', '2020-01-03_00:00:00_xccdf_1']
+
+@pytest.fixture
+def config(tmp_path):
+    return {
+        NEXT_ACTION: '', PATH: f'{tmp_path}/', STORE: f'{tmp_path}/store/scans.db',
+        KEYFRAME_INTERVAL: 16, DEDUPLICATE: True
+    }
+
+def parse(lines):
+    parser = ScanResultParser()
+    return ScanResult(parser.parse(lines), parser.stats)
+
+def save(config, scan_id, results):
+    """Save a scan streamed to a temporary file, like ExecuteCommand does."""
+    temporary_file_name = f'{config[PATH]}.{scan_id}.txt.tmp'
+    with open(temporary_file_name, 'w') as file_writer:
+        file_writer.write('\n'.join(make_scan_output(results)) + '\n')
+    return SaveScanResult(config).execute({SCAN_ID: scan_id, CMD_STDOUT: CommandOutput(temporary_file_name)})
+
+def test_content_hash_only_covers_rule_ids_and_results():
+    lines = make_scan_output(['pass', 'fail', 'error'])
+    scan_result = parse(lines)
+    retitled = parse([line.replace('Ensure', 'Make sure') for line in lines])
+    assert retitled.get_content_hash() == scan_result.get_content_hash()
+    assert parse(make_scan_output(['pass', 'fail', 'fail'])).get_content_hash() != scan_result.get_content_hash()
+    assert parse(lines[:-5]).get_content_hash() != scan_result.get_content_hash()
+    # the hash computed while the output streams in is the same
+    scan_progress = ScanProgress()
+    for line in lines:
+        scan_progress.feed(f'{line}\n')
+    assert scan_progress.get_scan_result().get_content_hash() == scan_result.get_content_hash()
+
+def test_duplicated_scan_is_linked(config):
+    save(config, SCAN_IDS[0], ['pass', 'fail'])
+    output = save(config, SCAN_IDS[1], ['pass', 'fail'])
+    assert output[DUPLICATE_OF] == SCAN_IDS[0]
+    assert DUPLICATE_OF not in save(config, SCAN_IDS[2], ['pass', 'pass'])
+    # one file per scan id, the duplicate sharing the previous file, no temporary file left
+    assert sorted(os.listdir(config[PATH])) == sorted([f'{scan_id}.txt' for scan_id in SCAN_IDS] + ['store'])
+    file_stats = [os.stat(f'{config[PATH]}{scan_id}.txt') for scan_id in SCAN_IDS]
+    assert file_stats[0].st_ino == file_stats[1].st_ino != file_stats[2].st_ino
+
+    store = ScanStore(config[STORE])
+    assert store.get_rules(SCAN_IDS[1]) == store.get_rules(SCAN_IDS[0])
+    assert store.get_stats(SCAN_IDS[1]) == store.get_stats(SCAN_IDS[0]) == (1, 1, 0, 2)
+    assert store.get_content_hash(SCAN_IDS[1]) == store.get_content_hash(SCAN_IDS[0]) is not None
+    assert store.get_last_scan('xccdf_1') == (SCAN_IDS[2], store.get_content_hash(SCAN_IDS[2]))
+
+def test_duplicated_scan_is_saved_when_it_cant_be_linked(config):
+    save(config, SCAN_IDS[0], ['pass', 'fail'])
+    os.remove(f'{config[PATH]}{SCAN_IDS[0]}.txt')
+    output = save(config, SCAN_IDS[1], ['pass', 'fail'])
+    assert DUPLICATE_OF not in output
+    assert parse(output[CMD_STDOUT]).get_content_hash() == ScanStore(config[STORE]).get_content_hash(SCAN_IDS[0])
+
+def test_same_hashes_are_compared_without_loading(config):
+    save(config, SCAN_IDS[0], ['pass', 'fail'])
+    save(config, SCAN_IDS[1], ['pass', 'fail'])
+    get_config = {NEXT_ACTION: '', SCAN_ID_KEY_NAME: 'scan_id', OUTPUT_KEY_NAME: 'output', PATH: config[PATH], STORE: config[STORE]}
+    scans = [GetScanResult(get_config).get_scan_result(scan_id) for scan_id in SCAN_IDS[:2]]
+    action = CompareScanResults({NEXT_ACTION: '', SCAN_RESULT_1_KEY_NAME: 'a', SCAN_RESULT_2_KEY_NAME: 'b', OUTPUT_KEY_NAME: 'output'})
+    comparisons = metrics.COMPARISONS.get_samples().get(metrics.COMPARISONS.get_sample_name(('hash',)), 0)
+    comparison = action.execute({'a': scans[0], 'b': scans[1]})['output']
+    assert (comparison._introduced, comparison._fixed) == (0, 0)
+    assert metrics.COMPARISONS.get_samples()[metrics.COMPARISONS.get_sample_name(('hash',))] == comparisons + 1
+    assert scans[0]._columns is None and scans[1]._columns is None
+
+def test_deduplicate_requires_a_store(config):
+    with pytest.raises(ActionError):
+        SaveScanResult({key: value for key, value in config.items() if key != STORE})
+
+def test_duplicated_scans_get_keyframes(config):
+    config[KEYFRAME_INTERVAL] = 2
+    scan_ids = [f'2020-01-0{day}_00:00:00_xccdf_1' for day in range(1, 6)]
+    for scan_id in scan_ids:
+        save(config, scan_id, ['pass', 'fail'])
+    store = ScanStore(config[STORE])
+    with store.connect() as connection:
+        keyframes = [row[0] for row in connection.execute('SELECT base IS NULL FROM scans ORDER BY scan_id')]
+    # the delta paths stay within the keyframe interval
+    assert keyframes == [1, 0, 1, 0, 1]
+    for scan_id in scan_ids:
+        assert store.get_rules(scan_id) == store.get_rules(scan_ids[0])
@@ -0,0 +1,67 @@
+import pytest
+
+from oscaptool.sample.actions import (
+    CompareScanDrift, CompareScanResults, GetScanResults, ScanResult, ScanStats,
+    NEXT_ACTION, SCAN_RESULTS_KEY_NAME, SCAN_RESULT_1_KEY_NAME, SCAN_RESULT_2_KEY_NAME, SCAN_IDS_KEY_NAME,
+    OUTPUT_KEY_NAME, PATH, SINCE, UNTIL
+)
+from oscaptool.tests import write_scan_file
+
+SCAN_IDS = ['2020-01-01_00:00:00_xccdf_1', '2020-01-02_00:00:00_xccdf_1', '2020-02-01_00:00:00_xccdf_1']
+SCANS = [
+    {'flapping': 'pass', 'introduced': 'pass', 'fixed': 'fail', 'removed': 'fail', 'same': 'fail'},
+    {'flapping': 'fail', 'introduced': 'fail', 'fixed': 'pass', 'same': 'fail', 'added': 'pass'},
+    {'flapping': 'pass', 'introduced': 'fail', 'fixed': 'notapplicable', 'same': 'fail', 'added': 'fail'},
+]
+
+def create_scan_result(results):
+    scan_result = ScanResult([], ScanStats(0, 0, 0, 0))
+    for rule, result in results.items():
+        scan_result.add_rule(rule.title(), rule, result)
+        scan_result._stats.add(result)
+    return scan_result
+
+def compare(oldest_scan, newest_scan):
+    action = CompareScanResults({
+        NEXT_ACTION: '', SCAN_RESULT_1_KEY_NAME: 'scan_1', SCAN_RESULT_2_KEY_NAME: 'scan_2', OUTPUT_KEY_NAME: 'output'
+    })
+    comparison = action.execute({'scan_1': oldest_scan, 'scan_2': newest_scan})['output']
+    return comparison._introduced, comparison._fixed
+
+@pytest.fixture
+def drift():
+    action = CompareScanDrift({NEXT_ACTION: 'next', SCAN_RESULTS_KEY_NAME: 'scan_results', OUTPUT_KEY_NAME: 'output'})
+    output = action.execute({'scan_results': list(zip(SCAN_IDS, map(create_scan_result, SCANS)))})
+    assert output[NEXT_ACTION] == 'next'
+    return output['output']
+
+def test_transitions_match_pairwise_comparisons(drift):
+    scans = [create_scan_result(results) for results in SCANS]
+    assert drift._transitions == [compare(*pair) for pair in zip(scans, scans[1:])]
+    assert drift._transitions == [(2, 2), (1, 1)]
+
+def test_rule_changes(drift):
+    assert drift._rule_changes == {
+        'flapping': ([SCAN_IDS[1]], [SCAN_IDS[2]]),
+        'introduced': ([SCAN_IDS[1]], []),
+        'fixed': ([], [SCAN_IDS[1]]),
+        'removed': ([], [SCAN_IDS[1]]),
+        'added': ([SCAN_IDS[2]], []),
+    }
+    assert drift._flapping == ['flapping']
+    assert repr(drift).endswith('\nFlapping: flapping')
+
+def test_scans_are_selected_by_date(tmp_path):
+    for scan_id in SCAN_IDS:
+        write_scan_file(f'{tmp_path}/{scan_id}.txt', ['pass'])
+    action = GetScanResults({NEXT_ACTION: '', SCAN_IDS_KEY_NAME: 'scan_ids', OUTPUT_KEY_NAME: 'output', PATH: f'{tmp_path}/'})
+
+    def get_scan_ids(**input_data):
+        return [scan_id for scan_id, _ in action.execute(dict(input_data, scan_ids=None))['output']]
+
+    assert get_scan_ids() == SCAN_IDS
+    assert get_scan_ids(**{SINCE: '2020-01-02'}) == SCAN_IDS[1:]
+    # the until date is inclusive, whatever its precision
+    assert get_scan_ids(**{UNTIL: '2020-01'}) == SCAN_IDS[:2]
+    assert get_scan_ids(**{SINCE: '2020-01-02', UNTIL: '2020-01-02'}) == SCAN_IDS[1:2]
+    assert [scan_id for scan_id, _ in action.execute({'scan_ids': SCAN_IDS[::2]})['output']] == SCAN_IDS[::2]
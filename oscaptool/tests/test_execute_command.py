@@ -0,0 +1,112 @@
+import os
+import subprocess
+import tracemalloc
+
+import pytest
+
+from oscaptool.sample.actions import (
+    ExecuteCommand, CreateScanId, SaveScanResult, GetScanHistory, CommandOutput,
+    NEXT_ACTION, PATH, CMD_STR, CMD_STDOUT, CMD_RETURNCODE, ECHO, SCAN_ID, SCAN_TYPE, SCAN_SUB_TYPE, SCAN_TAG,
+    OUTPUT_KEY_NAME, STORE, PARSE, PROGRESS_INTERVAL, PROGRESS_CALLBACK, PARSED_SCAN_RESULT
+)
+from oscaptool.sample.store import ScanStore
+from oscaptool.tests import install_stub_oscap
+
+RESULTS = ['pass', 'fail', 'notapplicable', 'fail']
+
+@pytest.fixture
+def oscap(tmp_path, monkeypatch):
+    return install_stub_oscap(tmp_path, monkeypatch, RESULTS)
+
+def run(config, **input_data):
+    action = ExecuteCommand(dict(config, **{NEXT_ACTION: 'next'}))
+    return action.execute(dict({CMD_STR: 'oscap xccdf eval', ECHO: False}, **input_data))
+
+def test_output_is_captured(oscap, capsys):
+    output = run({})
+    assert output[CMD_RETURNCODE] == 2
+    assert output[NEXT_ACTION] == 'next'
+    assert sum(line.startswith('Result') for line in output[CMD_STDOUT]) == len(RESULTS)
+    assert capsys.readouterr().out == ''
+
+def test_output_is_echoed(oscap, capsys):
+    output = run({}, **{ECHO: True})
+    assert capsys.readouterr().out.count('Result') == len(RESULTS)
+    assert output[CMD_RETURNCODE] == 2
+
+def test_output_is_streamed_to_file(oscap, tmp_path):
+    output = run({PATH: f'{tmp_path}/scans/'})
+    assert isinstance(output[CMD_STDOUT], CommandOutput)
+    assert os.path.dirname(output[CMD_STDOUT].filename) == f'{tmp_path}/scans'
+    with open(output[CMD_STDOUT].filename, 'rb') as file_reader:
+        assert file_reader.read() == subprocess.run([str(oscap)], stdout=subprocess.PIPE).stdout
+    assert sum(line.startswith('Result') for line in output[CMD_STDOUT]) == len(RESULTS)
+
+@pytest.mark.parametrize('echo', [False, True])
+def test_streamed_output_is_saved(oscap, tmp_path, echo):
+    path = f'{tmp_path}/scans/'
+    output = run({PATH: path}, **{ECHO: echo, SCAN_ID: 'scan'})
+    temp_filename = output[CMD_STDOUT].filename
+    assert os.path.basename(temp_filename).startswith('.scan')
+    # the hidden temporary file isn't a scan result
+    history = GetScanHistory({NEXT_ACTION: '', PATH: path, OUTPUT_KEY_NAME: 'output'}).execute({})
+    assert history['output'] == []
+
+    SaveScanResult({NEXT_ACTION: '', PATH: path}).execute(output)
+    assert not os.path.exists(temp_filename)
+    assert os.listdir(path) == ['scan.txt']
+    with open(f'{path}scan.txt', 'rb') as file_reader:
+        assert file_reader.read() == subprocess.run([str(oscap)], stdout=subprocess.PIPE).stdout
+
+def test_temporary_file_is_removed_on_failure(oscap, tmp_path):
+    path = f'{tmp_path}/scans/'
+
+    def interrupt(stats, rules_per_second):
+        if stats.total == 2:
+            raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        run({PATH: path, PARSE: True, PROGRESS_INTERVAL: 0}, **{SCAN_ID: 'scan', PROGRESS_CALLBACK: interrupt})
+    assert os.listdir(path) == []
+
+def test_streamed_output_memory(tmp_path, monkeypatch):
+    install_stub_oscap(tmp_path, monkeypatch, ['pass', 'fail'] * 20000)
+    peak_memory = {}
+    for path in (None, f'{tmp_path}/scans/'):
+        tracemalloc.start()
+        run({PATH: path} if path else {})
+        peak_memory[path] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    # the output is several MB, only a chunk of it is held when streamed
+    assert peak_memory[f'{tmp_path}/scans/'] < peak_memory[None] / 10
+
+@pytest.mark.parametrize('streamed', [False, True])
+def test_output_is_parsed_while_running(oscap, tmp_path, streamed):
+    reports = []
+    config = {PATH: f'{tmp_path}/scans/'} if streamed else {}
+    output = run(
+        dict(config, **{PARSE: True, PROGRESS_INTERVAL: 0}),
+        **{PROGRESS_CALLBACK: lambda stats, rules_per_second: reports.append(stats.total)}
+    )
+    scan_result = output[PARSED_SCAN_RESULT]
+    assert [rule for _, rule, _ in scan_result.get_rule_tuples()] == [
+        f'xccdf_org.ssgproject.content_rule_{index}' for index in range(len(RESULTS))
+    ]
+    assert scan_result._stats.to_tuple() == (1, 2, 1, 4)
+    # one report per line, and a last one once the command exited
+    assert reports[-1] == len(RESULTS)
+    assert reports == sorted(reports)
+
+def test_parsed_output_is_stored(oscap, tmp_path):
+    path = f'{tmp_path}/scans/'
+    output = run({PATH: path, PARSE: True}, **{SCAN_ID: 'scan'})
+    SaveScanResult({NEXT_ACTION: '', PATH: path, STORE: f'{tmp_path}/scans.db'}).execute(output)
+    store = ScanStore(f'{tmp_path}/scans.db')
+    assert store.get_stats('scan') == (1, 2, 1, 4)
+    assert store.get_rules('scan') == list(output[PARSED_SCAN_RESULT].get_rule_tuples())
+
+def test_scan_tag_is_added_to_scan_id():
+    action = CreateScanId({NEXT_ACTION: ''})
+    scan_id = action.execute({SCAN_TYPE: 'xccdf', SCAN_SUB_TYPE: '1', SCAN_TAG: 'a'})[SCAN_ID]
+    assert scan_id.endswith('_xccdf_1_a')
+    assert action.execute({SCAN_TYPE: 'xccdf', SCAN_SUB_TYPE: '1'})[SCAN_ID].endswith('_xccdf_1')
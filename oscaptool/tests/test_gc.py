@@ -0,0 +1,143 @@
+import os
+import time
+import zipfile
+import datetime
+
+import pytest
+
+from oscaptool.sample.actions import (
+    CollectScanResults, GetScanResult, GetScanHistory, RetentionPolicy,
+    NEXT_ACTION, PATH, OUTPUT_KEY_NAME, SCAN_ID_KEY_NAME, HISTORY_INDEX, RETENTION, DRY_RUN
+)
+from oscaptool.sample.history import ScanHistoryIndex
+from oscaptool.tests import write_scan_file
+
+NOW = datetime.datetime(2020, 3, 1)
+
+def check_policy(policy, scan_ids):
+    for scan_id in scan_ids:
+        policy.add(scan_id)
+    return [scan_id for scan_id in scan_ids if policy.is_kept(scan_id)]
+
+def test_keep_last_per_group():
+    # one scan a day is kept, plus the keep_last newest ones
+    scan_ids = [f'2020-02-01_{hour:02d}:00:00_{scan_type}' for hour in range(5) for scan_type in ('xccdf_1', 'oval_1')]
+    kept = check_policy(RetentionPolicy(2, 0, now=NOW), scan_ids)
+    assert kept == scan_ids[-4:]
+
+def test_daily_and_weekly_thinning():
+    # two scans a day in February, daily after 7 days and weekly after 14 days
+    scan_ids = [f'2020-02-{day:02d}_{hour:02d}:00:00_xccdf_1' for day in range(1, 30) for hour in (6, 18)]
+    kept = check_policy(RetentionPolicy(1, 7, 14, now=NOW), scan_ids)
+    recent = [scan_id for scan_id in scan_ids if scan_id >= '2020-02-23']
+    daily = [f'2020-02-{day:02d}_18:00:00_xccdf_1' for day in range(16, 23)]
+    # ISO weeks end on Sundays, the third week is cut at the weekly cutoff
+    weekly = [f'2020-02-{day:02d}_18:00:00_xccdf_1' for day in (2, 9, 15)]
+    assert kept == weekly + daily + recent
+
+@pytest.mark.parametrize('policy, kept', [
+    # a missing day setting thins nothing
+    (RetentionPolicy(1, now=NOW), 4),
+    (RetentionPolicy(1, None, 60, now=NOW), 4),
+    (RetentionPolicy(1, 30, now=NOW), 2),
+    (RetentionPolicy(1, 0, now=NOW), 2),
+    (RetentionPolicy(1, None, 30, now=NOW), 1),
+])
+def test_missing_day_settings_keep_scans(policy, kept):
+    # two scans a day, on two days of the same week about 60 days ago
+    scan_ids = [f'2020-01-{day:02d}_{hour:02d}:00:00_xccdf_1' for day in (1, 2) for hour in (6, 18)]
+    assert len(check_policy(policy, scan_ids)) == kept
+
+def test_scans_without_timestamp_are_kept():
+    scan_ids = ['a', '2020-01-01_00:00:00_xccdf_1', '2020-01-01_12:00:00_xccdf_1']
+    assert check_policy(RetentionPolicy(0, 0, now=NOW), scan_ids) == [scan_ids[0], scan_ids[2]]
+
+@pytest.fixture
+def scan_results(tmp_path):
+    path = f'{tmp_path}/'
+    scan_ids = [f'2020-0{month}-01_{hour}:00:00_xccdf_1' for month in (1, 2) for hour in ('00', '12')]
+    for scan_id in scan_ids:
+        write_scan_file(f'{path}{scan_id}.txt', ['pass', 'fail'])
+    return path, scan_ids
+
+def collect(path, retention, **input_data):
+    action = CollectScanResults({
+        NEXT_ACTION: '', PATH: path, OUTPUT_KEY_NAME: 'output', RETENTION: retention,
+        HISTORY_INDEX: f'{path}index/history.db'
+    })
+    return action.execute(input_data)['output']
+
+def test_scans_are_archived_and_still_readable(scan_results):
+    path, scan_ids = scan_results
+    history = GetScanHistory({NEXT_ACTION: '', PATH: path, OUTPUT_KEY_NAME: 'output', HISTORY_INDEX: f'{path}index/history.db'})
+    history.execute({})
+    assert collect(path, {'keep_last': 1, 'keep_daily_after_days': 0}) == 'archived scans: 2 removed archives: 0 removed temporary files: 0'
+    assert sorted(os.listdir(f'{path}archive')) == ['2020-01.zip', '2020-02.zip']
+    assert sorted(name for name in os.listdir(path) if name.endswith('.txt')) == [f'{scan_ids[1]}.txt', f'{scan_ids[3]}.txt']
+    action = GetScanResult({NEXT_ACTION: '', SCAN_ID_KEY_NAME: 'scan_id', OUTPUT_KEY_NAME: 'output', PATH: path})
+    for scan_id in scan_ids:
+        assert action.get_scan_result(scan_id)._stats.to_tuple() == (1, 1, 0, 2)
+    # the index follows the archived scans
+    entries = ScanHistoryIndex(f'{path}index/history.db').query()
+    assert [entry[:2] for entry in entries] == [
+        (scan_ids[0], 'archive/2020-01.zip'), (scan_ids[1], f'{scan_ids[1]}.txt'),
+        (scan_ids[2], 'archive/2020-02.zip'), (scan_ids[3], f'{scan_ids[3]}.txt')
+    ]
+
+def test_dry_run_archives_nothing(scan_results):
+    path, scan_ids = scan_results
+    output = collect(path, {'keep_last': 1, 'keep_daily_after_days': 0}, **{DRY_RUN: True})
+    assert output == 'dry run, archived scans: 2 removed archives: 0 removed temporary files: 0'
+    assert sorted(name for name in os.listdir(path) if name.endswith('.txt')) == [f'{scan_id}.txt' for scan_id in scan_ids]
+    assert not os.path.exists(f'{path}archive')
+
+def test_old_temporary_files_are_removed(scan_results):
+    path, scan_ids = scan_results
+    os.makedirs(f'{path}archive')
+    old_files = [f'{path}.{scan_ids[0]}.txt.tmp', f'{path}{scan_ids[1]}.txt.gz.1.tmp', f'{path}archive/2020-01.zip.1.tmp']
+    new_files = [f'{path}.{scan_ids[2]}.txt.tmp']
+    for file_name in old_files + new_files:
+        with open(file_name, 'w') as file_writer:
+            file_writer.write('partial')
+    for file_name in old_files:
+        os.utime(file_name, (time.time() - 25 * 3600,) * 2)
+    retention = {'keep_last': 2}
+    assert collect(path, retention, **{DRY_RUN: True}).endswith('removed temporary files: 3')
+    assert all(map(os.path.exists, old_files + new_files))
+    assert collect(path, retention).endswith('removed temporary files: 3')
+    assert not any(map(os.path.exists, old_files))
+    # a running scan's file is kept, unless the age is lowered
+    assert os.path.exists(new_files[0])
+    assert collect(path, dict(retention, remove_temp_after_hours=0)).endswith('removed temporary files: 1')
+
+@pytest.fixture
+def archived_scan_results(tmp_path):
+    """A scan results directory with two scans linked to the same file, temporary and stray
+    files, and two monthly archives."""
+    path = f'{tmp_path}/'
+    with open(f'{path}2020-03-01_00:00:00_xccdf_1.txt', 'wb') as file_writer:
+        file_writer.write(b'x' * 1000)
+    os.link(f'{path}2020-03-01_00:00:00_xccdf_1.txt', f'{path}2020-03-02_00:00:00_xccdf_1.txt')
+    for file_name in ('.2020-03-03_00:00:00_xccdf_1.txt.tmp', 'notes.log'):
+        with open(f'{path}{file_name}', 'wb') as file_writer:
+            file_writer.write(os.urandom(100000))
+    os.makedirs(f'{path}archive')
+    for month in ('01', '02'):
+        with zipfile.ZipFile(f'{path}archive/2020-{month}.zip', 'w') as archive:
+            archive.writestr(f'2020-{month}-01_00:00:00_xccdf_1.txt', os.urandom(10000))
+    return path
+
+def test_oldest_archives_are_removed(archived_scan_results):
+    path = archived_scan_results
+    # only the scan file (once) and the archives are counted
+    retention = {'keep_last': 10, 'max_bytes': 1000 + os.path.getsize(f'{path}archive/2020-02.zip')}
+    assert collect(path, retention).startswith('archived scans: 0 removed archives: 1 ')
+    assert os.listdir(f'{path}archive') == ['2020-02.zip']
+    assert collect(path, retention).startswith('archived scans: 0 removed archives: 0 ')
+
+def test_dry_run_removes_nothing(archived_scan_results):
+    path = archived_scan_results
+    files = sorted(os.listdir(path)) + sorted(os.listdir(f'{path}archive'))
+    output = collect(path, {'keep_last': 10, 'max_bytes': 0}, **{DRY_RUN: True})
+    assert output.startswith('dry run, archived scans: 0 removed archives: 2 ')
+    assert sorted(os.listdir(path)) + sorted(os.listdir(f'{path}archive')) == files
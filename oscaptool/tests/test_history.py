@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+from oscaptool.sample.actions import (
+    GetScanHistory, SaveScanResult,
+    NEXT_ACTION, PATH, OUTPUT_KEY_NAME, HISTORY_INDEX, SINCE, UNTIL, SCAN_TYPE_FILTER, SORT, REVERSE, LIMIT, OFFSET,
+    CMD_STDOUT, SCAN_ID
+)
+from oscaptool.sample.history import ScanHistoryIndex
+from oscaptool.tests import make_scan_output, write_scan_file
+from actionmanager.actions import ActionError
+
+SCANS = {
+    '2020-01-01_00:00:00_xccdf_1': ['pass', 'fail', 'fail'],
+    '2020-01-02_00:00:00_oval_1': ['pass', 'pass'],
+    '2020-01-03_00:00:00_xccdf_2': ['fail'],
+    '2020-02-01_00:00:00_xccdf_1_batch': ['notapplicable', 'fail', 'fail', 'fail'],
+}
+SCAN_IDS = sorted(SCANS)
+
+@pytest.fixture
+def history(tmp_path):
+    for scan_id, results in SCANS.items():
+        write_scan_file(f'{tmp_path}/{scan_id}.txt', results)
+    action = GetScanHistory({
+        NEXT_ACTION: '', PATH: f'{tmp_path}/', OUTPUT_KEY_NAME: 'output', HISTORY_INDEX: f'{tmp_path}/index/history.db'
+    })
+    return lambda **filters: [entry.scan_id for entry in action.execute(filters)['output']]
+
+@pytest.mark.parametrize('filters, expected', [
+    ({}, SCAN_IDS),
+    ({SINCE: '2020-01-02'}, SCAN_IDS[1:]),
+    ({UNTIL: '2020-01'}, SCAN_IDS[:3]),
+    ({SINCE: '2020-01-02', UNTIL: '2020-01-03_00:00:00'}, SCAN_IDS[1:3]),
+    ({SCAN_TYPE_FILTER: 'xccdf'}, [SCAN_IDS[0], SCAN_IDS[2], SCAN_IDS[3]]),
+    ({SCAN_TYPE_FILTER: 'xccdf-1'}, [SCAN_IDS[0], SCAN_IDS[3]]),
+])
+def test_filters(history, filters, expected):
+    assert history(**filters) == expected
+
+def test_sort_and_pagination(history):
+    by_fail = [SCAN_IDS[1], SCAN_IDS[2], SCAN_IDS[0], SCAN_IDS[3]]
+    assert history(**{SORT: 'fail'}) == by_fail
+    assert history(**{SORT: 'fail', REVERSE: 'true'}) == by_fail[::-1]
+    assert history(**{SORT: 'pass', REVERSE: True}) == [SCAN_IDS[1], SCAN_IDS[0], SCAN_IDS[3], SCAN_IDS[2]]
+    assert history(**{SORT: 'fail', LIMIT: '2'}) == by_fail[:2]
+    assert history(**{SORT: 'fail', LIMIT: 2, OFFSET: 1}) == by_fail[1:3]
+    assert history(**{OFFSET: '3'}) == SCAN_IDS[3:]
+    with pytest.raises(ActionError):
+        history(**{SORT: 'title'})
+    with pytest.raises(ActionError):
+        history(**{LIMIT: 'all'})
+
+def test_entries_include_stats(tmp_path, history):
+    history()
+    action = GetScanHistory({
+        NEXT_ACTION: '', PATH: f'{tmp_path}/', OUTPUT_KEY_NAME: 'output', HISTORY_INDEX: f'{tmp_path}/index/history.db'
+    })
+    entry = action.execute({SCAN_TYPE_FILTER: 'oval'})['output'][0]
+    assert (entry.timestamp, entry.scan_type, entry.scan_subtype) == ('2020-01-02_00:00:00', 'oval', '1')
+    assert entry.stats.to_tuple() == (2, 0, 0, 2)
+
+def test_saved_scans_are_indexed(tmp_path, history):
+    history()
+    # the directory is only listed once, later scans are added when saved
+    write_scan_file(f'{tmp_path}/2020-03-01_00:00:00_oval_2.txt', ['pass'])
+    assert history() == SCAN_IDS
+    SaveScanResult({NEXT_ACTION: '', PATH: f'{tmp_path}/', HISTORY_INDEX: f'{tmp_path}/index/history.db'}).execute(
+        {SCAN_ID: '2020-03-02_00:00:00_oval_2', CMD_STDOUT: [f'{line}\n' for line in make_scan_output(['fail'])]}
+    )
+    assert history(**{SCAN_TYPE_FILTER: 'oval-2', SORT: 'fail'}) == ['2020-03-02_00:00:00_oval_2']
+
+def test_plain_listing(tmp_path):
+    for scan_id, results in SCANS.items():
+        write_scan_file(f'{tmp_path}/{scan_id}.txt', results)
+    action = GetScanHistory({NEXT_ACTION: '', PATH: f'{tmp_path}/', OUTPUT_KEY_NAME: 'output'})
+    assert action.execute({})['output'] == [f'{scan_id}.txt' for scan_id in SCAN_IDS]
+    with pytest.raises(ActionError):
+        action.execute({LIMIT: '1'})
+
+def test_schema_is_set_up_once(tmp_path, monkeypatch):
+    file_name = f'{tmp_path}/index/history.db'
+    ScanHistoryIndex(file_name)
+    connections = []
+    connect = ScanHistoryIndex.connect
+    monkeypatch.setattr(ScanHistoryIndex, 'connect', lambda self: connections.append(self) or connect(self))
+    ScanHistoryIndex(file_name)
+    assert connections == []
+    # a removed file is set up again
+    os.remove(file_name)
+    ScanHistoryIndex(file_name)
+    assert len(connections) == 1
+    assert ScanHistoryIndex(file_name).query() == []
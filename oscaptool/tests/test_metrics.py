@@ -0,0 +1,180 @@
+import os
+import sys
+import subprocess
+import urllib.request
+import urllib.error
+
+import pytest
+
+from oscaptool.sample import metrics
+from oscaptool.sample.metrics import MetricsRegistry, MetricsServer
+from oscaptool.sample.actions import (
+    GetScanResult, CompareScanResults, ExecuteCommand,
+    NEXT_ACTION, SCAN_ID_KEY_NAME, OUTPUT_KEY_NAME, PATH, STORE, SCAN_RESULT_1_KEY_NAME, SCAN_RESULT_2_KEY_NAME,
+    CMD_STR, ECHO, PARSE
+)
+from oscaptool.tests import ROOT, write_scan_file, install_stub_oscap
+
+SCAN_IDS = ['2020-01-01_00:00:00_xccdf_1', '2020-01-02_00:00:00_xccdf_1']
+CLIENT_SCRIPT = '''
+import sys
+from oscaptool.sample.app import Client
+from oscaptool.tests import load_config
+home = sys.argv[1]
+sys.argv = ['oscaptool'] + sys.argv[2:]
+Client(load_config(home)).run()
+'''
+
+def create_registry():
+    registry = MetricsRegistry()
+    return registry, (
+        registry.counter('test_scans_total', 'Scans run', ('scantype', 'returncode')),
+        registry.gauge('test_rules', 'Rules of the last scan', ('result',)),
+        registry.histogram('test_duration_seconds', 'Scan duration', ('scantype',), buckets=(0.5, 2.0, 10.0))
+    )
+
+def test_exposition_format():
+    registry, (counter, gauge, histogram) = create_registry()
+    registry.counter('test_unused_total', 'Never incremented')
+    counter.inc(labels=('xccdf', 2))
+    counter.inc(2, ('oval "quoted"\\', 0))
+    gauge.set(3, ('pass',))
+    gauge.set(1.5, ('fail',))
+    for value in (0.1, 1.0, 20.0):
+        histogram.observe(value, ('xccdf',))
+    assert ''.join(registry.get_lines()) == (
+        '# HELP test_duration_seconds Scan duration\n'
+        '# TYPE test_duration_seconds histogram\n'
+        'test_duration_seconds_bucket{scantype="xccdf",le="0.5"} 1\n'
+        'test_duration_seconds_bucket{scantype="xccdf",le="2"} 2\n'
+        'test_duration_seconds_bucket{scantype="xccdf",le="10"} 2\n'
+        'test_duration_seconds_bucket{scantype="xccdf",le="+Inf"} 3\n'
+        'test_duration_seconds_sum{scantype="xccdf"} 21.1\n'
+        'test_duration_seconds_count{scantype="xccdf"} 3\n'
+        '# HELP test_rules Rules of the last scan\n'
+        '# TYPE test_rules gauge\n'
+        'test_rules{result="fail"} 1.5\n'
+        'test_rules{result="pass"} 3\n'
+        '# HELP test_scans_total Scans run\n'
+        '# TYPE test_scans_total counter\n'
+        'test_scans_total{scantype="oval \\"quoted\\"\\\\",returncode="0"} 2\n'
+        'test_scans_total{scantype="xccdf",returncode="2"} 1\n'
+    )
+
+def test_textfile_merge(tmp_path):
+    textfile = f'{tmp_path}/metrics/oscaptool.prom'
+    registry, (counter, gauge, histogram) = create_registry()
+    counter.inc(labels=('xccdf', 2))
+    gauge.set(3, ('pass',))
+    gauge.set(1, ('fail',))
+    histogram.observe(1.0, ('xccdf',))
+    registry.write_textfile(textfile)
+    with open(textfile, 'a') as file_writer:
+        file_writer.write('test_removed_total 5\n')
+
+    # a later run adds its counters and histograms, and replaces the gauges it set
+    registry, (counter, gauge, histogram) = create_registry()
+    counter.inc(labels=('xccdf', 2))
+    counter.inc(labels=('oval', 0))
+    gauge.set(4, ('pass',))
+    histogram.observe(5.0, ('xccdf',))
+    registry.write_textfile(textfile)
+    with open(textfile) as file_reader:
+        samples = dict(line.rsplit(' ', 1) for line in file_reader.read().splitlines() if not line.startswith('#'))
+    assert samples == {
+        'test_scans_total{scantype="oval",returncode="0"}': '1',
+        'test_scans_total{scantype="xccdf",returncode="2"}': '2',
+        'test_rules{result="fail"}': '1',
+        'test_rules{result="pass"}': '4',
+        'test_duration_seconds_bucket{scantype="xccdf",le="0.5"}': '0',
+        'test_duration_seconds_bucket{scantype="xccdf",le="2"}': '1',
+        'test_duration_seconds_bucket{scantype="xccdf",le="10"}': '2',
+        'test_duration_seconds_bucket{scantype="xccdf",le="+Inf"}': '2',
+        'test_duration_seconds_sum{scantype="xccdf"}': '6',
+        'test_duration_seconds_count{scantype="xccdf"}': '2',
+    }
+    # only the file and its lock file, no temporary file left
+    assert sorted(os.listdir(f'{tmp_path}/metrics')) == ['oscaptool.prom', 'oscaptool.prom.lock']
+
+def test_changes_from_another_process():
+    registry, (counter, gauge, histogram) = create_registry()
+    counter.inc(labels=('xccdf', 2))
+    snapshot = registry.snapshot()
+    counter.inc(3, ('xccdf', 2))
+    gauge.set(7, ('pass',))
+    histogram.observe(1.0, ('xccdf',))
+    changes = registry.get_changes(snapshot)
+    assert changes['test_scans_total'] == {'test_scans_total{scantype="xccdf",returncode="2"}': 3}
+
+    parent_registry, (parent_counter, parent_gauge, _) = create_registry()
+    parent_counter.inc(labels=('xccdf', 2))
+    parent_registry.merge_changes(changes)
+    assert parent_counter.get_samples() == {'test_scans_total{scantype="xccdf",returncode="2"}': 4}
+    assert parent_gauge.get_samples() == {'test_rules{result="pass"}': 7}
+    assert ''.join(parent_registry.get_lines()).count('test_duration_seconds_count{scantype="xccdf"} 1\n') == 1
+
+def test_metrics_endpoint():
+    registry, (counter, _, _) = create_registry()
+    counter.inc(labels=('xccdf', 2))
+    server = MetricsServer('127.0.0.1', 0, registry)
+    server.start()
+    try:
+        url = f'http://127.0.0.1:{server.server_address[1]}'
+        with urllib.request.urlopen(f'{url}/metrics') as response:
+            assert response.headers['Content-Type'] == metrics.CONTENT_TYPE
+            assert 'test_scans_total{scantype="xccdf",returncode="2"} 1\n' in response.read().decode('utf-8')
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f'{url}/other')
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def get_value(metric, labels, suffix=''):
+    return metric.get_samples().get(metric.get_sample_name(labels, suffix), 0)
+
+def test_action_metrics(tmp_path):
+    # different results, so the scans are compared by their rules and not by their hashes
+    for scan_id, results in zip(SCAN_IDS, (['pass', 'fail'], ['fail', 'fail'])):
+        write_scan_file(f'{tmp_path}/{scan_id}.txt', results)
+    action = GetScanResult({
+        NEXT_ACTION: '', SCAN_ID_KEY_NAME: 'scan_id', OUTPUT_KEY_NAME: 'output',
+        PATH: f'{tmp_path}/', STORE: f'{tmp_path}/store/scans.db'
+    })
+    misses = get_value(metrics.CACHE_REQUESTS, ('store', 'miss'))
+    hits = get_value(metrics.CACHE_REQUESTS, ('store', 'hit'))
+    rules_parsed = get_value(metrics.RULES_PARSED, ('file',))
+    scans = [action.get_scan_result(scan_id) for scan_id in SCAN_IDS]
+    scans = [action.get_scan_result(scan_id) for scan_id in SCAN_IDS]
+    assert get_value(metrics.CACHE_REQUESTS, ('store', 'miss')) == misses + 2
+    assert get_value(metrics.CACHE_REQUESTS, ('store', 'hit')) == hits + 2
+    assert get_value(metrics.RULES_PARSED, ('file',)) == rules_parsed + 4
+
+    comparisons = get_value(metrics.COMPARISONS, ('rules',))
+    CompareScanResults({
+        NEXT_ACTION: '', SCAN_RESULT_1_KEY_NAME: 'scan_1', SCAN_RESULT_2_KEY_NAME: 'scan_2', OUTPUT_KEY_NAME: 'output'
+    }).execute({'scan_1': scans[0], 'scan_2': scans[1]})
+    assert get_value(metrics.COMPARISONS, ('rules',)) == comparisons + 1
+
+def test_parse_duration_excludes_the_command_time(tmp_path, monkeypatch):
+    script = install_stub_oscap(tmp_path, monkeypatch, ['pass', 'fail'])
+    script.write_text(script.read_text().replace('sys.exit(', 'import time\ntime.sleep(0.5)\nsys.exit('))
+    scan_duration = get_value(metrics.SCAN_DURATION, ('', ''), '_sum')
+    parse_duration = get_value(metrics.PARSE_DURATION, ('scan',))
+    ExecuteCommand({NEXT_ACTION: '', PARSE: True}).execute({CMD_STR: 'oscap xccdf eval', ECHO: False})
+    assert get_value(metrics.SCAN_DURATION, ('', ''), '_sum') - scan_duration >= 0.5
+    assert 0 < get_value(metrics.PARSE_DURATION, ('scan',)) - parse_duration < 0.5
+
+def test_runs_add_to_the_textfile(tmp_path):
+    (tmp_path / 'scan_results').mkdir()
+    write_scan_file(f'{tmp_path}/scan_results/{SCAN_IDS[0]}.txt', ['pass', 'fail'])
+    for _ in range(2):
+        subprocess.run(
+            [sys.executable, '-c', CLIENT_SCRIPT, str(tmp_path), 'show', '--scan-id', SCAN_IDS[0]],
+            cwd=ROOT, stdout=subprocess.DEVNULL, check=True
+        )
+    with open(f'{tmp_path}/metrics/oscaptool.prom') as file_reader:
+        lines = file_reader.read().splitlines()
+    assert 'oscaptool_workflow_duration_seconds_count{workflow="show-scan-result",status="ok"} 2' in lines
+    # the first run parsed the scan and stored it, the second one read it from the store
+    assert 'oscaptool_rules_parsed_total{source="file"} 2' in lines
+    assert 'oscaptool_cache_requests_total{cache="store",result="hit"} 1' in lines
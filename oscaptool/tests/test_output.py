@@ -0,0 +1,88 @@
+import io
+import csv
+import json
+
+import pytest
+
+from oscaptool.sample.actions import (
+    PrintStdout, Rule, ScanResult, ScanStats, ScanResultComparison, ScanDrift, ScanHistoryEntry,
+    NEXT_ACTION, STDOUT_INPUT, FORMAT
+)
+from oscaptool.sample.util import OutputWriter
+from actionmanager.actions import ActionError
+
+RULES = [('First rule', 'rule_1', 'pass'), ('Second, "quoted" rule', 'rule_2', 'fail')]
+
+@pytest.fixture
+def scans():
+    return [
+        ScanResult((Rule(*rule) for rule in RULES), ScanStats(1, 1, 0, 2)),
+        ScanResult((Rule(title, rule_id, 'pass') for title, rule_id, _ in RULES), ScanStats(2, 0, 0, 2))
+    ]
+
+@pytest.fixture
+def drift(scans):
+    return ScanDrift(['a', 'b'], scans, [(0, 1)], {'rule_2': ([], ['b'])}, [])
+
+def write(output, output_format):
+    stream = io.StringIO()
+    OutputWriter(stream, output_format).write(output)
+    return stream.getvalue()
+
+def old_drift_repr(drift):
+    lines = [f'{drift._scan_ids[0]}: {drift._scans[0]._stats}']
+    for scan_id, scan, (introduced, fixed) in zip(drift._scan_ids[1:], drift._scans[1:], drift._transitions):
+        lines.append(f'{scan_id}: {scan._stats} introduced: {introduced} fixed: {fixed}')
+    lines.append('---- Drift ----\n')
+    lines.append(
+        f'introduced: {sum(t[0] for t in drift._transitions)} '
+        f'fixed: {sum(t[1] for t in drift._transitions)} '
+        f'flapping: {len(drift._flapping)}'
+    )
+    for rule, (introduced, fixed) in sorted(drift._rule_changes.items()):
+        lines.append(f'\nRule: {rule}\nIntroduced: {" ".join(introduced)}\nFixed: {" ".join(fixed)}')
+    return '\n'.join(lines)
+
+def test_text_output_is_unchanged(scans, drift):
+    old_repr = ''.join(str(rule) for rule in scans[0]) + '---- Stats ----\n\n' + str(scans[0]._stats)
+    assert repr(scans[0]) == old_repr
+    assert write(scans[0], 'text') == old_repr + '\n'
+    assert repr(drift) == old_drift_repr(drift)
+    assert write(drift, 'text') == old_drift_repr(drift) + '\n'
+    assert write(['a.txt', 'b.txt'], 'text') == 'a.txt\nb.txt\n'
+
+def test_json_output(scans, drift):
+    document = json.loads(write(scans[0], 'json'))
+    assert document == {
+        'stats': {'total': 2, 'pass': 1, 'fail': 1, 'notapplicable': 0},
+        'rules': [{'title': title, 'rule_id': rule_id, 'result': result} for title, rule_id, result in RULES]
+    }
+    comparison = json.loads(write(ScanResultComparison(scans[0], scans[1], 0, 1), 'json'))
+    assert (comparison['scan2']['pass'], comparison['introduced'], comparison['fixed']) == (2, 0, 1)
+    document = json.loads(write(drift, 'json'))
+    assert [scan['fixed'] for scan in document['scans']] == [None, 1]
+    assert document['rules'] == [{'rule_id': 'rule_2', 'introduced': [], 'fixed': ['b'], 'flapping': False}]
+    entries = [ScanHistoryEntry(f'{day}_xccdf_1', day, 'xccdf', '1', ScanStats(1, 1, 0, 2)) for day in ('2020-01-01', '2020-01-02')]
+    assert [entry['scan_id'] for entry in json.loads(write(entries, 'json'))] == ['2020-01-01_xccdf_1', '2020-01-02_xccdf_1']
+
+def test_jsonl_output(scans):
+    lines = write(scans[0], 'jsonl').splitlines()
+    assert [json.loads(line)['rule_id'] for line in lines] == ['rule_1', 'rule_2']
+    assert write(['a.txt', 'b.txt'], 'jsonl') == '"a.txt"\n"b.txt"\n'
+
+def test_csv_output(scans):
+    rows = list(csv.reader(io.StringIO(write(scans[0], 'csv'))))
+    assert rows == [['title', 'rule_id', 'result']] + [list(rule) for rule in RULES]
+    rows = list(csv.reader(io.StringIO(write(ScanResultComparison(scans[0], scans[1], 0, 1), 'csv'))))
+    assert rows[0][-2:] == ['introduced', 'fixed'] and rows[1][-2:] == ['0', '1']
+    assert write(['a.txt'], 'csv').splitlines() == ['value', 'a.txt']
+
+def test_print_stdout_format(capsys, scans):
+    action = PrintStdout({NEXT_ACTION: '', FORMAT: 'jsonl'})
+    action.execute({STDOUT_INPUT: scans[0]})
+    assert len(capsys.readouterr().out.splitlines()) == 2
+    # the format given with the command line overrides the config
+    action.execute({STDOUT_INPUT: scans[0], FORMAT: 'json'})
+    assert json.loads(capsys.readouterr().out)['stats']['total'] == 2
+    with pytest.raises(ActionError):
+        action.execute({STDOUT_INPUT: scans[0], FORMAT: 'xml'})
@@ -0,0 +1,60 @@
+import pytest
+
+from oscaptool.sample.actions import (
+    GetScanResult, read_scan_file,
+    NEXT_ACTION, SCAN_ID_KEY_NAME, OUTPUT_KEY_NAME, PATH, PARALLEL_PARSE, PARSE_WORKERS, PARSE_CHUNK_BYTES
+)
+from oscaptool.sample.util import FileHelper
+from oscaptool.tests import write_scan_file
+
+SCAN_ID = '2020-01-01_00:00:00_xccdf_1'
+
+@pytest.fixture
+def action(tmp_path):
+    return GetScanResult({
+        NEXT_ACTION: '', SCAN_ID_KEY_NAME: 'scan_id', OUTPUT_KEY_NAME: 'output', PATH: f'{tmp_path}/',
+        PARALLEL_PARSE: True, PARSE_WORKERS: 2, PARSE_CHUNK_BYTES: 4096
+    })
+
+def assert_same_scan_result(scan_result, expected):
+    assert list(scan_result.get_rule_tuples()) == list(expected.get_rule_tuples())
+    assert scan_result._stats.to_tuple() == expected._stats.to_tuple()
+    assert scan_result.get_content_hash() == expected.get_content_hash()
+
+@pytest.mark.parametrize('chunk_bytes', [4096, 1 << 30], ids=['ranges', 'whole file'])
+def test_parallel_parse_matches_sequential_parse(tmp_path, action, chunk_bytes):
+    action.config[PARSE_CHUNK_BYTES] = chunk_bytes
+    file_name = write_scan_file(f'{tmp_path}/{SCAN_ID}.txt', ['pass', 'fail', 'notapplicable', 'error'] * 500)
+    assert_same_scan_result(action.get_scan_result(SCAN_ID), read_scan_file(file_name))
+
+def test_rules_across_ranges_are_parsed_again(tmp_path, action, caplog):
+    # titles reading "Title" make the ranges start in the middle of rules
+    file_name = f'{tmp_path}/{SCAN_ID}.txt'
+    with open(file_name, 'w') as file_writer:
+        for index in range(2000):
+            file_writer.write(f'Title\nTitle\nRule\nrule_{index}\nResult\n{("pass", "fail")[index % 2]}\n')
+    scan_result = action.get_scan_result(SCAN_ID)
+    assert 'parsing it again' in caplog.text
+    assert len(scan_result) == 2000
+    assert_same_scan_result(scan_result, read_scan_file(file_name))
+
+def test_compressed_files_are_parsed_whole(tmp_path, action):
+    file_name = write_scan_file(f'{tmp_path}/plain.txt', ['pass', 'fail'] * 1000)
+    expected = read_scan_file(file_name)
+    expected_rules = list(expected.get_rule_tuples())
+    FileHelper.compress(file_name, f'{tmp_path}/{SCAN_ID}.txt.gz', 'gzip')
+    scan_result = action.get_scan_result(SCAN_ID)
+    assert list(scan_result.get_rule_tuples()) == expected_rules
+    assert scan_result._stats.to_tuple() == expected._stats.to_tuple()
+
+def test_parse_pool_is_shared(tmp_path, action):
+    other_action = GetScanResult(dict(action.config, **{PATH: f'{tmp_path}/other/'}))
+    assert other_action.get_parse_pool() is action.get_parse_pool()
+
+def test_other_results_keep_their_names(tmp_path, action):
+    # results oscap doesn't document, first seen by different workers
+    results = ['pass', 'weird', 'fail', 'odd'] * 500 + ['strange']
+    file_name = write_scan_file(f'{tmp_path}/{SCAN_ID}.txt', results)
+    scan_result = action.get_scan_result(SCAN_ID)
+    assert list(scan_result.get_result_names()) == results
+    assert_same_scan_result(scan_result, read_scan_file(file_name))
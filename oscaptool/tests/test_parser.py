@@ -0,0 +1,92 @@
+import re
+import time
+import tracemalloc
+
+from oscaptool.sample.actions import (
+    GetScanResult, ScanResultParser, ScanResult, ScanStats, Rule,
+    NEXT_ACTION, SCAN_ID_KEY_NAME, OUTPUT_KEY_NAME, PATH, PASS_SCAN_RESULT, FAIL_SCAN_RESULT, NA_SCAN_RESULT
+)
+from oscaptool.sample.util import FileHelper
+from oscaptool.tests import make_scan_output, write_scan_file
+
+SCAN_ID = '2020-01-01_00:00:00_xccdf_1'
+
+def read_scan_result_with_regex(file_name):
+    """The scan result parsing replaced by ScanResultParser: the whole file is read, split
+    in lines and searched three more times to count the results."""
+    scan_result_str = FileHelper.read(file_name)
+    state = 'find_title'
+    rules = []
+    for line in scan_result_str.split('\n'):
+        if state == 'find_title':
+            if line == 'Title':
+                state = 'grab_title'
+        elif state == 'grab_title':
+            title = line
+            state = 'find_rule'
+        elif state == 'find_rule':
+            if line == 'Rule':
+                state = 'grab_rule'
+        elif state == 'grab_rule':
+            rule = line
+            state = 'find_result'
+        elif state == 'find_result':
+            if line == 'Result':
+                state = 'grab_result'
+        elif state == 'grab_result':
+            rules.append(Rule(title.strip(), rule.strip(), line.strip()))
+            state = 'find_title'
+    pass_count = len(re.findall(PASS_SCAN_RESULT, scan_result_str))
+    fail_count = len(re.findall(FAIL_SCAN_RESULT, scan_result_str))
+    na_count = len(re.findall(NA_SCAN_RESULT, scan_result_str))
+    return ScanResult(rules, ScanStats(pass_count, fail_count, na_count, pass_count + fail_count + na_count))
+
+def measure(function, *args):
+    """Return the result, the run time and the peak memory of a function call."""
+    tracemalloc.start()
+    start_time = time.perf_counter()
+    result = function(*args)
+    elapsed_time = time.perf_counter() - start_time
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed_time, peak_memory
+
+def get_stats(parser):
+    return (parser.stats.pass_count, parser.stats.fail_count, parser.stats.na_count, parser.stats.total)
+
+def test_parse_counts_results_only():
+    parser = ScanResultParser()
+    rules = list(parser.parse(make_scan_output(['pass', 'fail', 'notapplicable', 'error', 'pass'])))
+    assert [rule._result for rule in rules] == ['pass', 'fail', 'notapplicable', 'error', 'pass']
+    assert rules[0]._title == 'Ensure pass and fail are not counted 0'
+    assert rules[0]._rule == 'xccdf_org.ssgproject.content_rule_pass_fail_0'
+    # the total only counts pass, fail and notapplicable results
+    assert get_stats(parser) == (2, 1, 1, 4)
+
+def test_parse_is_lazy():
+    parser = ScanResultParser()
+    rules = parser.parse(iter(make_scan_output(['pass', 'fail'])))
+    assert next(rules)._result == 'pass'
+    assert get_stats(parser) == (1, 0, 0, 1)
+
+def test_incomplete_rule_is_ignored():
+    parser = ScanResultParser()
+    assert len(list(parser.parse(make_scan_output(['pass', 'fail'])[:-3]))) == 1
+    assert parser.stats.total == 1
+
+def test_parse_benchmark(tmp_path):
+    results = ['pass', 'fail', 'notapplicable'] * 20000
+    file_name = write_scan_file(f'{tmp_path}/{SCAN_ID}.txt', results)
+    action = GetScanResult({NEXT_ACTION: '', SCAN_ID_KEY_NAME: 'scan_id', OUTPUT_KEY_NAME: 'output', PATH: f'{tmp_path}/'})
+
+    old_result, old_time, old_memory = measure(read_scan_result_with_regex, file_name)
+    scan_result, elapsed_time, peak_memory = measure(action.get_scan_result, SCAN_ID)
+    assert [rule._result for rule in scan_result] == [rule._result for rule in old_result] == results
+    # the regular expressions also count the results named in titles and rule ids
+    assert old_result._stats.total == 300000
+    assert scan_result._stats.total == 60000
+    # the file is never held in memory as a whole, nor as a list of lines
+    assert peak_memory < old_memory / 2
+    # loose bounds, only meant to catch a parser going back to several passes per file
+    assert elapsed_time < old_time * 3
+    assert len(results) / elapsed_time > 20000
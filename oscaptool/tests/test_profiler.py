@@ -0,0 +1,90 @@
+import sys
+import json
+import time
+import pstats
+
+import pytest
+
+from actionmanager.actions import Action
+from actionmanager.manager import ActionManager, WorkflowMetadata
+from actionmanager.profiler import ActionTiming, WorkflowProfiler, add_counter
+from oscaptool.sample.app import Client
+from oscaptool.tests import load_config, write_scan_file
+
+SCAN_ID = '2020-01-01_00:00:00_xccdf_1'
+
+class CounterStep(Action):
+    """A test action reporting counters."""
+    def __init__(self, config):
+        self.config = config
+
+    def execute(self, input_data):
+        add_counter('steps')
+        add_counter('items', 2.5)
+        input_data[ActionManager.NEXT_ACTION] = self.config.get(ActionManager.NEXT_ACTION, '')
+        return input_data
+
+def create_config(dag, executor=None):
+    step = {ActionManager.MODULE: __name__, ActionManager.CLASS: CounterStep.__name__}
+    if dag:
+        steps = {
+            ActionManager.INITIAL_ACTION: dict(step, **{ActionManager.DEPENDS_ON: [], ActionManager.CONFIG: {}}),
+            'second': dict(step, **{ActionManager.DEPENDS_ON: [ActionManager.INITIAL_ACTION], ActionManager.CONFIG: {}})
+        }
+        if executor:
+            steps['second'][ActionManager.EXECUTOR] = executor
+    else:
+        steps = {
+            ActionManager.INITIAL_ACTION: dict(step, **{ActionManager.CONFIG: {ActionManager.NEXT_ACTION: 'second'}}),
+            'second': dict(step, **{ActionManager.CONFIG: {}})
+        }
+    return {'workflows': {'profiled': steps}}
+
+def test_action_timing():
+    timing = ActionTiming('workflow', 'action')
+    with timing.measure():
+        add_counter('rules_parsed', 3)
+        add_counter('rules_parsed', 2)
+        time.sleep(0.05)
+    assert timing.counters == {'rules_parsed': 5}
+    assert timing.wall_time >= 0.05
+    assert 0 <= timing.cpu_time < timing.wall_time
+    report = timing.to_dict()
+    assert (report['workflow_id'], report['action_name']) == ('workflow', 'action')
+    # counters outside a measured action are ignored
+    add_counter('rules_parsed', 1)
+    assert timing.counters == {'rules_parsed': 5}
+
+@pytest.mark.parametrize('dag, executor', [(False, None), (True, None), (True, ActionManager.PROCESS_EXECUTOR)])
+def test_every_action_is_measured(dag, executor):
+    profiler = WorkflowProfiler()
+    ActionManager(create_config(dag, executor)).run_workflow(WorkflowMetadata('profiled', {}), profiler)
+    report = profiler.get_report()
+    actions = report['actions']
+    assert [action['action_name'] for action in actions] == [ActionManager.INITIAL_ACTION, 'second']
+    for action in actions:
+        assert action['workflow_id'] == 'profiled'
+        assert action['counters'] == {'steps': 1, 'items': 2.5}
+        assert action['wall_time'] <= report['wall_time']
+        # the peak only grows if the action uses more memory than anything before it
+        assert action['peak_rss_delta'] is None or action['peak_rss_delta'] >= 0
+
+def test_profile_options(tmp_path, monkeypatch, capsys):
+    (tmp_path / 'scan_results').mkdir()
+    write_scan_file(f'{tmp_path}/scan_results/{SCAN_ID}.txt', ['pass', 'fail'])
+    dump_file = str(tmp_path / 'oscaptool.prof')
+    monkeypatch.setattr(sys, 'argv', ['oscaptool', '--profile', '--profile-dump', dump_file, 'show', '--scan-id', SCAN_ID])
+    Client(load_config(tmp_path)).run()
+    captured = capsys.readouterr()
+    assert 'total: 2 pass: 1 fail: 1' in captured.out
+    report = json.loads(captured.err)
+    assert [action['action_name'] for action in report['actions']][0] == ActionManager.INITIAL_ACTION
+    assert sum(action['counters'].get('rules_parsed', 0) for action in report['actions']) == 2
+    assert pstats.Stats(dump_file).total_calls > 0
+
+def test_profile_option_is_not_the_scan_profile(tmp_path):
+    parsed_args = Client(load_config(tmp_path))._args_parser.parse([
+        'scan', 'xccdf', '1', '--profile', 'standard', '--results', 'r', '--cpe-dict', 'c', '--scap-xccdf', 'x'
+    ])
+    assert parsed_args['profile'] == 'standard'
+    assert not parsed_args['profile_actions']
@@ -0,0 +1,68 @@
+import os
+
+import pytest
+
+from oscaptool.sample.actions import (
+    ReindexScanResults, GetScanResult,
+    NEXT_ACTION, PATH, OUTPUT_KEY_NAME, SCAN_ID_KEY_NAME, STORE, HISTORY_INDEX, KEYFRAME_INTERVAL, WORKERS, CHUNK_SIZE
+)
+from oscaptool.sample.store import ScanStore
+from oscaptool.sample.history import ScanHistoryIndex
+from oscaptool.sample.util import FileHelper
+from oscaptool.tests import write_scan_file
+from actionmanager.actions import ActionError
+
+RESULTS = [['pass', 'fail', 'pass'], ['fail', 'fail', 'pass'], ['pass', 'pass', 'pass']]
+
+@pytest.fixture
+def config(tmp_path):
+    return {
+        NEXT_ACTION: '', OUTPUT_KEY_NAME: 'output', PATH: f'{tmp_path}/', STORE: f'{tmp_path}/store/scans.db',
+        HISTORY_INDEX: f'{tmp_path}/store/history.db', KEYFRAME_INTERVAL: 16
+    }
+
+@pytest.fixture
+def scan_ids(tmp_path):
+    scan_ids = [f'2020-0{month}-01_00:00:00_xccdf_1' for month in range(1, 7)]
+    for scan_id, results in zip(scan_ids, RESULTS * 2):
+        write_scan_file(f'{tmp_path}/{scan_id}.txt', results)
+    # a compressed scan, two archived scans and a file that can't be read
+    FileHelper.compress(f'{tmp_path}/{scan_ids[2]}.txt', f'{tmp_path}/{scan_ids[2]}.txt.gz', 'gzip')
+    for scan_id in scan_ids[:2]:
+        FileHelper.add_to_archive(
+            f'{tmp_path}/archive/{scan_id[:7]}.zip', [(f'{scan_id}.txt', f'{tmp_path}/{scan_id}.txt')], 'gzip'
+        )
+        os.remove(f'{tmp_path}/{scan_id}.txt')
+    (tmp_path / '2020-07-01_00:00:00_xccdf_1.txt.gz').write_bytes(b'\x1f\x8b\x07' + bytes(16))
+    return scan_ids
+
+def reindex(config, **input_data):
+    return ReindexScanResults(config).execute(input_data)['output']
+
+@pytest.mark.parametrize('workers, chunk_size', [(1, 16), (2, 1), (2, 4)])
+def test_reindex_rebuilds_store_and_index(tmp_path, config, scan_ids, workers, chunk_size):
+    store = ScanStore(config[STORE])
+    store.save_scan('2019-01-01_00:00:00_xccdf_1', [('Title', 'rule', 'pass')], (1, 0, 0, 1))
+    output = reindex(config, **{WORKERS: str(workers), CHUNK_SIZE: str(chunk_size)})
+    assert output.startswith('reindexed scans: 6 failed: 1 rules: 18 ')
+
+    # scans that are gone are not in the new store, the others are delta encoded again
+    assert store.get_scan_ids() == scan_ids
+    with store.connect() as connection:
+        assert connection.execute('SELECT COUNT(*) FROM scans WHERE base IS NULL').fetchone()[0] == 1
+    action = GetScanResult({NEXT_ACTION: '', SCAN_ID_KEY_NAME: 'scan_id', OUTPUT_KEY_NAME: 'output', PATH: config[PATH]})
+    for scan_id in scan_ids:
+        assert store.get_rules(scan_id) == list(action.parse_scan_file(scan_id).get_rule_tuples())
+
+    entries = ScanHistoryIndex(config[HISTORY_INDEX]).query()
+    assert [entry[:2] for entry in entries] == [
+        (scan_ids[0], 'archive/2020-01.zip'), (scan_ids[1], 'archive/2020-02.zip'), (scan_ids[2], f'{scan_ids[2]}.txt.gz')
+    ] + [(scan_id, f'{scan_id}.txt') for scan_id in scan_ids[3:]]
+    assert [entry[5:] for entry in entries] == [(2, 1, 0, 3), (1, 2, 0, 3), (3, 0, 0, 3)] * 2
+    assert sorted(os.listdir(f'{tmp_path}/store')) == ['history.db', 'scans.db']
+
+def test_invalid_options(config, scan_ids):
+    with pytest.raises(ActionError):
+        reindex(config, **{WORKERS: 'all'})
+    with pytest.raises(ActionError):
+        ReindexScanResults({NEXT_ACTION: '', OUTPUT_KEY_NAME: 'output', PATH: config[PATH]})
@@ -0,0 +1,129 @@
+import tracemalloc
+from xml.etree import ElementTree
+
+import pytest
+
+from oscaptool.sample.actions import (
+    IngestResultsFile, ScanResultParser, ScanResult, ScanStats,
+    NEXT_ACTION, RESULTS_KEY_NAME, CMD_STDOUT, PARSED_SCAN_RESULT
+)
+from oscaptool.sample.results import ResultsFileParser
+from actionmanager.actions import ActionError
+
+XCCDF_RULES = '''
+<xccdf:Benchmark id="benchmark">
+  <xccdf:Rule id="rule_1" severity="high"><xccdf:title>First
+    rule</xccdf:title></xccdf:Rule>
+  <xccdf:Rule id="rule_2"><xccdf:title>Second rule</xccdf:title></xccdf:Rule>
+  <xccdf:Rule id="rule_3"><xccdf:title>Third rule</xccdf:title></xccdf:Rule>
+</xccdf:Benchmark>
+'''
+XCCDF_TEST_RESULT = '''
+<xccdf:TestResult id="test_result">
+  <xccdf:rule-result idref="rule_1"><xccdf:result>fail</xccdf:result></xccdf:rule-result>
+  <xccdf:rule-result idref="rule_2" severity="low"><xccdf:result>pass</xccdf:result></xccdf:rule-result>
+  <xccdf:rule-result idref="rule_3"><xccdf:result>notselected</xccdf:result></xccdf:rule-result>
+</xccdf:TestResult>
+'''
+OVAL_DEFINITIONS = '''
+<oval-def:oval_definitions><oval-def:definitions>
+  <oval-def:definition id="oval:def:1" class="compliance">
+    <oval-def:metadata><oval-def:title>Compliance check</oval-def:title></oval-def:metadata>
+  </oval-def:definition>
+  <oval-def:definition id="oval:def:2" class="vulnerability">
+    <oval-def:metadata><oval-def:title>Vulnerability check</oval-def:title>
+    <oval-def:advisory><oval-def:severity>Critical</oval-def:severity></oval-def:advisory></oval-def:metadata>
+  </oval-def:definition>
+</oval-def:definitions></oval-def:oval_definitions>
+'''
+OVAL_RESULTS = '''
+<oval-res:results><oval-res:system><oval-res:definitions>
+  <oval-res:definition definition_id="oval:def:1" result="true"/>
+  <oval-res:definition definition_id="oval:def:2" result="true"/>
+</oval-res:definitions></oval-res:system></oval-res:results>
+'''
+NAMESPACES = (
+    'xmlns:xccdf="http://checklists.nist.gov/xccdf/1.2" '
+    'xmlns:oval-def="http://oval.mitre.org/XMLSchema/oval-definitions-5" '
+    'xmlns:oval-res="http://oval.mitre.org/XMLSchema/oval-results-5" '
+    'xmlns:arf="http://scap.nist.gov/schema/asset-reporting-format/1.1"'
+)
+XCCDF_FILE = XCCDF_RULES.replace('</xccdf:Benchmark>', f'{XCCDF_TEST_RESULT}</xccdf:Benchmark>').replace(
+    '<xccdf:Benchmark ', f'<xccdf:Benchmark {NAMESPACES} ', 1
+)
+OVAL_FILE = f'<oval-res:oval_results {NAMESPACES}>{OVAL_DEFINITIONS}{OVAL_RESULTS}</oval-res:oval_results>'
+# the reports of an ARF file include the OVAL results of the checks behind the rules
+ARF_FILE = f'''<arf:asset-report-collection {NAMESPACES}>
+  <arf:report-requests><arf:report-request id="request"><arf:content>
+    {XCCDF_RULES}{OVAL_DEFINITIONS}
+  </arf:content></arf:report-request></arf:report-requests>
+  <arf:reports>
+    <arf:report id="oval0"><arf:content><oval-res:oval_results>{OVAL_RESULTS}</oval-res:oval_results></arf:content></arf:report>
+    <arf:report id="xccdf1"><arf:content>{XCCDF_TEST_RESULT}</arf:content></arf:report>
+  </arf:reports>
+</arf:asset-report-collection>
+'''
+XCCDF_RESULTS = [('First rule', 'rule_1', 'fail', 'high'), ('Second rule', 'rule_2', 'pass', 'low')]
+
+def write_results_file(tmp_path, content):
+    filename = str(tmp_path / 'results.xml')
+    with open(filename, 'w') as file_writer:
+        file_writer.write(f'<?xml version="1.0"?>\n{content}')
+    return filename
+
+@pytest.mark.parametrize('content', [XCCDF_FILE, ARF_FILE], ids=['xccdf', 'arf'])
+def test_xccdf_results(tmp_path, content):
+    assert list(ResultsFileParser().parse(write_results_file(tmp_path, content))) == XCCDF_RESULTS
+
+def test_oval_results(tmp_path):
+    assert list(ResultsFileParser().parse(write_results_file(tmp_path, OVAL_FILE))) == [
+        ('Compliance check', 'oval:def:1', 'pass', 'unknown'),
+        ('Vulnerability check', 'oval:def:2', 'fail', 'critical')
+    ]
+
+def test_ingested_output_matches_results(tmp_path):
+    action = IngestResultsFile({NEXT_ACTION: 'next', RESULTS_KEY_NAME: 'results'})
+    output = action.execute({'results': write_results_file(tmp_path, ARF_FILE)})
+    assert output[NEXT_ACTION] == 'next'
+    assert [rule[:3] for rule in XCCDF_RESULTS] == list(output[PARSED_SCAN_RESULT].get_rule_tuples())
+    # the output is created lazily, in the format of oscap's output
+    assert iter(output[CMD_STDOUT]) is output[CMD_STDOUT]
+    lines = ''.join(output[CMD_STDOUT]).splitlines()
+    parser = ScanResultParser()
+    assert [rule[:3] for rule in XCCDF_RESULTS] == list(ScanResult(parser.parse(lines), parser.stats).get_rule_tuples())
+
+def test_unreadable_results_file(tmp_path):
+    action = IngestResultsFile({NEXT_ACTION: 'next', RESULTS_KEY_NAME: 'results'})
+    missing = str(tmp_path / 'missing.xml')
+    scan_result = ScanResult([], ScanStats(0, 0, 0, 0))
+    scan_result.add_rule('First rule', 'rule_1', 'fail')
+    # the scan result parsed while the command ran is used when the output wasn't captured
+    output = action.execute({'results': missing, PARSED_SCAN_RESULT: scan_result})
+    assert output[PARSED_SCAN_RESULT] is scan_result
+    assert ''.join(output[CMD_STDOUT]) == ''.join(scan_result.get_output_lines())
+    output = action.execute({'results': missing, CMD_STDOUT: ['output\n']})
+    assert output[CMD_STDOUT] == ['output\n']
+    with pytest.raises(ActionError):
+        action.execute({'results': missing})
+    with pytest.raises(ActionError):
+        action.execute({'results': write_results_file(tmp_path, '<xccdf:Benchmark')})
+
+def test_results_file_is_parsed_incrementally(tmp_path):
+    rules = ''.join(
+        f'<xccdf:Rule id="rule_{index}"><xccdf:title>Rule {index}</xccdf:title></xccdf:Rule>' for index in range(20000)
+    )
+    results = ''.join(
+        f'<xccdf:rule-result idref="rule_{index}"><xccdf:result>pass</xccdf:result></xccdf:rule-result>'
+        for index in range(20000)
+    )
+    filename = write_results_file(
+        tmp_path, f'<xccdf:Benchmark {NAMESPACES}>{rules}<xccdf:TestResult>{results}</xccdf:TestResult></xccdf:Benchmark>'
+    )
+    peak_memory = {}
+    for name, parse in (('tree', ElementTree.parse), ('parser', lambda filename: list(ResultsFileParser().parse(filename)))):
+        tracemalloc.start()
+        parse(filename)
+        peak_memory[name] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    # only the titles and the rules found so far are kept, not the elements
+    assert peak_memory['parser'] < peak_memory['tree'] / 2
@@ -0,0 +1,163 @@
+import os
+import sqlite3
+import concurrent.futures
+
+import pytest
+
+from oscaptool.sample.actions import (
+    QueryRuleResults, SaveScanResult,
+    NEXT_ACTION, OUTPUT_KEY_NAME, PATH, STORE, RULE_INDEX, SCAN_ID, CMD_STDOUT
+)
+from oscaptool.sample.rules import RuleIndex
+from oscaptool.sample.store import ScanStore
+from oscaptool.tests import make_scan_output
+from actionmanager.actions import ActionError
+
+SCANS = [
+    ('2020-01-01_00:00:00_xccdf_1', [('SSH root login', 'rule_ssh_root', 'fail'), ('SSH 50% keys', 'rule_ssh_keys', 'pass'), ('Audit', 'rule_audit', 'fail')]),
+    ('2020-01-01_00:00:00_oval_1', [('SSH root login', 'rule_ssh_root', 'pass')]),
+    ('2020-01-02_12:00:00_xccdf_1', [('SSH root login', 'rule_ssh_root', 'fail'), ('SSH 50% keys', 'rule_ssh_keys', 'fail'), ('Audit', 'rule_audit', 'fail')]),
+    ('2020-01-03_00:00:00_xccdf_1', [('Root SSH login', 'rule_ssh_root', 'pass'), ('SSH 50% keys', 'rule_ssh_keys', 'fail')]),
+]
+
+@pytest.fixture
+def index(tmp_path):
+    rule_index = RuleIndex(f'{tmp_path}/store/rules.db')
+    rule_index.add_scans(SCANS)
+    return rule_index
+
+def get_results(rows):
+    return [(rule_id, scan_id[:10], result) for rule_id, _, scan_id, result in rows]
+
+def test_rule_history(index):
+    # scans sort by timestamp, then in the order they were added; titles are the latest ones
+    assert index.query(rule_id='rule_ssh_root') == [
+        ('rule_ssh_root', 'Root SSH login', '2020-01-01_00:00:00_xccdf_1', 'fail'),
+        ('rule_ssh_root', 'Root SSH login', '2020-01-01_00:00:00_oval_1', 'pass'),
+        ('rule_ssh_root', 'Root SSH login', '2020-01-02_12:00:00_xccdf_1', 'fail'),
+        ('rule_ssh_root', 'Root SSH login', '2020-01-03_00:00:00_xccdf_1', 'pass'),
+    ]
+    assert index.query(rule_id='rule_ssh_root', limit=1) == index.query(rule_id='rule_ssh_root')[:1]
+    assert index.query(rule_id='missing') == []
+
+@pytest.mark.parametrize('filters, expected', [
+    ({'prefix': 'rule_ssh', 'result': 'fail'}, [
+        ('rule_ssh_keys', '2020-01-02', 'fail'), ('rule_ssh_keys', '2020-01-03', 'fail'),
+        ('rule_ssh_root', '2020-01-01', 'fail'), ('rule_ssh_root', '2020-01-02', 'fail'),
+    ]),
+    ({'pattern': '_(audit|keys)$', 'since': '2020-01-02'}, [
+        ('rule_audit', '2020-01-02', 'fail'), ('rule_ssh_keys', '2020-01-02', 'fail'), ('rule_ssh_keys', '2020-01-03', 'fail'),
+    ]),
+    # the title is a plain case insensitive substring, wildcards included
+    ({'title': '50%', 'until': '2020-01-01'}, [('rule_ssh_keys', '2020-01-01', 'pass')]),
+    ({'title': 'root ssh', 'scan_type': 'oval'}, [('rule_ssh_root', '2020-01-01', 'pass')]),
+    ({'scan_type': 'xccdf', 'scan_subtype': '1', 'since': '2020-01-03'}, [
+        ('rule_ssh_keys', '2020-01-03', 'fail'), ('rule_ssh_root', '2020-01-03', 'pass'),
+    ]),
+])
+def test_filters(index, filters, expected):
+    assert get_results(index.query(**filters)) == expected
+
+def test_last_result(index):
+    assert get_results(index.query(result='fail', last=True)) == [
+        ('rule_audit', '2020-01-02', 'fail'), ('rule_ssh_keys', '2020-01-03', 'fail'), ('rule_ssh_root', '2020-01-02', 'fail'),
+    ]
+    assert get_results(index.query(prefix='rule_ssh', last=True, scan_type='oval')) == [('rule_ssh_root', '2020-01-01', 'pass')]
+
+def test_every_scan(index):
+    # rules failing in every scan that evaluated them
+    assert index.query(result='fail', every=True) == [
+        ('rule_audit', 'Audit', 'fail', 2, '2020-01-01_00:00:00_xccdf_1', '2020-01-02_12:00:00_xccdf_1'),
+    ]
+    assert [row[0] for row in index.query(result='fail', every=True, since='2020-01-02')] == ['rule_audit', 'rule_ssh_keys']
+
+def test_scans_are_replaced_and_removed(index):
+    index.add_scan(SCANS[0][0], [('Audit', 'rule_audit', 'pass')])
+    assert get_results(index.query(since=SCANS[0][0], until=SCANS[0][0])) == [('rule_audit', '2020-01-01', 'pass')]
+    index.remove_scans([SCANS[0][0], SCANS[2][0], 'missing'])
+    assert index.get_scan_ids() == {SCANS[1][0], SCANS[3][0]}
+    assert index.query(rule_id='rule_audit') == []
+
+def test_concurrent_scans(tmp_path):
+    # scans of the same second with the same new rules, e.g. from a batch
+    def add_scans(worker):
+        for scan in range(20):
+            RuleIndex(f'{tmp_path}/rules.db').add_scan(
+                f'2020-01-01_00:00:00_xccdf_{worker}_{scan}', [('Title', f'rule_{scan}_{rule}', 'pass') for rule in range(10)]
+            )
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(add_scans, range(4)))
+    index = RuleIndex(f'{tmp_path}/rules.db')
+    assert len(index.get_scan_ids()) == 80
+    assert len(index.query(prefix='rule_0_')) == 40
+
+def test_schema_is_set_up_once(tmp_path, monkeypatch):
+    file_name = f'{tmp_path}/rules.db'
+    RuleIndex(file_name)
+    connections = []
+    connect = RuleIndex.connect
+    monkeypatch.setattr(RuleIndex, 'connect', lambda self: connections.append(self) or connect(self))
+    RuleIndex(file_name)
+    assert connections == []
+    # a removed file is set up again
+    os.remove(file_name)
+    RuleIndex(file_name)
+    assert len(connections) == 1
+    assert RuleIndex(file_name).get_scan_ids() == set()
+
+def get_table_sql(file_name):
+    connection = sqlite3.connect(file_name)
+    try:
+        return dict(connection.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table'"))
+    finally:
+        connection.close()
+
+def test_schema_works_with_sqlite_3_7_17(index):
+    # WITHOUT ROWID tables need SQLite 3.8.2, older than the 3.7.17 of RHEL 7
+    assert not [sql for sql in get_table_sql(index.filename).values() if 'WITHOUT ROWID' in sql.upper()]
+
+def test_without_rowid_results_are_migrated(tmp_path, monkeypatch):
+    file_name = f'{tmp_path}/rules.db'
+    RuleIndex(file_name)
+    connection = sqlite3.connect(file_name)
+    with connection:
+        connection.executescript(
+            'DROP TABLE results; CREATE TABLE results (rule INTEGER NOT NULL, result TEXT NOT NULL, '
+            'scan INTEGER NOT NULL, PRIMARY KEY (rule, result, scan)) WITHOUT ROWID; '
+            'CREATE INDEX results_scan ON results(scan, rule);'
+        )
+    connection.close()
+    RuleIndex(file_name).add_scans(SCANS)
+    # the results are copied the next time the file is opened by a process
+    monkeypatch.setattr(RuleIndex, '_initialized', set())
+    index = RuleIndex(file_name)
+    assert 'WITHOUT ROWID' not in get_table_sql(file_name)['results'].upper()
+    assert 'old_results' not in get_table_sql(file_name)
+    assert len(index.query(rule_id='rule_ssh_root')) == 4
+
+@pytest.fixture
+def config(tmp_path):
+    return {NEXT_ACTION: '', OUTPUT_KEY_NAME: 'output', RULE_INDEX: f'{tmp_path}/store/rules.db', STORE: f'{tmp_path}/store/scans.db'}
+
+def test_query_backfills_from_the_store(config):
+    store = ScanStore(config[STORE])
+    for scan_id, rules in SCANS:
+        store.save_scan(scan_id, rules, (0, 0, 0, 0))
+    action = QueryRuleResults(config)
+    output = action.execute({'rule_id': 'rule_audit', 'result': 'fail', 'last': True})['output']
+    assert [(entry.rule_id, entry.scan_id) for entry in output] == [('rule_audit', SCANS[2][0])]
+    # the store is only added once
+    store.remove_scans([SCANS[2][0]])
+    assert len(action.execute({'rule_id': 'rule_audit'})['output']) == 2
+
+def test_saved_scans_are_indexed(tmp_path, config):
+    SaveScanResult({NEXT_ACTION: '', PATH: f'{tmp_path}/', RULE_INDEX: config[RULE_INDEX]}).execute(
+        {SCAN_ID: SCANS[0][0], CMD_STDOUT: [f'{line}\n' for line in make_scan_output(['pass', 'fail'])]}
+    )
+    assert [row[3] for row in RuleIndex(config[RULE_INDEX]).query()] == ['pass', 'fail']
+
+@pytest.mark.parametrize('input_data', [{'every': True}, {'regex': '('}, {'limit': 'all'}])
+def test_invalid_filters(config, input_data):
+    with pytest.raises(ActionError):
+        QueryRuleResults(config).execute(input_data)
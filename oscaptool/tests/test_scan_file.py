@@ -0,0 +1,115 @@
+import os
+import time
+import pickle
+import random
+import tracemalloc
+
+import pytest
+
+from oscaptool.sample.actions import ScanResultParser, ScanResult, MappedTitles, StringColumn, StringTable, read_scan_file
+from oscaptool.sample.util import FileHelper
+from oscaptool.tests import write_scan_file
+from actionmanager.actions import ActionError
+
+TOKENS = ['Title', 'Rule', 'Result', 'Ident', ' x ', 'Ensure Rule', 'Title ', 'pass', 'fail', '  notapplicable ', 'Rule\tx', 'é title', '']
+SEPARATORS = ['\n', '\r', '\r\n', '\n\n', '\r\r\n']
+MB = 1024 * 1024
+# the larger files take minutes to write and parse, they only run when asked for
+LARGE_BENCHMARKS = 'OSCAPTOOL_LARGE_BENCHMARKS'
+RULE_BLOCK = 'Title\r\tEnsure rule {index} passes\nRule\r\txccdf_org.ssgproject.content_rule_{index}\nIdent\r\tCCE-{index}\nResult\r\t{result}\n\n'
+
+def read_scan_file_by_lines(file_name):
+    """The parsing replaced by read_scan_file for plain files: the file is decoded and split
+    into lines, titles included."""
+    parser = ScanResultParser()
+    return ScanResult(parser.parse(FileHelper.read_lines(file_name)), parser.stats)
+
+def write_random_scan_file(file_name, generator):
+    parts = []
+    for _ in range(generator.randint(0, 30)):
+        parts += [generator.choice(TOKENS), generator.choice(SEPARATORS)]
+    if parts and generator.random() < 0.5:
+        parts.pop()
+    with open(file_name, 'w', newline='', encoding='utf-8') as file_writer:
+        file_writer.write(''.join(parts))
+
+def test_mapped_parse_matches_line_parse(tmp_path):
+    generator = random.Random(1)
+    for index in range(500):
+        file_name = f'{tmp_path}/{index}.txt'
+        write_random_scan_file(file_name, generator)
+        expected = read_scan_file_by_lines(file_name)
+        scan_result = read_scan_file(file_name)
+        assert list(scan_result.get_rule_tuples()) == list(expected.get_rule_tuples()), index
+        assert scan_result._stats.to_tuple() == expected._stats.to_tuple()
+
+def test_titles_are_read_from_the_file(tmp_path):
+    file_name = write_scan_file(f'{tmp_path}/scan.txt', ['pass', 'fail', 'error'])
+    scan_result = read_scan_file(file_name)
+    assert isinstance(scan_result._titles, MappedTitles)
+    assert scan_result._titles[1] == 'Ensure pass and fail are not counted 1'
+    # the offsets can be sent to another process
+    copy = pickle.loads(pickle.dumps(scan_result))
+    assert list(copy.get_rule_tuples()) == list(read_scan_file_by_lines(file_name).get_rule_tuples())
+    # titles can't be read once the file changed
+    with open(file_name, 'a') as file_writer:
+        file_writer.write('\n' * 100)
+    with pytest.raises(ActionError):
+        list(scan_result.get_rule_tuples())
+
+def test_empty_and_compressed_files_are_parsed_by_lines(tmp_path):
+    (tmp_path / 'empty.txt').write_text('')
+    assert len(read_scan_file(f'{tmp_path}/empty.txt')) == 0
+    file_name = write_scan_file(f'{tmp_path}/scan.txt', ['pass', 'fail'])
+    expected = read_scan_file_by_lines(file_name)
+    FileHelper.compress(file_name, f'{file_name}.gz', 'gzip')
+    scan_result = read_scan_file(f'{file_name}.gz')
+    assert not isinstance(scan_result._titles, MappedTitles)
+    assert list(scan_result.get_rule_tuples()) == list(expected.get_rule_tuples())
+
+def write_sized_scan_file(file_name, size):
+    """Write a scan result file of about size bytes, a chunk of rules at a time."""
+    results = ['pass', 'fail', 'notapplicable']
+    index = 0
+    with open(file_name, 'w') as file_writer:
+        while file_writer.tell() < size:
+            file_writer.write(''.join(
+                RULE_BLOCK.format(index=index + offset, result=results[(index + offset) % 3]) for offset in range(1000)
+            ))
+            index += 1000
+    return file_name
+
+def measure(function, *args):
+    """Return the result, the run time and the traced peak memory of a function call. The
+    memory is traced on the first call, which adds the rule ids (and titles) to the string
+    table, and the time is measured on a second call without tracing, which slows the
+    parsers down unevenly."""
+    tracemalloc.start()
+    result = function(*args)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    start_time = time.perf_counter()
+    function(*args)
+    elapsed_time = time.perf_counter() - start_time
+    return result, elapsed_time, peak_memory
+
+@pytest.mark.parametrize('size', [
+    1 * MB,
+    pytest.param(100 * MB, marks=pytest.mark.skipif(LARGE_BENCHMARKS not in os.environ, reason=f'set {LARGE_BENCHMARKS}')),
+    pytest.param(1024 * MB, marks=pytest.mark.skipif(LARGE_BENCHMARKS not in os.environ, reason=f'set {LARGE_BENCHMARKS}')),
+])
+def test_mapped_parse_benchmark(tmp_path, monkeypatch, size):
+    # each parser starts with an empty string table
+    file_name = write_sized_scan_file(f'{tmp_path}/scan.txt', size)
+    monkeypatch.setattr(StringColumn, '_table', StringTable())
+    old_result, old_time, old_memory = measure(read_scan_file_by_lines, file_name)
+    old_content_hash = old_result.get_content_hash()
+    monkeypatch.setattr(StringColumn, '_table', StringTable())
+    scan_result, elapsed_time, peak_memory = measure(read_scan_file, file_name)
+    assert scan_result._stats.to_tuple() == old_result._stats.to_tuple()
+    assert scan_result.get_content_hash() == old_content_hash
+    # titles are kept as offsets and the mapped pages aren't traced: only the rule ids are
+    # added to the string table (about 0.58 of the memory of the line parse)
+    assert peak_memory < old_memory * 0.7
+    # a loose bound, the gain only shows on large files
+    assert elapsed_time < old_time * 1.5
@@ -0,0 +1,127 @@
+import time
+import pickle
+import tracemalloc
+
+from oscaptool.sample.actions import (
+    CompareScanResults, ScanResultParser, ScanResult, ScanStats, Rule, StringColumn, StringTable,
+    RESULT_NAMES, OTHER_CODE, NEXT_ACTION, SCAN_RESULT_1_KEY_NAME, SCAN_RESULT_2_KEY_NAME, OUTPUT_KEY_NAME
+)
+from oscaptool.tests import make_scan_output
+
+class DictRule:
+    """The rule representation replaced by the scan result columns, one object with a
+    __dict__ per rule."""
+    def __init__(self, title, rule, result):
+        self._title = title
+        self._rule = rule
+        self._result = result
+
+def compare_rule_lists(oldest_rules, newest_rules):
+    """The comparison replaced by the scan result columns, working on lists of rule objects."""
+    fixed_count = 0
+    introduced_count = 0
+    newest_scan_rules_result = {rule._rule: rule._result for rule in newest_rules}
+    for rule in oldest_rules:
+        if rule._result == 'pass':
+            if newest_scan_rules_result.get(rule._rule) == 'fail':
+                introduced_count += 1
+        elif rule._result == 'fail':
+            if newest_scan_rules_result.get(rule._rule, 'pass') == 'pass':
+                fixed_count += 1
+    return introduced_count, fixed_count
+
+def create_scan_result(rules):
+    scan_result = ScanResult([], ScanStats(0, 0, 0, 0))
+    for title, rule, result in rules:
+        scan_result.add_rule(title, rule, result)
+        scan_result._stats.add(result)
+    return scan_result
+
+def compare(oldest_scan, newest_scan):
+    action = CompareScanResults({
+        NEXT_ACTION: '', SCAN_RESULT_1_KEY_NAME: 'scan_1', SCAN_RESULT_2_KEY_NAME: 'scan_2', OUTPUT_KEY_NAME: 'output'
+    })
+    comparison = action.execute({'scan_1': oldest_scan, 'scan_2': newest_scan})['output']
+    return comparison._introduced, comparison._fixed
+
+def measure(function, *args):
+    """Return the result, the run time and the memory still allocated by a function call. The
+    memory is traced on the first call, which adds the strings to the string table, and the
+    time is measured on a second call without tracing."""
+    tracemalloc.start()
+    result = function(*args)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    start_time = time.perf_counter()
+    function(*args)
+    elapsed_time = time.perf_counter() - start_time
+    return result, elapsed_time, memory
+
+def test_rules_round_trip():
+    rules = [('First rule', 'rule_1', 'pass'), ('Second rule', 'rule_2', 'fixed'), ('Third rule', 'rule_3', 'weird')]
+    scan_result = create_scan_result(rules)
+    assert len(scan_result) == 3
+    assert list(scan_result.get_rule_tuples()) == rules
+    assert [(rule._title, rule._rule, rule._result) for rule in scan_result] == rules
+    assert not hasattr(next(iter(scan_result)), '__dict__')
+    # the columns are sent to other processes as strings
+    copy = pickle.loads(pickle.dumps(scan_result))
+    assert list(copy.get_rule_tuples()) == rules
+    assert copy.get_content_hash() == scan_result.get_content_hash()
+
+def test_other_results_are_kept_by_scan():
+    # results oscap doesn't document don't change the codes of other scans
+    first_scan = create_scan_result([('', 'rule_1', 'weird'), ('', 'rule_2', 'pass'), ('', 'rule_3', 'odd')])
+    second_scan = create_scan_result([('', 'rule_1', 'odd'), ('', 'rule_2', 'weird')])
+    assert list(first_scan.get_result_names()) == ['weird', 'pass', 'odd']
+    assert list(second_scan.get_result_names()) == ['odd', 'weird']
+    assert first_scan._results[0] == second_scan._results[0] == OTHER_CODE
+    assert len(RESULT_NAMES) == OTHER_CODE
+
+def test_repr_is_unchanged():
+    rules = [('First rule', 'rule_1', 'pass'), ('Second rule', 'rule_2', 'fail')]
+    expected = ''.join(str(Rule(*rule)) for rule in rules) + '---- Stats ----\n\n' + str(ScanStats(1, 1, 0, 2))
+    assert repr(create_scan_result(rules)) == expected
+
+def test_compare_counts():
+    oldest_scan = create_scan_result([
+        ('', 'introduced', 'pass'), ('', 'fixed', 'fail'), ('', 'removed', 'fail'), ('', 'same', 'fail'),
+        ('', 'not_applicable', 'pass')
+    ])
+    newest_scan = create_scan_result([
+        ('', 'introduced', 'fail'), ('', 'fixed', 'pass'), ('', 'same', 'fail'), ('', 'not_applicable', 'notapplicable'),
+        ('', 'added', 'fail')
+    ])
+    # a failing rule missing from the newest scan counts as fixed
+    assert compare(oldest_scan, newest_scan) == (1, 2)
+    assert compare(newest_scan, oldest_scan) == (1, 2)
+
+def load_dict_rules(lines):
+    parser = ScanResultParser()
+    return [DictRule(rule._title, rule._rule, rule._result) for rule in parser.parse(lines)]
+
+def load_scan_result(lines):
+    parser = ScanResultParser()
+    return ScanResult(parser.parse(lines), parser.stats)
+
+def test_scan_result_benchmark(monkeypatch):
+    # ten scans of the same 10000 rule profile, e.g. for a drift comparison; the strings are
+    # added to an empty string table, and only kept once for all the scans
+    monkeypatch.setattr(StringColumn, '_table', StringTable())
+    results = ['pass', 'fail', 'notapplicable', 'error'] * 2500
+    scans = [
+        make_scan_output(results[index:] + results[:index]) for index in range(10)
+    ]
+    dict_rules, dict_time, dict_memory = measure(lambda: [load_dict_rules(lines) for lines in scans])
+    scan_results, elapsed_time, memory = measure(lambda: [load_scan_result(lines) for lines in scans])
+    assert len(StringColumn._table) == 20000
+    for rules, scan_result in zip(dict_rules, scan_results):
+        assert list(scan_result.get_rule_tuples()) == [(rule._title, rule._rule, rule._result) for rule in rules]
+    assert memory < dict_memory * 0.3
+    # loose bounds, the columns are filled in the same single pass as the rule lists
+    assert elapsed_time < dict_time * 2
+
+    expected, dict_time, _ = measure(compare_rule_lists, *dict_rules[:2])
+    comparison, elapsed_time, _ = measure(compare, *scan_results[:2])
+    assert comparison == expected
+    assert elapsed_time < dict_time * 2
@@ -0,0 +1,129 @@
+import io
+import os
+import sys
+import signal
+import time
+import subprocess
+import concurrent.futures
+
+import pytest
+
+from actionmanager.actions import Action
+from actionmanager.manager import ActionManager, WorkflowMetadata, THREAD_STEP_HOOKS
+from oscaptool.sample.actions import GetScanResult
+from oscaptool.sample.server import Server, ThreadStdout, send_request, STATUS, OUTPUT, ERROR
+from oscaptool.tests import ROOT, write_scan_file, load_config
+
+SERVER_SCRIPT = '''
+import sys
+from oscaptool.sample.server import Server
+from oscaptool.tests import load_config
+try:
+    Server(sys.argv[1], load_config(sys.argv[2])['actionmanager']).serve_forever()
+except KeyboardInterrupt:
+    pass
+'''
+
+SCAN_IDS = ['2020-01-01_00:00:00_xccdf_1', '2020-01-02_00:00:00_xccdf_1']
+RESULTS = [['pass', 'fail', 'fail'], ['fail', 'pass', 'pass']]
+
+@pytest.fixture
+def socket_path(tmp_path):
+    (tmp_path / 'scan_results').mkdir()
+    for scan_id, results in zip(SCAN_IDS, RESULTS):
+        write_scan_file(f'{tmp_path}/scan_results/{scan_id}.txt', results)
+    socket_path = f'{tmp_path}/oscaptool.sock'
+    # a server process of its own, as it replaces the stdout
+    server = subprocess.Popen([sys.executable, '-c', SERVER_SCRIPT, socket_path, str(tmp_path)], cwd=ROOT)
+    try:
+        while not os.path.exists(socket_path):
+            assert server.poll() is None
+            time.sleep(0.05)
+        yield socket_path
+    finally:
+        # stopped like the serve command is, so the parse pool is stopped too
+        server.send_signal(signal.SIGINT)
+        assert server.wait() == 0
+
+def test_workflow_output_is_sent_back(socket_path):
+    response = send_request(socket_path, 'show-scan-result', {'scan_id': SCAN_IDS[0]})
+    assert response[STATUS] == 0
+    assert response[OUTPUT].endswith('total: 3 pass: 1 fail: 2 notapplicable: 0\n')
+
+def test_concurrent_requests_get_their_own_output(socket_path):
+    requests = [('show-scan-result', {'scan_id': scan_id}) for scan_id in SCAN_IDS] * 5
+    requests += [('comp-scan-results', {'scan-id-1': SCAN_IDS[0], 'scan-id-2': SCAN_IDS[1]})] * 5
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(requests)) as executor:
+        responses = list(executor.map(lambda request: send_request(socket_path, *request), requests))
+    assert [response[STATUS] for response in responses] == [0] * len(requests)
+    for (_, inputs), response in zip(requests, responses):
+        if 'scan_id' in inputs:
+            assert response[OUTPUT].count('---- Stats ----') == 1
+            assert f'fail: {RESULTS[SCAN_IDS.index(inputs["scan_id"])].count("fail")} ' in response[OUTPUT]
+        else:
+            assert response[OUTPUT].endswith('introduced: 1\nfixed: 2\n')
+
+def test_failed_requests(socket_path):
+    response = send_request(socket_path, 'show-scan-result', {'scan_id': 'missing'})
+    assert response[STATUS] == 1
+    assert 'missing' in response[ERROR]
+    response = send_request(socket_path, 'missing-workflow', {})
+    assert response[STATUS] == 1
+
+def test_client(socket_path):
+    command = [sys.executable, '-c', 'from oscaptool.sample.server import run_client; run_client()']
+    process = subprocess.run(
+        command + ['--socket', socket_path, 'show-scan-result', f'scan_id={SCAN_IDS[1]}'],
+        cwd=ROOT, stdout=subprocess.PIPE, universal_newlines=True
+    )
+    assert process.returncode == 0
+    assert process.stdout.endswith('total: 3 pass: 2 fail: 1 notapplicable: 0\n')
+    process = subprocess.run(
+        command + ['--socket', socket_path, 'show-scan-result', 'scan_id=missing'],
+        cwd=ROOT, stdout=subprocess.PIPE, universal_newlines=True
+    )
+    assert process.returncode == 1
+
+class PrintStep(Action):
+    """A test action printing its name."""
+    def __init__(self, config):
+        self.config = config
+
+    def execute(self, input_data):
+        print(self.config['name'])
+        return input_data
+
+def test_sinks_are_passed_to_step_threads(monkeypatch):
+    stdout = ThreadStdout(io.StringIO())
+    monkeypatch.setitem(THREAD_STEP_HOOKS, 'stdout', stdout)
+    monkeypatch.setattr(sys, 'stdout', stdout)
+    steps = {
+        name: {'module': __name__, 'class': PrintStep.__name__, 'depends_on': depends_on, 'config': {'name': name}}
+        for name, depends_on in [('initial_action', []), ('first', ['initial_action']), ('second', ['initial_action'])]
+    }
+    manager = ActionManager({'workflows': {'dag': steps}})
+
+    def run_workflow(index):
+        sink = io.StringIO()
+        stdout.set_thread_state(sink)
+        ActionManager(manager._config, manager._actions).run_workflow(WorkflowMetadata('dag', {}))
+        stdout.set_thread_state(None)
+        return sorted(sink.getvalue().split())
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        outputs = list(executor.map(run_workflow, range(20)))
+    assert outputs == [['first', 'initial_action', 'second']] * 20
+    # threads without a sink write to the original stdout
+    print('unsinked')
+    assert stdout._stdout.getvalue() == 'unsinked\n'
+
+def test_parse_pool_is_started_before_serving(tmp_path, monkeypatch):
+    monkeypatch.setattr(GetScanResult, '_parse_pool', None)
+    # the server registers its stdout as a thread step hook
+    monkeypatch.setattr('actionmanager.manager.THREAD_STEP_HOOKS', {})
+    server = Server(f'{tmp_path}/oscaptool.sock', load_config(str(tmp_path))['actionmanager'])
+    try:
+        assert GetScanResult._parse_pool._processes
+    finally:
+        server.server_close()
+        GetScanResult._parse_pool.shutdown()
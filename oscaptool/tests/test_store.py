@@ -0,0 +1,198 @@
+import os
+import sqlite3
+import contextlib
+
+import pytest
+
+from oscaptool.sample.actions import (
+    GetScanResult, SaveScanResult, MigrateScanResults, CompareScanResults,
+    NEXT_ACTION, SCAN_ID_KEY_NAME, OUTPUT_KEY_NAME, PATH, STORE, SCAN_ID, CMD_STDOUT,
+    SCAN_RESULT_1_KEY_NAME, SCAN_RESULT_2_KEY_NAME
+)
+from oscaptool.sample.store import ScanStore
+from oscaptool.tests import make_scan_output, write_scan_file
+from actionmanager.actions import ActionError
+
+SCAN_IDS = ['2020-01-01_00:00:00_xccdf_1', '2020-01-02_00:00:00_xccdf_1', '2020-01-03_00:00:00_xccdf_1']
+RULES = [('First rule', 'rule_1', 'pass'), ('Second rule', 'rule_2', 'fail'), ('First rule', 'rule_3', 'error')]
+
+@pytest.fixture
+def store(tmp_path):
+    return ScanStore(f'{tmp_path}/store/scans.db')
+
+@pytest.fixture
+def config(tmp_path):
+    return {
+        NEXT_ACTION: '', SCAN_ID_KEY_NAME: 'scan_id', OUTPUT_KEY_NAME: 'output',
+        PATH: f'{tmp_path}/', STORE: f'{tmp_path}/store/scans.db'
+    }
+
+def test_saved_scan_round_trip(store):
+    store.save_scan(SCAN_IDS[0], RULES, (1, 1, 0, 2))
+    assert store.has_scan(SCAN_IDS[0])
+    assert not store.has_scan(SCAN_IDS[1])
+    assert store.get_rules(SCAN_IDS[0]) == RULES
+    assert store.get_stats(SCAN_IDS[0]) == (1, 1, 0, 2)
+    assert store.get_stats(SCAN_IDS[1]) is None
+    # saving a scan again replaces it
+    store.save_scan(SCAN_IDS[0], RULES[:1], (1, 0, 0, 1))
+    assert store.get_rules(SCAN_IDS[0]) == RULES[:1]
+    assert store.get_scan_ids() == SCAN_IDS[:1]
+
+def test_scan_is_parsed_once(tmp_path, config):
+    file_name = write_scan_file(f'{tmp_path}/{SCAN_IDS[0]}.txt', ['pass', 'fail', 'notapplicable'])
+    expected = GetScanResult({key: value for key, value in config.items() if key != STORE}).get_scan_result(SCAN_IDS[0])
+    expected_rules = list(expected.get_rule_tuples())
+    GetScanResult(config).get_scan_result(SCAN_IDS[0])
+    # the text output is no longer needed once the scan is stored
+    os.remove(file_name)
+    scan_result = GetScanResult(config).get_scan_result(SCAN_IDS[0])
+    assert list(scan_result.get_rule_tuples()) == expected_rules
+    assert scan_result._stats.to_tuple() == expected._stats.to_tuple() == (1, 1, 1, 3)
+
+def test_saved_scan_is_stored(tmp_path, config, store):
+    output = make_scan_output(['pass', 'fail'])
+    SaveScanResult({NEXT_ACTION: '', PATH: f'{tmp_path}/', STORE: config[STORE]}).execute(
+        {SCAN_ID: SCAN_IDS[0], CMD_STDOUT: [f'{line}\n' for line in output]}
+    )
+    assert os.path.isfile(f'{tmp_path}/{SCAN_IDS[0]}.txt')
+    assert [rule[2] for rule in store.get_rules(SCAN_IDS[0])] == ['pass', 'fail']
+
+def test_migrate_stores_missing_scans(tmp_path, config, store):
+    for scan_id in SCAN_IDS:
+        write_scan_file(f'{tmp_path}/{scan_id}.txt', ['pass', 'fail'])
+    (tmp_path / 'notes.log').write_text('not a scan')
+    store.save_scan(SCAN_IDS[1], RULES, (1, 1, 0, 2))
+
+    action = MigrateScanResults(config)
+    output = action.execute({})
+    assert output['output'] == [SCAN_IDS[0], SCAN_IDS[2]]
+    assert store.get_scan_ids() == SCAN_IDS
+    assert store.get_stats(SCAN_IDS[0]) == (1, 1, 0, 2)
+    # scans already in the store are left untouched
+    assert store.get_rules(SCAN_IDS[1]) == RULES
+    assert action.execute({})['output'] == []
+
+def test_migrate_fails_without_scan_results(tmp_path, config):
+    with pytest.raises(ActionError):
+        MigrateScanResults(dict(config, **{PATH: f'{tmp_path}/missing/'})).execute({})
+
+CHAIN = 'xccdf_1'
+CHAIN_RESULTS = [['pass', 'fail', 'pass'], ['fail', 'fail', 'pass'], ['fail', 'pass', 'error'], ['pass', 'pass', 'error']]
+
+def save_chain(store, keyframe_interval=16):
+    scan_ids = [f'2020-01-0{day}_00:00:00_{CHAIN}' for day in range(1, len(CHAIN_RESULTS) + 1)]
+    for scan_id, results in zip(scan_ids, CHAIN_RESULTS):
+        rules = [(title, rule_id, result) for (title, rule_id, _), result in zip(RULES, results)]
+        store.save_scan(scan_id, rules, (0, 0, 0, len(rules)), CHAIN, keyframe_interval)
+    return scan_ids
+
+def get_bases(store):
+    with store.connect() as connection:
+        return connection.execute('SELECT scan_id, base IS NULL FROM scans ORDER BY scan_id').fetchall()
+
+def get_results(store, scan_id):
+    return [rule[2] for rule in store.get_rules(scan_id)]
+
+def test_delta_encoded_chain(store):
+    scan_ids = save_chain(store)
+    assert [keyframe for _, keyframe in get_bases(store)] == [1, 0, 0, 0]
+    with store.connect() as connection:
+        # only the results that changed are stored for delta scans
+        assert connection.execute('SELECT COUNT(*) FROM rules').fetchone()[0] == 3
+        assert connection.execute('SELECT COUNT(*) FROM changes').fetchone()[0] == 4
+    for scan_id, results in zip(scan_ids, CHAIN_RESULTS):
+        assert get_results(store, scan_id) == results
+
+def test_keyframe_interval(store):
+    save_chain(store, keyframe_interval=2)
+    assert [keyframe for _, keyframe in get_bases(store)] == [1, 0, 1, 0]
+
+def test_different_rules_make_a_keyframe(store):
+    scan_ids = save_chain(store)
+    store.save_scan('2020-01-09_00:00:00_xccdf_1', RULES[:2], (1, 1, 0, 2), CHAIN, 16)
+    store.save_scan('2020-01-09_00:00:00_oval_1', RULES, (1, 1, 0, 3), 'oval_1', 16)
+    assert get_bases(store)[len(scan_ids) - 1:] == [
+        (scan_ids[-1], 0), ('2020-01-09_00:00:00_oval_1', 1), ('2020-01-09_00:00:00_xccdf_1', 1)
+    ]
+
+@pytest.mark.parametrize('removed', range(len(CHAIN_RESULTS)))
+def test_removed_scan_dependents_are_re_encoded(store, removed):
+    scan_ids = save_chain(store)
+    store.remove_scans([scan_ids[removed]])
+    assert store.get_scan_ids() == scan_ids[:removed] + scan_ids[removed + 1:]
+    for index, (scan_id, results) in enumerate(zip(scan_ids, CHAIN_RESULTS)):
+        if index != removed:
+            assert get_results(store, scan_id) == results
+    # the first scan left is a keyframe, the others are still deltas
+    assert [keyframe for _, keyframe in get_bases(store)] == [1, 0, 0]
+
+def test_compare_uses_stored_changes(store):
+    scan_ids = save_chain(store)
+    for index_1 in range(len(scan_ids)):
+        for index_2 in range(len(scan_ids)):
+            expected = (
+                sum(old == 'pass' and new == 'fail' for old, new in zip(CHAIN_RESULTS[index_1], CHAIN_RESULTS[index_2])),
+                sum(old == 'fail' and new == 'pass' for old, new in zip(CHAIN_RESULTS[index_1], CHAIN_RESULTS[index_2]))
+            )
+            assert store.compare(scan_ids[index_1], scan_ids[index_2]) == expected
+    store.save_scan(SCAN_IDS[0].replace('xccdf', 'oval'), RULES, (1, 1, 0, 3), 'oval_1', 16)
+    assert store.compare(scan_ids[0], SCAN_IDS[0].replace('xccdf', 'oval')) is None
+    assert store.compare(scan_ids[0], 'missing') is None
+
+def test_paths_are_read_without_recursive_queries(store, monkeypatch):
+    # WITH clauses need SQLite 3.8.3, older than the 3.7.17 of RHEL 7
+    statements = []
+    connect = ScanStore.connect
+
+    @contextlib.contextmanager
+    def traced_connect(self):
+        with connect(self) as connection:
+            connection.set_trace_callback(statements.append)
+            yield connection
+
+    monkeypatch.setattr(ScanStore, 'connect', traced_connect)
+    scan_ids = save_chain(store, keyframe_interval=3)
+    assert get_results(store, scan_ids[1]) == CHAIN_RESULTS[1]
+    assert store.compare(scan_ids[0], scan_ids[1]) == (1, 0)
+    store.remove_scans(scan_ids[:1])
+    assert get_results(store, scan_ids[2]) == CHAIN_RESULTS[2]
+    assert statements and not [statement for statement in statements if 'WITH' in statement.upper()]
+
+def test_compare_stored_scan_results(config, store):
+    scan_ids = save_chain(store)
+    action = GetScanResult(config)
+    scan_result_1, scan_result_2 = (action.get_scan_result(scan_id) for scan_id in (scan_ids[0], scan_ids[2]))
+    comparison = CompareScanResults({
+        NEXT_ACTION: '', SCAN_RESULT_1_KEY_NAME: 'scan_1', SCAN_RESULT_2_KEY_NAME: 'scan_2', OUTPUT_KEY_NAME: 'output'
+    }).execute({'scan_1': scan_result_1, 'scan_2': scan_result_2})['output']
+    assert (comparison._introduced, comparison._fixed) == (1, 1)
+    # the rules were not needed
+    assert scan_result_1._columns is None and scan_result_2._columns is None
+    assert list(scan_result_2.get_rule_tuples())[2] == ('First rule', 'rule_3', 'error')
+
+def test_older_store_gets_delta_columns(tmp_path):
+    file_name = f'{tmp_path}/scans.db'
+    connection = sqlite3.connect(file_name)
+    connection.execute(
+        'CREATE TABLE scans (id INTEGER PRIMARY KEY, scan_id TEXT UNIQUE NOT NULL, pass_count INTEGER NOT NULL, '
+        'fail_count INTEGER NOT NULL, na_count INTEGER NOT NULL, total INTEGER NOT NULL)'
+    )
+    connection.close()
+    store = ScanStore(file_name)
+    scan_ids = save_chain(store)
+    assert get_results(store, scan_ids[-1]) == CHAIN_RESULTS[-1]
+
+def test_schema_is_set_up_once(tmp_path, store, monkeypatch):
+    connections = []
+    connect = ScanStore.connect
+    monkeypatch.setattr(ScanStore, 'connect', lambda self: connections.append(self) or connect(self))
+    ScanStore(store.filename)
+    assert connections == []
+    # a replaced or removed file is set up again
+    ScanStore(f'{tmp_path}/other.db')
+    os.replace(f'{tmp_path}/other.db', store.filename)
+    assert len(ScanStore(store.filename).get_scan_ids()) == 0
+    os.remove(store.filename)
+    ScanStore(store.filename).save_scan(SCAN_IDS[0], RULES, (1, 1, 0, 2))
+    assert store.get_rules(SCAN_IDS[0]) == RULES
@@ -9,5 +9,6 @@ setup(
     entry_points="""
         [console_scripts]
         oscaptool=oscaptool.sample.app:create_app
+        oscaptool-client=oscaptool.sample.server:run_client
     """,
 )
\ No newline at end of file